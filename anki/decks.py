@@ -0,0 +1,89 @@
+"""
+Deck manifest for multi-deck builds.
+
+The manifest is a JSON file listing the decks to build, each from an OLL
+CSV file or from a Leetcode list:
+
+    {
+        "decks": [
+            {"name": "One Line Leet", "csv": "data/one_line_leet.data.csv"},
+            {"name": "Top Interview", "list_id": "wpwgkgt"}
+        ]
+    }
+
+All the decks are built from one fetch of the union of their problems.
+"""
+import hashlib
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+from csv_reader import OLLEntity, iter_oll_csv
+from leetcode_anki.helpers.data import DEFAULT_BURST, DEFAULT_RATE, LeetcodeList
+
+
+def deck_id(name: str) -> int:
+    """
+    Stable Anki deck id for the deck name, so rebuilt decks update the
+    imported ones instead of creating new decks
+    """
+    return int(hashlib.sha256(name.encode("utf-8")).hexdigest()[:15], 16)
+
+
+def deck_file_name(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-") or "deck"
+
+
+class DeckSpec:
+    """
+    One deck of the manifest
+    """
+
+    def __init__(
+        self, name: str, csv: Optional[str] = None, list_id: Optional[str] = None
+    ) -> None:
+        if not name:
+            raise ValueError("Deck name is required")
+
+        if (csv is None) == (list_id is None):
+            raise ValueError(f"Deck {name} needs either a csv or a list_id")
+
+        self.name = name
+        self.csv = csv
+        self.list_id = list_id
+
+    def entities(
+        self, rate: float = DEFAULT_RATE, burst: float = DEFAULT_BURST
+    ) -> List[OLLEntity]:
+        """
+        Problems of the deck in deck order. Problems of Leetcode lists come
+        without OLL descriptions
+        """
+        if self.csv is not None:
+            return [entry.get_slug() for entry in iter_oll_csv(self.csv)]
+
+        return [
+            OLLEntity(slug, "", "")
+            for slug in LeetcodeList(self.list_id or "", rate, burst).slugs
+        ]
+
+    def __repr__(self) -> str:
+        return f"DeckSpec({self.name!r})"
+
+
+def load_deck_specs(path: str) -> List[DeckSpec]:
+    with open(path, encoding="utf-8") as manifest_file:
+        manifest: Dict[str, Any] = json.load(manifest_file)
+
+    specs = [
+        DeckSpec(deck.get("name", ""), deck.get("csv"), deck.get("list_id"))
+        for deck in manifest.get("decks") or []
+    ]
+    if not specs:
+        raise ValueError(f"No decks in {path}")
+
+    names = [spec.name for spec in specs]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Deck names must be unique: {names}")
+
+    return specs
@@ -3,22 +3,53 @@
 This script generates an Anki deck with all the leetcode problems currently
 known.
 """
+import asyncio
+import itertools
 import logging
 
 # https://github.com/kerrickstaley/genanki
 import genanki
 from tqdm import tqdm  # type: ignore
 from leetcode_anki.models import generate_anki_note, LeetcodeNote, LeetcodeAnkiFactory
-from leetcode_anki.helpers.data import LeetcodeData, LeetcodePageData, LeetcodeSlugData
-from leetcode_anki.helpers.api import _get_leetcode_api_client
+from leetcode_anki.helpers import metrics
+from leetcode_anki.helpers.batch import DEFAULT_BATCH_SIZE
+from leetcode_anki.helpers.data import (
+    DEFAULT_BURST,
+    DEFAULT_CONCURRENCY,
+    DEFAULT_RATE,
+    QUESTION_CACHE_TTL,
+    LeetcodeData,
+    LeetcodePageData,
+    LeetcodeSlugData,
+)
+from anki.decks import deck_file_name, deck_id, load_deck_specs
+from anki.manifest import DEFAULT_STALENESS, BuildManifest
+from anki.media import MediaCache, image_urls, localise, localise_record
+from anki.transcode import DEFAULT_FORMAT as DEFAULT_MEDIA_FORMAT
+from anki.transcode import DEFAULT_MAX_DIMENSION, MediaOptimiser, fit_budget
+from anki.transcode import DEFAULT_WORKERS as DEFAULT_MEDIA_WORKERS
+from anki.render import render_notes
+from anki.writer import StreamingPackageWriter
+from pdf.book import BOOK_FILE, generate_book
+from pdf.generate import PDF_DIR, generate_async as generate_pdfs
+from pdf.pool import DEFAULT_TIMEOUT as DEFAULT_PDF_TIMEOUT
+from pdf.pool import DEFAULT_WORKERS as DEFAULT_PDF_WORKERS
+from leetcode_anki.helpers.api import (
+    _get_leetcode_api_client,
+    connection_stats,
+    graphql_post_async,
+    retry_counters,
+)
 from leetcode import GraphqlQuery, GraphqlQueryVariables
-from csv_reader import parse_oll_csv
-from typing import Awaitable, List
+from csv_reader import OLLEntity, iter_oll_csv
+from leetcode_anki.helpers.record import ProblemRecord
+from typing import Awaitable, Dict, Iterable, Iterator, List, Optional
 from pathlib import Path
 
 LEETCODE_ANKI_DECK_ID = 8589798175
 OUTPUT_FILE = "leetcode.apkg"
 OUTPUT_DIR = "generated/"
+MANIFEST_FILE = "leetcode.manifest.json"
 
 
 class AppArguments:
@@ -27,33 +58,162 @@ class AppArguments:
 
 
 class PageBasedArg(AppArguments):
-    def __init__(self, start, stop, page_size, list_id, output_dir=OUTPUT_DIR) -> None:
+    def __init__(
+        self,
+        start,
+        stop,
+        page_size,
+        list_id,
+        output_dir=OUTPUT_DIR,
+        concurrency=DEFAULT_CONCURRENCY,
+        rate=DEFAULT_RATE,
+        burst=DEFAULT_BURST,
+        resume=False,
+        light_sync=False,
+    ) -> None:
         self.start = start
         self.stop = stop
         self.page_size = page_size
         self.list_id = list_id
         self.output_dir = output_dir
+        # Number of pages fetched in parallel and the rate limiter settings
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        # Continue the previous interrupted fetch from its checkpoint journal
+        self.resume = resume
+        # List problems with cheap fields first and fetch details of the
+        # new/changed ones only
+        self.light_sync = light_sync
 
 
 class CollectionBasedArg(AppArguments):
-    def __init__(self, output_dir=OUTPUT_DIR, csv_path="data/one_line_leet.data.csv") -> None:
+    def __init__(
+        self,
+        output_dir=OUTPUT_DIR,
+        csv_path="data/one_line_leet.data.csv",
+        concurrency=DEFAULT_CONCURRENCY,
+        rate=DEFAULT_RATE,
+        burst=DEFAULT_BURST,
+        batch_size=DEFAULT_BATCH_SIZE,
+        incremental=False,
+        staleness=DEFAULT_STALENESS,
+        resume=False,
+        render_workers=1,
+        metrics_path=None,
+        pdf=False,
+        pdf_workers=DEFAULT_PDF_WORKERS,
+        pdf_timeout=DEFAULT_PDF_TIMEOUT,
+        pdf_book=False,
+        media=False,
+        optimise_media=False,
+        media_max_dimension=DEFAULT_MAX_DIMENSION,
+        media_format=DEFAULT_MEDIA_FORMAT,
+        media_workers=DEFAULT_MEDIA_WORKERS,
+        media_budget=None,
+    ) -> None:
         self.output_dir = output_dir
         self.csv_path = csv_path
+        # Fetch engine settings: number of parallel requests and the
+        # sustained/burst request rate allowed by the shared rate limiter
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        # Maximum number of problems requested in one GraphQL query
+        self.batch_size = batch_size
+        # Reuse notes from the previous build for the problems fetched less
+        # than `staleness` seconds ago
+        self.incremental = incremental
+        self.staleness = staleness
+        # Continue the previous interrupted fetch from its checkpoint journal
+        self.resume = resume
+        # Number of processes notes are rendered in
+        self.render_workers = render_workers
+        # Where the JSON report of the run metrics is written, if anywhere
+        self.metrics_path = metrics_path
+        # Also render a PDF per problem, with at most `pdf_workers`
+        # wkhtmltopdf processes at once and `pdf_timeout` seconds per PDF
+        self.pdf = pdf
+        self.pdf_workers = pdf_workers
+        self.pdf_timeout = pdf_timeout
+        # Also put all the problems in one PDF book, see pdf/book.py
+        self.pdf_book = pdf_book
+        # Download the images of the problems into the deck, see anki/media.py
+        self.media = media
+        # Convert the images to `media_format`, at most `media_max_dimension`
+        # pixels wide and high, in `media_workers` processes (anki/transcode.py)
+        self.optimise_media = optimise_media
+        self.media_max_dimension = media_max_dimension
+        self.media_format = media_format
+        self.media_workers = media_workers
+        # Bytes the images of the deck may take at most, the largest images
+        # stay remote above it
+        self.media_budget = media_budget
+
+
+class DeckManifestArg(CollectionBasedArg):
+    def __init__(self, decks_path, split=False, **kwargs) -> None:
+        super().__init__(**kwargs)
+        # JSON manifest of the decks to build (see anki.decks)
+        self.decks_path = decks_path
+        # One .apkg per deck instead of one .apkg with a sub-deck per deck
+        self.split = split
+
+
+def report_metrics(args: CollectionBasedArg) -> None:
+    """
+    Log the timings and counters of the run, and write them to the JSON
+    report if requested
+    """
+    data = metrics.report()
+    data["connections"] = connection_stats()
+    data["retries"] = retry_counters()
+    logging.info("Leetcode API connections: %s", data["connections"])
+    logging.info("Leetcode API retries: %s", data["retries"])
+    logging.info("Run metrics:\n%s", metrics.format_report(data))
+    if args.metrics_path:
+        metrics.write_report(args.metrics_path, data)
+
+
+def reused_media_urls(
+    manifest: BuildManifest, slugs: List[str], media: MediaCache
+) -> Iterator[List[str]]:
+    """
+    URLs of the images linked from the notes of the previous build
+    """
+    for slug in slugs:
+        note = manifest.note(slug)
+        if note:
+            for field in note.fields:
+                yield image_urls(media.delocalise(field))
+
+
+def shrink_media(
+    media: MediaCache, names: Dict[str, str], args: CollectionBasedArg
+) -> Dict[str, str]:
+    """
+    Convert the images and fit them in the budget, as set in `args`
+    """
+    if args.optimise_media:
+        names = MediaOptimiser(
+            media,
+            args.media_max_dimension,
+            image_format=args.media_format,
+            workers=args.media_workers,
+        ).optimise(names)
+    if args.media_budget is not None:
+        names = fit_budget(media, names, args.media_budget)
+    return names
 
 
 async def gen_leetcode_cards():
     print("ok")
 
 
-async def generate(args: AppArguments) -> None:
+async def log_current_user() -> None:
     """
-    Generate an Anki deck
+    Log the leetcode user the deck is generated for
     """
-    print("CollectionBasedArg %s", isinstance(args, CollectionBasedArg))
-    print("PageBasedArg %s", isinstance(args, PageBasedArg))
-    leetcode_model = LeetcodeAnkiFactory.nano_leet()
-
-##########################################################################################################################################
     graphql_request = GraphqlQuery(
         query="""
     {
@@ -65,11 +225,57 @@ async def generate(args: AppArguments) -> None:
         """,
         variables=GraphqlQueryVariables(),
     )
-    logging.info(_get_leetcode_api_client().graphql_post(
-        body=graphql_request).__dict__)
-    nano_leet_entries = parse_oll_csv('data/one_line_leet.data.csv')
-    slugs_with_desc = list(map(lambda x: x.get_slug(), nano_leet_entries))
-    leetcode_data = LeetcodeSlugData(slugs_with_desc)
+    api_instance = await asyncio.get_running_loop().run_in_executor(
+        None, _get_leetcode_api_client
+    )
+    logging.info((await graphql_post_async(
+        api_instance, body=graphql_request)).__dict__)
+
+
+async def generate(args: AppArguments) -> None:
+    """
+    Generate an Anki deck
+    """
+    print("CollectionBasedArg %s", isinstance(args, CollectionBasedArg))
+    print("PageBasedArg %s", isinstance(args, PageBasedArg))
+    leetcode_model = LeetcodeAnkiFactory.nano_leet()
+
+##########################################################################################################################################
+    # Runs concurrently with the problems fetch
+    current_user = asyncio.ensure_future(log_current_user())
+    slugs_with_desc = [
+        entry.get_slug() for entry in iter_oll_csv('data/one_line_leet.data.csv')
+    ]
+    manifest: Optional[BuildManifest] = None
+    slugs_to_fetch = slugs_with_desc
+    cache_ttl = QUESTION_CACHE_TTL
+    if args.incremental:
+        manifest = BuildManifest(args.output_dir + MANIFEST_FILE, leetcode_model)
+        manifest.retain(entity.slug for entity in slugs_with_desc)
+        stale = set(
+            manifest.stale(
+                (entity.slug for entity in slugs_with_desc),
+                args.staleness,
+                {entity.slug: entity for entity in slugs_with_desc},
+            )
+        )
+        slugs_to_fetch = [entity for entity in slugs_with_desc if entity.slug in stale]
+        # Stale problems must not be served from the response cache either
+        cache_ttl = min(cache_ttl, args.staleness)
+        logging.info(
+            "Incremental build: %s of %s problems are new or stale",
+            len(slugs_to_fetch),
+            len(slugs_with_desc),
+        )
+    leetcode_data = LeetcodeSlugData(
+        slugs_to_fetch,
+        args.concurrency,
+        args.rate,
+        args.burst,
+        args.batch_size,
+        cache_ttl,
+        args.resume,
+    )
     logging.info(
         f"OLL Entries parsed count: {len(slugs_with_desc)} {slugs_with_desc[0]}")
 # logging.info("leetcode model:", leetcode_model.__dict__)
@@ -77,17 +283,204 @@ async def generate(args: AppArguments) -> None:
     leetcode_deck = genanki.Deck(LEETCODE_ANKI_DECK_ID, Path(
         args.output_dir + OUTPUT_FILE).stem)
     # leetcode_data = LeetcodePageData(
-    # start, stop, page_size, list_id
+    # start, stop, page_size, list_id, concurrency, rate, burst, resume,
+    # light_sync
     # )
-    note_generators: List[LeetcodeNote] = []
-    task_handles = await leetcode_data.all_problems_handles()
+    await asyncio.gather(current_user, leetcode_data.load())
+    fetched = set(await leetcode_data.all_problems_handles())
     logging.info("Generating flashcards")
-    for leetcode_task_handle in task_handles:
-        note_generators.append(
-            await generate_anki_note(leetcode_data, leetcode_model, leetcode_task_handle)
+    fetched_slugs = [
+        entity.slug for entity in slugs_with_desc if entity.slug in fetched
+    ]
+    # Notes of the previous build kept as they are
+    reused_slugs = (
+        [entity.slug for entity in slugs_with_desc if entity.slug not in fetched]
+        if manifest
+        else []
+    )
+    media: Optional[MediaCache] = None
+    media_names: Dict[str, str] = {}
+    if args.media:
+        media = MediaCache(concurrency=args.concurrency)
+        # Images of the reused notes count towards the budget as well, they
+        # are linked again like the ones of the new notes
+        media_names = await media.fetch(
+            itertools.chain(
+                (
+                    image_urls(record.content)
+                    for record in leetcode_data.iter_records(fetched_slugs)
+                ),
+                reused_media_urls(manifest, reused_slugs, media) if manifest else (),
+            )
+        )
+        media_names = await asyncio.get_running_loop().run_in_executor(
+            None, shrink_media, media, media_names, args
         )
-    for leetcode_note in tqdm(note_generators, unit="flashcard"):
-        if (leetcode_note).model:
-            logging.info("note: %s", (leetcode_note).model.to_json(0, 0))
-        leetcode_deck.add_note(leetcode_note)
-    genanki.Package(leetcode_deck).write_to_file(args.output_dir + OUTPUT_FILE)
+    packed_media = set(media_names.values())
+    # Notes go to the package as soon as they are built, in the CSV order.
+    # Records are read from the problem store as the notes are rendered
+    records: Iterable[ProblemRecord] = leetcode_data.iter_records(fetched_slugs)
+    if media:
+        records = (localise_record(record, media_names) for record in records)
+    rendered = render_notes(records, leetcode_model, args.render_workers)
+    writer = StreamingPackageWriter(args.output_dir + OUTPUT_FILE, leetcode_deck)
+    try:
+        for entity in tqdm(slugs_with_desc, unit="flashcard"):
+            note: Optional[LeetcodeNote] = None
+            if entity.slug in fetched:
+                note = next(rendered)
+                if manifest and manifest.update(entity.slug, note, entity):
+                    logging.info("Problem %s changed", entity.slug)
+            elif manifest:
+                # Fresh problems, as well as the ones that failed to
+                # refetch, keep the notes from the previous build
+                note = manifest.note(entity.slug)
+                if note and media:
+                    note.fields = [
+                        localise(media.delocalise(field), media_names)
+                        for field in note.fields
+                    ]
+            if note:
+                writer.add_note(note)
+                if media:
+                    for path in media.files(note.fields, packed_media):
+                        writer.add_media(path)
+    except BaseException:
+        writer.abort()
+        raise
+    await asyncio.get_running_loop().run_in_executor(None, writer.close)
+    logging.info("Wrote %s notes", writer.count)
+    metrics.count("notes_written", writer.count)
+    if args.pdf:
+        await generate_pdfs(
+            leetcode_data,
+            fetched_slugs,
+            args.output_dir + PDF_DIR,
+            args.pdf_workers,
+            args.pdf_timeout,
+        )
+    if args.pdf_book:
+        await generate_book(
+            leetcode_data,
+            fetched_slugs,
+            args.output_dir + BOOK_FILE,
+            workers=args.pdf_workers,
+            timeout=args.pdf_timeout,
+        )
+    report_metrics(args)
+    if manifest:
+        manifest.save()
+
+
+async def generate_decks(args: DeckManifestArg) -> None:
+    """
+    Generate several decks from one fetch of all their problems
+    """
+    loop = asyncio.get_running_loop()
+    leetcode_model = LeetcodeAnkiFactory.nano_leet()
+    current_user = asyncio.ensure_future(log_current_user())
+
+    specs = load_deck_specs(args.decks_path)
+    deck_entities = [
+        await loop.run_in_executor(None, spec.entities, args.rate, args.burst)
+        for spec in specs
+    ]
+    union: Dict[str, OLLEntity] = {}
+    for entities in deck_entities:
+        for entity in entities:
+            union.setdefault(entity.slug, entity)
+    logging.info(
+        "%s decks, %s problems, %s unique",
+        len(specs),
+        sum(len(entities) for entities in deck_entities),
+        len(union),
+    )
+
+    leetcode_data = LeetcodeSlugData(
+        list(union.values()),
+        args.concurrency,
+        args.rate,
+        args.burst,
+        args.batch_size,
+        QUESTION_CACHE_TTL,
+        args.resume,
+    )
+    await asyncio.gather(current_user, leetcode_data.load())
+    fetched = set(await leetcode_data.all_problems_handles())
+
+    media: Optional[MediaCache] = None
+    media_names: Dict[str, str] = {}
+    if args.media:
+        media = MediaCache(concurrency=args.concurrency)
+        media_names = await media.fetch(
+            image_urls(leetcode_data.stored(slug).content or "") for slug in fetched
+        )
+        media_names = await loop.run_in_executor(
+            None, shrink_media, media, media_names, args
+        )
+    packed_media = set(media_names.values())
+
+    parent_deck = genanki.Deck(
+        LEETCODE_ANKI_DECK_ID, Path(args.output_dir + OUTPUT_FILE).stem
+    )
+    combined: Optional[StreamingPackageWriter] = None
+    if not args.split:
+        combined = StreamingPackageWriter(args.output_dir + OUTPUT_FILE, parent_deck)
+
+    try:
+        for spec, entities in zip(specs, deck_entities):
+            # Every deck gets its own records: the same problem comes with
+            # different OLL descriptions in different decks
+            deck_problems = [
+                entity for entity in entities if entity.slug in fetched
+            ]
+            records: Iterable[ProblemRecord] = (
+                ProblemRecord.from_detail(leetcode_data.stored(entity.slug), entity)
+                for entity in deck_problems
+            )
+            if media:
+                records = (localise_record(record, media_names) for record in records)
+            if combined:
+                deck = genanki.Deck(
+                    deck_id(spec.name), f"{parent_deck.name}::{spec.name}"
+                )
+                combined.add_deck(deck)
+                writer = combined
+            else:
+                deck = genanki.Deck(deck_id(spec.name), spec.name)
+                writer = StreamingPackageWriter(
+                    f"{args.output_dir}{deck_file_name(spec.name)}.apkg", deck
+                )
+
+            try:
+                rendered = render_notes(records, leetcode_model, args.render_workers)
+                with tqdm(
+                    total=len(deck_problems), unit="flashcard", desc=spec.name
+                ) as progress:
+                    for note in rendered:
+                        if combined:
+                            # A problem can be in several sub-decks of one
+                            # package
+                            note.guid = genanki.guid_for(note.fields[0], spec.name)
+                        writer.add_note(note, deck)
+                        if media:
+                            for path in media.files(note.fields, packed_media):
+                                writer.add_media(path)
+                        progress.update(1)
+
+                if not combined:
+                    await loop.run_in_executor(None, writer.close)
+            except BaseException:
+                # A deck of its own doesn't leave a partial package behind
+                if not combined:
+                    writer.abort()
+                raise
+            logging.info("Deck %s: %s notes", spec.name, len(deck_problems))
+    except BaseException:
+        if combined:
+            combined.abort()
+        raise
+
+    if combined:
+        await loop.run_in_executor(None, combined.close)
+    report_metrics(args)
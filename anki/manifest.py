@@ -0,0 +1,159 @@
+"""
+Manifest of the previous deck build, used for incremental rebuilds.
+
+The manifest maps every problem slug to the note built for it (fields, tags
+and sort field), a hash of that content, a hash of the One Line Leet entry
+it was built with and the time the problem data was fetched. On the next
+build only the problems that are new, were fetched longer ago than the
+staleness threshold or have a different One Line Leet entry in the CSV
+have to be fetched and rendered again, the rest of the notes are rebuilt
+from the manifest.
+"""
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+import genanki  # type: ignore
+
+from csv_reader import OLLEntity
+from leetcode_anki.helpers.cache import atomic_write
+from leetcode_anki.models import LeetcodeNote
+
+MANIFEST_VERSION = 1
+
+# Problems fetched longer ago than this (in seconds) are fetched again
+DEFAULT_STALENESS = 24 * 60 * 60
+
+
+def _model_signature(model: genanki.Model) -> str:
+    """
+    Notes from the manifest can only be reused with the same set of fields
+    """
+    names = [field["name"] for field in model.fields]
+    return hashlib.sha256(
+        json.dumps([model.model_id, names]).encode("utf-8")
+    ).hexdigest()
+
+
+def content_hash(note: LeetcodeNote) -> str:
+    return hashlib.sha256(
+        json.dumps([note.fields, list(note.tags)]).encode("utf-8")
+    ).hexdigest()
+
+
+def oll_hash(oll: Optional[OLLEntity]) -> Optional[str]:
+    if oll is None:
+        return None
+    return hashlib.sha256(
+        json.dumps([oll.oll_short, oll.oll_desc]).encode("utf-8")
+    ).hexdigest()
+
+
+class BuildManifest:
+    def __init__(self, path: str, model: genanki.Model) -> None:
+        self._path = path
+        self._model = model
+        self._signature = _model_signature(model)
+        self._entries: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self._path, encoding="utf-8") as manifest_file:
+                manifest = json.load(manifest_file)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            logging.warning("Corrupted manifest %s, rebuilding", self._path)
+            return {}
+
+        if (
+            manifest.get("version") != MANIFEST_VERSION
+            or manifest.get("model") != self._signature
+        ):
+            logging.info("Manifest %s is outdated, rebuilding", self._path)
+            return {}
+
+        return manifest["notes"]
+
+    def is_stale(
+        self, slug: str, staleness: float, oll: Optional[OLLEntity] = None
+    ) -> bool:
+        """
+        Whether the problem is new, was fetched too long ago or was built
+        with another One Line Leet entry than `oll`
+        """
+        entry = self._entries.get(slug)
+        return (
+            entry is None
+            or time.time() - entry["fetched_at"] > staleness
+            or entry.get("oll") != oll_hash(oll)
+        )
+
+    def stale(
+        self,
+        slugs: Iterable[str],
+        staleness: float,
+        oll_entities: Optional[Mapping[str, OLLEntity]] = None,
+    ) -> List[str]:
+        oll_entities = oll_entities or {}
+        return [
+            slug
+            for slug in slugs
+            if self.is_stale(slug, staleness, oll_entities.get(slug))
+        ]
+
+    def note(self, slug: str) -> Optional[LeetcodeNote]:
+        """
+        Note built for the problem during a previous build
+        """
+        entry = self._entries.get(slug)
+        if entry is None:
+            return None
+
+        return LeetcodeNote(
+            model=self._model,
+            fields=entry["fields"],
+            tags=entry["tags"],
+            sort_field=entry["sort_field"],
+        )
+
+    def update(
+        self, slug: str, note: LeetcodeNote, oll: Optional[OLLEntity] = None
+    ) -> bool:
+        """
+        Record freshly built note, built with the One Line Leet entry `oll`.
+        Returns whether its content changed since the previous build
+        """
+        new_hash = content_hash(note)
+        previous = self._entries.get(slug)
+        self._entries[slug] = {
+            "hash": new_hash,
+            "oll": oll_hash(oll),
+            "fetched_at": time.time(),
+            "fields": note.fields,
+            "tags": list(note.tags),
+            "sort_field": note.sort_field,
+        }
+        return previous is None or previous["hash"] != new_hash
+
+    def retain(self, slugs: Iterable[str]) -> None:
+        """
+        Forget the problems which are not part of the deck anymore
+        """
+        keep = set(slugs)
+        self._entries = {
+            slug: entry for slug, entry in self._entries.items() if slug in keep
+        }
+
+    def save(self) -> None:
+        with atomic_write(self._path, "w", encoding="utf-8") as tmp_file:
+            json.dump(
+                {
+                    "version": MANIFEST_VERSION,
+                    "model": self._signature,
+                    "notes": self._entries,
+                },
+                tmp_file,
+            )
@@ -0,0 +1,286 @@
+"""
+Images of the problems, packed into the deck.
+
+Problem descriptions link diagrams hosted on leetcode.com, which Anki
+fetches on every review (and can't show offline). With `--media` every
+image is downloaded once, stored under the hash of its bytes (so the same
+picture linked from several URLs is stored once) and the notes link the
+local copy instead:
+
+    media = MediaCache()
+    names = await media.fetch(image_urls(record.content) for record in records)
+    record.content = localise(record.content, names)
+    ...
+    for path in media.files(note.fields):
+        writer.add_media(path)
+
+Downloads are kept in the cache directory between runs, a URL already
+downloaded is never requested again. The cache also remembers the URL of
+every local image, so notes of an earlier build can be pointed back to the
+URLs (`delocalise`) and go through the same steps as new ones.
+"""
+import asyncio
+import copy
+import hashlib
+import html
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+import urllib.parse
+from typing import Collection, Dict, Iterable, List, Mapping, Optional
+
+import leetcode.rest  # type: ignore
+import urllib3  # type: ignore
+
+import leetcode_anki.helpers.data
+from leetcode_anki.helpers import metrics
+from leetcode_anki.helpers.api import TRANSIENT_EXCEPTIONS, retry
+from leetcode_anki.helpers.cache import _get_disk_cache, atomic_write
+from leetcode_anki.helpers.record import ProblemRecord
+
+# Media files are kept in this directory of the cache
+MEDIA_DIR = "media"
+
+# Names of the local images, so they aren't mixed up with other media of
+# the collection
+MEDIA_PREFIX = "leetcode-"
+
+DEFAULT_CONCURRENCY = 4
+
+# Seconds to wait for a single image
+DEFAULT_TIMEOUT = 30.0
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp", ".bmp"}
+
+_IMAGE_SRC = re.compile(
+    r"""(<img\b[^>]*?\bsrc\s*=\s*)(["'])(.*?)\2""", re.IGNORECASE | re.DOTALL
+)
+
+
+def _absolute(src: str) -> Optional[str]:
+    url = html.unescape(src.strip())
+    if url.startswith("//"):
+        url = "https:" + url
+    if urllib.parse.urlsplit(url).scheme not in ("http", "https"):
+        return None
+    return url
+
+
+def image_urls(page: str) -> List[str]:
+    """
+    Absolute URLs of the images of the page. Images which are inline or
+    local already are left out
+    """
+    urls = []
+    for match in _IMAGE_SRC.finditer(page):
+        url = _absolute(match.group(3))
+        if url:
+            urls.append(url)
+    return urls
+
+
+def localise(page: str, names: Mapping[str, str]) -> str:
+    """
+    Point the images of the page to the local media `names` (by URL).
+    Images without a local copy keep their URL
+    """
+
+    def replace(match: "re.Match[str]") -> str:
+        url = _absolute(match.group(3))
+        name = names.get(url) if url else None
+        if name is None:
+            return match.group(0)
+        return f"{match.group(1)}{match.group(2)}{name}{match.group(2)}"
+
+    return _IMAGE_SRC.sub(replace, page)
+
+
+def localise_record(record: ProblemRecord, names: Mapping[str, str]) -> ProblemRecord:
+    """
+    Copy of the record with its images pointed to the local media. The
+    record itself is shared (cached by `LeetcodeData`) and keeps its URLs
+    for the PDFs
+    """
+    localised = copy.copy(record)
+    localised.content = localise(record.content, names)
+    return localised
+
+
+def linked_media(page: str) -> List[str]:
+    """
+    Names of the local images the page links
+    """
+    return [
+        match.group(3)
+        for match in _IMAGE_SRC.finditer(page)
+        if match.group(3).startswith(MEDIA_PREFIX) and "/" not in match.group(3)
+    ]
+
+
+def _extension(url: str, content_type: Optional[str]) -> str:
+    extension = posixpath.splitext(urllib.parse.urlsplit(url).path)[1].lower()
+    if extension in IMAGE_EXTENSIONS:
+        return extension
+    if content_type:
+        guessed = mimetypes.guess_extension(content_type.split(";")[0].strip())
+        if guessed in IMAGE_EXTENSIONS:
+            return guessed  # type: ignore
+    return ".png"
+
+
+class MediaCache:
+    """
+    Downloaded images in `<directory>/files`, named after the hash of their
+    content, and the name of every downloaded URL
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        timeout: float = DEFAULT_TIMEOUT,
+    ) -> None:
+        if concurrency < 1:
+            raise ValueError(f"Concurrency must be at least 1: {concurrency}")
+
+        if directory is None:
+            directory = os.path.join(leetcode_anki.helpers.data.CACHE_DIR, MEDIA_DIR)
+        self.directory = directory
+        self._files_dir = os.path.join(directory, "files")
+        self._index = _get_disk_cache(os.path.join(directory, "index"))
+        self._concurrency = concurrency
+        self._http = urllib3.PoolManager(
+            maxsize=concurrency, timeout=urllib3.Timeout(total=timeout), retries=False
+        )
+
+    def path(self, name: str) -> str:
+        return os.path.join(self._files_dir, name)
+
+    def files(
+        self, fields: Iterable[str], names: Optional[Collection[str]] = None
+    ) -> List[str]:
+        """
+        Paths of the local images linked from the note fields, only the ones
+        in `names` if given
+        """
+        paths = []
+        for field in fields:
+            for name in linked_media(field):
+                if names is not None and name not in names:
+                    continue
+                path = self.path(name)
+                if os.path.exists(path):
+                    paths.append(path)
+        return paths
+
+    def url(self, name: str) -> Optional[str]:
+        """
+        URL the local image was downloaded from (or converted from the
+        download of), if known
+        """
+        return self._index.get(f"url:{name}")
+
+    def remember(self, name: str, source: str) -> None:
+        """
+        Local image `name` was made from the local image `source`
+        """
+        url = self.url(source)
+        if url is not None:
+            self._index.set(f"url:{name}", url)
+
+    def delocalise(self, page: str) -> str:
+        """
+        Point the local images of the page back to their URLs
+        """
+
+        def replace(match: "re.Match[str]") -> str:
+            name = match.group(3)
+            url = self.url(name) if name.startswith(MEDIA_PREFIX) else None
+            if url is None:
+                return match.group(0)
+            return (
+                f"{match.group(1)}{match.group(2)}"
+                f"{html.escape(url)}{match.group(2)}"
+            )
+
+        return _IMAGE_SRC.sub(replace, page)
+
+    def _cached(self, url: str) -> Optional[str]:
+        name = self._index.get(f"media:{url}")
+        if name is None or not os.path.exists(self.path(name)):
+            return None
+        return name
+
+    @retry(times=3, exceptions=TRANSIENT_EXCEPTIONS, delay=1)
+    def _download(self, url: str) -> urllib3.BaseHTTPResponse:
+        response = self._http.request("GET", url)
+        if response.status != 200:
+            exc = leetcode.rest.ApiException(response.status, response.reason)
+            exc.headers = response.headers
+            raise exc
+        return response
+
+    def _save(self, url: str) -> str:
+        with metrics.timed("media_download"):
+            response = self._download(url)
+        data = response.data
+        digest = hashlib.sha256(data).hexdigest()
+        name = (
+            f"{MEDIA_PREFIX}{digest[:24]}"
+            f"{_extension(url, response.headers.get('Content-Type'))}"
+        )
+        path = self.path(name)
+        if os.path.exists(path):
+            # Same image under another URL
+            metrics.count("media_duplicates")
+        else:
+            with atomic_write(path) as media_file:
+                media_file.write(data)
+            metrics.count("media_bytes", len(data))
+        self._index.set(f"media:{url}", name)
+        self._index.set(f"url:{name}", url)
+        return name
+
+    async def fetch(self, pages_urls: Iterable[Iterable[str]]) -> Dict[str, str]:
+        """
+        Local names of the images by URL, downloading the ones which are not
+        in the cache yet. Images which fail to download are left out (and
+        stay remote)
+        """
+        names: Dict[str, str] = {}
+        pending: Dict[str, None] = {}
+        for urls in pages_urls:
+            for url in urls:
+                if url in names or url in pending:
+                    continue
+                name = self._cached(url)
+                if name is None:
+                    pending[url] = None
+                else:
+                    names[url] = name
+        cached = len(names)
+        metrics.count("media_cached", cached)
+
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self._concurrency)
+
+        async def save(url: str) -> None:
+            async with semaphore:
+                try:
+                    names[url] = await loop.run_in_executor(None, self._save, url)
+                except Exception as exc:  # pylint: disable=broad-except
+                    logging.warning("Failed to download image %s: %s", url, exc)
+                    metrics.count("media_failed")
+                    return
+            metrics.count("media_downloaded")
+
+        await asyncio.gather(*(save(url) for url in pending))
+        logging.info(
+            "Images: %s cached, %s downloaded, %s failed",
+            cached,
+            len(names) - cached,
+            len(pending) - (len(names) - cached),
+        )
+        return names
@@ -0,0 +1,111 @@
+"""
+Rendering of problem records into Anki notes, optionally across a pool of
+worker processes.
+
+Workers get the model once when they start, then receive chunks of
+records and send back only what the notes are made of (fields, tags, sort
+field and guid). Notes are yielded in the order of the records, whatever
+order the chunks complete in, so the deck is the same for any number of
+workers.
+"""
+import collections
+import concurrent.futures
+from typing import Deque, Iterable, Iterator, List, Optional, Tuple
+
+import genanki  # type: ignore
+
+from leetcode_anki.helpers import metrics
+from leetcode_anki.helpers.record import ProblemRecord
+from leetcode_anki.models import LeetcodeNote, note_from_record
+
+# Number of records sent to a worker at once
+DEFAULT_CHUNK_SIZE = 256
+
+# (fields, tags, sort field, guid)
+RenderedNote = Tuple[List[str], List[str], str, str]
+
+_worker_model: Optional[genanki.Model] = None
+
+
+def _init_worker(model: genanki.Model) -> None:
+    global _worker_model  # pylint: disable=global-statement
+    _worker_model = model
+
+
+def _render_chunk(records: List[ProblemRecord]) -> List[RenderedNote]:
+    rendered = []
+    for record in records:
+        note = note_from_record(record, _worker_model)
+        rendered.append((note.fields, list(note.tags), note.sort_field, note.guid))
+    return rendered
+
+
+def _to_notes(
+    rendered: List[RenderedNote], model: genanki.Model
+) -> Iterator[LeetcodeNote]:
+    for fields, tags, sort_field, guid in rendered:
+        yield LeetcodeNote(
+            model=model, fields=fields, tags=tags, sort_field=sort_field, guid=guid
+        )
+
+
+def _result(
+    future: "concurrent.futures.Future[List[RenderedNote]]",
+) -> List[RenderedNote]:
+    # Time the main process spends waiting for the workers
+    with metrics.timed("render_wait"):
+        return future.result()
+
+
+def _chunks(
+    records: Iterable[ProblemRecord], chunk_size: int
+) -> Iterator[List[ProblemRecord]]:
+    chunk: List[ProblemRecord] = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def render_notes(
+    records: Iterable[ProblemRecord],
+    model: genanki.Model,
+    workers: int = 1,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[LeetcodeNote]:
+    """
+    Build a note for every record, in the order of `records`.
+
+    With more than one worker, chunks of records are rendered in a process
+    pool. At most two chunks per worker are in flight, so memory use doesn't
+    grow with the size of the deck
+    """
+    if workers < 1:
+        raise ValueError(f"Workers must be at least 1: {workers}")
+
+    if chunk_size < 1:
+        raise ValueError(f"Chunk size must be at least 1: {chunk_size}")
+
+    if workers == 1:
+        for record in records:
+            with metrics.timed("render"):
+                note = note_from_record(record, model)
+            yield note
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(model,)
+    ) as executor:
+        in_flight: Deque["concurrent.futures.Future[List[RenderedNote]]"] = (
+            collections.deque()
+        )
+        for chunk in _chunks(records, chunk_size):
+            in_flight.append(executor.submit(_render_chunk, chunk))
+            if len(in_flight) >= workers * 2:
+                yield from _to_notes(_result(in_flight.popleft()), model)
+
+        while in_flight:
+            yield from _to_notes(_result(in_flight.popleft()), model)
@@ -0,0 +1,222 @@
+"""
+Smaller images for the deck.
+
+Diagrams come in whatever size and format they were uploaded in, and make
+up most of the .apkg once `--media` packs them. `MediaOptimiser` downsizes
+the images larger than `max_dimension`, converts them to a compact format
+and drops their metadata, in a pool of worker processes. Results are cached
+under the name of the source (the hash of its bytes) and the settings, so
+the next build only converts new images. A converted image which isn't
+smaller than its source is not used.
+
+`fit_budget` then leaves the largest images out of the deck until the
+images fit in the size budget; those keep their remote URL. The budget is
+for the images only: the image names are part of the notes, so they are
+settled before the collection with the notes is written and its size is
+known.
+
+Converting images needs Pillow, which is optional:
+
+    pip install Pillow
+"""
+import concurrent.futures
+import hashlib
+import io
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+from anki.media import MediaCache
+from leetcode_anki.helpers import metrics
+from leetcode_anki.helpers.cache import _get_disk_cache, atomic_write
+
+try:
+    from PIL import Image  # type: ignore
+except ImportError:  # Only needed to convert images
+    Image = None
+
+DEFAULT_MAX_DIMENSION = 1024
+DEFAULT_QUALITY = 80
+DEFAULT_FORMAT = "webp"
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+# Extension of the converted images by format
+FORMATS = {"webp": ".webp", "jpeg": ".jpg", "png": ".png"}
+
+# Vector and animated images are packed as they are
+KEPT_EXTENSIONS = {".svg", ".gif"}
+
+# (source, target, max dimension, quality, format)
+_Job = Tuple[str, str, int, int, str]
+
+
+def _transcode(job: _Job) -> Optional[str]:
+    """
+    Convert one image, in a worker process. Returns the error, if any. The
+    target is only written when it's smaller than the source
+    """
+    source, target, max_dimension, quality, image_format = job
+    try:
+        with Image.open(source) as image:
+            image.load()
+            if image_format == "jpeg":
+                if image.mode in ("RGBA", "LA", "P"):
+                    # JPEG has no transparency, diagrams are drawn on white
+                    image = image.convert("RGBA")
+                    background = Image.new("RGB", image.size, "white")
+                    background.paste(image, mask=image.split()[-1])
+                    image = background
+                elif image.mode != "RGB":
+                    image = image.convert("RGB")
+            elif image.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+                image = image.convert("RGBA")
+            image.thumbnail((max_dimension, max_dimension))
+            output = io.BytesIO()
+            # Nothing of image.info (EXIF, ICC profile, comments) is passed
+            # on, so the metadata is dropped
+            if image_format == "webp":
+                image.save(output, "WEBP", quality=quality, method=6)
+            elif image_format == "jpeg":
+                image.save(
+                    output, "JPEG", quality=quality, optimize=True, progressive=True
+                )
+            else:
+                image.save(output, "PNG", optimize=True)
+    except Exception as exc:  # pylint: disable=broad-except
+        # Anything Pillow raises on a bad image (DecompressionBombError,
+        # SyntaxError of a broken header...) would stop the whole pool
+        return f"{type(exc).__name__}: {exc}"
+
+    data = output.getvalue()
+    if len(data) >= os.path.getsize(source):
+        return None
+
+    with atomic_write(target) as target_file:
+        target_file.write(data)
+    return None
+
+
+def _map(jobs: List[_Job], workers: int) -> List[Optional[str]]:
+    if workers == 1 or len(jobs) < 2:
+        return [_transcode(job) for job in jobs]
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_transcode, jobs, chunksize=16))
+
+
+class MediaOptimiser:
+    """
+    Convert the images of `media`, see the module docstring
+    """
+
+    def __init__(
+        self,
+        media: MediaCache,
+        max_dimension: int = DEFAULT_MAX_DIMENSION,
+        quality: int = DEFAULT_QUALITY,
+        image_format: str = DEFAULT_FORMAT,
+        workers: int = DEFAULT_WORKERS,
+    ) -> None:
+        if Image is None:
+            raise ValueError(
+                "Optimising images needs Pillow, install it with: pip install Pillow"
+            )
+
+        if image_format not in FORMATS:
+            raise ValueError(f"Unknown image format: {image_format}")
+
+        if max_dimension < 1:
+            raise ValueError(f"Maximum dimension must be positive: {max_dimension}")
+
+        if not 1 <= quality <= 100:
+            raise ValueError(f"Quality must be between 1 and 100: {quality}")
+
+        if workers < 1:
+            raise ValueError(f"Workers must be at least 1: {workers}")
+
+        self._media = media
+        self._index = _get_disk_cache(os.path.join(media.directory, "index"))
+        self._max_dimension = max_dimension
+        self._quality = quality
+        self._format = image_format
+        self._workers = workers
+        # Converted images are named after their source and the settings
+        self._settings = hashlib.sha256(
+            f"{max_dimension}:{quality}:{image_format}".encode("utf-8")
+        ).hexdigest()[:8]
+
+    def _target(self, name: str) -> str:
+        return f"{os.path.splitext(name)[0]}-{self._settings}{FORMATS[self._format]}"
+
+    def optimise(self, names: Dict[str, str]) -> Dict[str, str]:
+        """
+        Names of the images (by URL) with the converted ones in place of
+        their source
+        """
+        results: Dict[str, str] = {}
+        pending: List[str] = []
+        for name in sorted(set(names.values())):
+            if os.path.splitext(name)[1] in KEPT_EXTENSIONS:
+                continue
+            result = self._index.get(f"transcode:{self._target(name)}")
+            if result is not None and os.path.exists(self._media.path(result)):
+                results[name] = result
+            else:
+                pending.append(name)
+        metrics.count("media_transcode_cached", len(results))
+
+        jobs = [
+            (
+                self._media.path(name),
+                self._media.path(self._target(name)),
+                self._max_dimension,
+                self._quality,
+                self._format,
+            )
+            for name in pending
+        ]
+        with metrics.timed("media_transcode"):
+            for name, error in zip(pending, _map(jobs, self._workers)):
+                target = self._target(name)
+                if error:
+                    logging.warning("Failed to convert image %s: %s", name, error)
+                    metrics.count("media_transcode_failed")
+                    continue
+                # The source is used as is when it's smaller
+                result = target if os.path.exists(self._media.path(target)) else name
+                self._index.set(f"transcode:{target}", result)
+                if result == target:
+                    self._media.remember(target, name)
+                results[name] = result
+                metrics.count("media_transcoded" if result == target else "media_kept")
+
+        return {url: results.get(name, name) for url, name in names.items()}
+
+
+def fit_budget(media: MediaCache, names: Dict[str, str], budget: int) -> Dict[str, str]:
+    """
+    Leave the largest images out of `names` until the rest fit in `budget`
+    bytes. The notes are not counted
+    """
+    if budget < 0:
+        raise ValueError(f"Budget must not be negative: {budget}")
+
+    sizes = {name: os.path.getsize(media.path(name)) for name in set(names.values())}
+    total = sum(sizes.values())
+    dropped = set()
+    for name in sorted(sizes, key=lambda name: (-sizes[name], name)):
+        if total <= budget:
+            break
+        dropped.add(name)
+        total -= sizes[name]
+
+    if dropped:
+        logging.warning(
+            "Images are over the budget of %s bytes, %s of %s stay remote",
+            budget,
+            len(dropped),
+            len(sizes),
+        )
+        metrics.count("media_over_budget", len(dropped))
+    metrics.count("media_packed_bytes", total)
+    return {url: name for url, name in names.items() if name not in dropped}
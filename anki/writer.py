@@ -0,0 +1,197 @@
+"""
+Streaming .apkg writer.
+
+genanki builds the whole collection from a Package, so every note has to be
+kept in memory until the deck is complete. The writer below inserts notes
+into the SQLite collection as soon as they are produced, committing them in
+batches, and zips the collection once all the notes are written.
+"""
+import itertools
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import zipfile
+from typing import Any, Iterator, List, Optional, Set, Union
+
+import genanki  # type: ignore
+from genanki.apkg_col import APKG_COL  # type: ignore
+from genanki.apkg_schema import APKG_SCHEMA  # type: ignore
+
+from leetcode_anki.helpers import metrics
+from leetcode_anki.helpers.cache import atomic_write
+
+# Number of notes inserted in one transaction
+DEFAULT_COMMIT_BATCH = 500
+
+
+class StreamingPackageWriter:
+    """
+    Write notes of one or several decks to an .apkg file one by one.
+
+    Usage:
+
+        with StreamingPackageWriter(path, deck) as writer:
+            for note in notes:
+                writer.add_note(note)
+
+    The file at `path` only appears once the writer is closed successfully.
+    Notes added to the decks themselves are not written, pass them to
+    `add_note` instead
+    """
+
+    def __init__(
+        self,
+        path: str,
+        decks: Union[genanki.Deck, List[genanki.Deck]],
+        media_files: Optional[List[str]] = None,
+        commit_batch: int = DEFAULT_COMMIT_BATCH,
+        timestamp: Optional[float] = None,
+    ) -> None:
+        if commit_batch < 1:
+            raise ValueError(f"Commit batch must be at least 1: {commit_batch}")
+
+        self._path = path
+        self._decks = decks if isinstance(decks, list) else [decks]
+        if not self._decks:
+            raise ValueError("At least one deck is required")
+
+        self._media_files: List[str] = []
+        self._media_names: Set[str] = set()
+        for media_path in media_files or []:
+            self.add_media(media_path)
+        self._commit_batch = commit_batch
+        self._timestamp = time.time() if timestamp is None else timestamp
+        self._id_gen: Iterator[int] = itertools.count(int(self._timestamp * 1000))
+        self._models: Set[int] = set()
+        self._pending = 0
+        self._count = 0
+
+        fd, self._db_path = tempfile.mkstemp(suffix=".anki2")
+        os.close(fd)
+        # Notes are added from the event loop thread, while closing (zipping)
+        # may run in an executor. The writer is never used concurrently
+        self._connection: Optional[sqlite3.Connection] = sqlite3.connect(
+            self._db_path, check_same_thread=False
+        )
+        self._cursor = self._connection.cursor()
+        self._cursor.executescript(APKG_SCHEMA)
+        self._cursor.executescript(APKG_COL)
+        for deck in self._decks:
+            self._write_deck(deck)
+
+    @property
+    def count(self) -> int:
+        """
+        Number of notes written so far
+        """
+        return self._count
+
+    def _update_col(self, column: str, key: Any, value: Any) -> None:
+        (column_json,) = self._cursor.execute(f"SELECT {column} FROM col").fetchone()
+        values = json.loads(column_json)
+        values[str(key)] = value
+        self._cursor.execute(f"UPDATE col SET {column} = ?", (json.dumps(values),))
+
+    def _write_deck(self, deck: genanki.Deck) -> None:
+        if not isinstance(deck.deck_id, int):
+            raise TypeError(f"Deck id must be an integer: {deck.deck_id}")
+
+        self._update_col("decks", deck.deck_id, deck.to_json())
+
+    def _write_model(self, model: genanki.Model, deck_id: int) -> None:
+        if model.model_id in self._models:
+            return
+
+        self._models.add(model.model_id)
+        self._update_col("models", model.model_id, model.to_json(self._timestamp, deck_id))
+
+    def add_deck(self, deck: genanki.Deck) -> None:
+        """
+        Add one more (sub-)deck to the package
+        """
+        self._decks.append(deck)
+        self._write_deck(deck)
+
+    def add_media(self, path: str) -> None:
+        """
+        Pack the file with the notes. Notes refer to it by its base name, a
+        file with a name packed already is skipped
+        """
+        name = os.path.basename(path)
+        if name in self._media_names:
+            return
+
+        self._media_names.add(name)
+        self._media_files.append(path)
+
+    def add_note(self, note: genanki.Note, deck: Optional[genanki.Deck] = None) -> None:
+        """
+        Write the note to `deck` (the first deck by default)
+        """
+        if self._connection is None:
+            raise ValueError("Writer is closed")
+
+        with metrics.timed("package_write"):
+            self._add_note(note, deck)
+
+    def _add_note(self, note: genanki.Note, deck: Optional[genanki.Deck]) -> None:
+        deck_id = (deck or self._decks[0]).deck_id
+        self._write_model(note.model, deck_id)
+        note.write_to_db(self._cursor, self._timestamp, deck_id, self._id_gen)
+        self._count += 1
+        self._pending += 1
+        if self._pending >= self._commit_batch:
+            self._connection.commit()  # type: ignore
+            self._pending = 0
+
+    def close(self) -> None:
+        """
+        Finish the collection and pack it with the media files into the .apkg
+        """
+        if self._connection is None:
+            return
+
+        with metrics.timed("package_close"):
+            self._close()
+
+    def _close(self) -> None:
+        self._connection.commit()  # type: ignore
+        self._connection.close()  # type: ignore
+        self._connection = None
+
+        try:
+            with atomic_write(self._path) as package_file, zipfile.ZipFile(
+                package_file, "w"
+            ) as package:
+                package.write(self._db_path, "collection.anki2")
+                media = {
+                    str(index): os.path.basename(path)
+                    for index, path in enumerate(self._media_files)
+                }
+                package.writestr("media", json.dumps(media))
+                for index, path in enumerate(self._media_files):
+                    package.write(path, str(index))
+        finally:
+            os.unlink(self._db_path)
+
+    def abort(self) -> None:
+        """
+        Drop everything written so far
+        """
+        if self._connection is None:
+            return
+
+        self._connection.close()
+        self._connection = None
+        os.unlink(self._db_path)
+
+    def __enter__(self) -> "StreamingPackageWriter":
+        return self
+
+    def __exit__(self, exc_type: Any, *exc_info: Any) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
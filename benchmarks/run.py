@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmarks of the deck generation pipeline.
+
+Every stage runs on a synthetic catalogue of each requested size: CSV
+parsing, fetching from the local stand-in server, note generation, problem
+page templating, .apkg packaging (genanki and the streaming writer) and PDF
+rendering. Results are written as JSON, so they can be
+compared across releases:
+
+    python -m benchmarks.run --sizes 100 3000 50000 --output bench.json
+"""
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+from unittest import mock
+
+import genanki  # type: ignore
+
+import leetcode_anki.helpers.api
+import leetcode_anki.helpers.data
+from anki.render import render_notes
+from anki.writer import StreamingPackageWriter
+from csv_reader import parse_oll_csv
+from leetcode_anki.helpers.record import ProblemRecord
+from leetcode_anki.helpers.replay import StandInServer, SyntheticLeetcode, synthetic_slug
+from leetcode_anki.models import LeetcodeAnkiFactory, LeetcodeNote
+from pdf.html_wrapper import problem_html
+from pdf.pool import DEFAULT_WORKERS as DEFAULT_PDF_WORKERS
+from pdf.pool import PdfJob, PdfWorkerPool, WkhtmltopdfRenderer
+
+DEFAULT_SIZES = [100, 3000, 50000]
+STAGES = ["csv", "fetch", "notes", "html", "package", "stream", "pdf"]
+
+# PDF rendering takes seconds per document, only this many problems are
+# rendered whatever the catalogue size
+DEFAULT_PDF_LIMIT = 20
+
+
+class BenchmarkContext:
+    """
+    State passed from one stage to the next for a single catalogue size
+    """
+
+    def __init__(self, size: int, workdir: str, args: argparse.Namespace) -> None:
+        self.size = size
+        self.workdir = workdir
+        self.args = args
+        self.csv_path = os.path.join(workdir, "catalogue.csv")
+        self.entries: List[Any] = []
+        self.leetcode_data: Optional[leetcode_anki.helpers.data.LeetcodeSlugData] = None
+        self.records: List[ProblemRecord] = []
+        self.notes: List[LeetcodeNote] = []
+
+
+def write_catalogue(path: str, size: int) -> None:
+    with open(path, "w", newline="", encoding="utf-8") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(["title", "url", "level", "category", "oll_short", "oll_desc"])
+        for index in range(1, size + 1):
+            writer.writerow(
+                [
+                    f"Problem {index}",
+                    f"https://leetcode.com/problems/{synthetic_slug(index)}/",
+                    ("Easy", "Medium", "Hard")[index % 3],
+                    "Array",
+                    "[two-pointer,hash-map]",
+                    f"One line description of problem {index}",
+                ]
+            )
+
+
+def bench_csv(context: BenchmarkContext) -> int:
+    context.entries = parse_oll_csv(context.csv_path)
+    return len(context.entries)
+
+
+def bench_fetch(context: BenchmarkContext) -> int:
+    args = context.args
+    with StandInServer(
+        [SyntheticLeetcode(context.size)],
+        latency=args.latency,
+        error_rate=args.error_rate,
+        seed=0,
+    ) as server, mock.patch.dict(
+        os.environ, {"LEETCODE_API_HOST": server.url}
+    ), mock.patch.object(
+        # Every size starts with a fresh client and an empty response cache
+        leetcode_anki.helpers.api,
+        "_client",
+        None,
+    ), mock.patch.object(
+        leetcode_anki.helpers.data, "CACHE_DIR", os.path.join(context.workdir, "cache")
+    ):
+        context.leetcode_data = leetcode_anki.helpers.data.LeetcodeSlugData(
+            [entry.get_slug() for entry in context.entries],
+            concurrency=args.concurrency,
+            rate=args.rate,
+            burst=args.concurrency,
+            batch_size=args.batch_size,
+        )
+        asyncio.run(context.leetcode_data.load())
+
+    return context.size
+
+
+def bench_notes(context: BenchmarkContext) -> int:
+    leetcode_data = context.leetcode_data
+    if leetcode_data is None:
+        raise RuntimeError("Notes benchmark needs the fetch stage")
+
+    model = LeetcodeAnkiFactory.nano_leet()
+
+    async def generate_notes() -> List[LeetcodeNote]:
+        handles = await leetcode_data.all_problems_handles()
+        context.records = [await leetcode_data.record(handle) for handle in handles]
+        return list(
+            render_notes(context.records, model, context.args.render_workers)
+        )
+
+    context.notes = asyncio.run(generate_notes())
+    return len(context.notes)
+
+
+def bench_html(context: BenchmarkContext) -> int:
+    pages = [problem_html(record) for record in context.records]
+    return len(pages)
+
+
+def bench_package(context: BenchmarkContext) -> int:
+    deck = genanki.Deck(1, "benchmark")
+    for note in context.notes:
+        deck.add_note(note)
+    genanki.Package(deck).write_to_file(os.path.join(context.workdir, "bench.apkg"))
+    return len(context.notes)
+
+
+def bench_stream(context: BenchmarkContext) -> int:
+    with StreamingPackageWriter(
+        os.path.join(context.workdir, "stream.apkg"), genanki.Deck(1, "benchmark")
+    ) as writer:
+        for note in context.notes:
+            writer.add_note(note)
+    return writer.count
+
+
+def bench_pdf(context: BenchmarkContext) -> int:
+    notes = context.notes[: context.args.pdf_limit]
+    jobs = (
+        PdfJob(
+            note.fields[0],
+            f"<h1>{note.fields[1]}</h1>{note.fields[3]}",
+            os.path.join(context.workdir, "pdf", f"{note.fields[0]}.pdf"),
+        )
+        for note in notes
+    )
+    pool = PdfWorkerPool(WkhtmltopdfRenderer(), workers=context.args.pdf_workers)
+    result = asyncio.run(pool.run(jobs))
+    if result.failed:
+        raise RuntimeError(f"{len(result.failed)} PDFs failed")
+    return result.rendered
+
+
+BENCHMARKS: Dict[str, Callable[[BenchmarkContext], int]] = {
+    "csv": bench_csv,
+    "fetch": bench_fetch,
+    "notes": bench_notes,
+    "html": bench_html,
+    "package": bench_package,
+    "stream": bench_stream,
+    "pdf": bench_pdf,
+}
+
+
+def run_stage(name: str, context: BenchmarkContext) -> Dict[str, Any]:
+    result: Dict[str, Any] = {"stage": name, "size": context.size}
+    start = time.perf_counter()
+    try:
+        items = BENCHMARKS[name](context)
+    except Exception as exc:  # pylint: disable=broad-except
+        logging.exception("Benchmark %s failed for %s problems", name, context.size)
+        result["error"] = repr(exc)
+        return result
+
+    seconds = time.perf_counter() - start
+    result.update(
+        {
+            "items": items,
+            "seconds": round(seconds, 6),
+            "per_item_ms": round(seconds / items * 1000, 6) if items else None,
+            "items_per_second": round(items / seconds, 3) if seconds else None,
+        }
+    )
+    logging.info(
+        "%s x %s: %.3fs (%s items)", name, context.size, seconds, items
+    )
+    return result
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    os.environ.setdefault("LEETCODE_SESSION_ID", "benchmark")
+    os.environ.setdefault("LEETCODE_CSRF_TOKEN", "benchmark")
+
+    results = []
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as workdir:
+            context = BenchmarkContext(size, workdir, args)
+            write_catalogue(context.csv_path, size)
+            for stage in STAGES:
+                if stage in args.stages:
+                    results.append(run_stage(stage, context))
+
+    return {
+        "revision": git_revision(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "timestamp": int(time.time()),
+        "settings": {
+            "concurrency": args.concurrency,
+            "batch_size": args.batch_size,
+            "latency": args.latency,
+            "error_rate": args.error_rate,
+            "render_workers": args.render_workers,
+            "pdf_workers": args.pdf_workers,
+        },
+        "results": results,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the deck generation")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--output", help="JSON file for results (default: stdout)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument(
+        "--rate", type=float, default=1000, help="Client requests per second"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0, help="Stand-in server latency, seconds"
+    )
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument(
+        "--render-workers", type=int, default=1, help="Note rendering processes"
+    )
+    parser.add_argument("--pdf-limit", type=int, default=DEFAULT_PDF_LIMIT)
+    parser.add_argument(
+        "--pdf-workers",
+        type=int,
+        default=DEFAULT_PDF_WORKERS,
+        help="Maximum number of wkhtmltopdf processes",
+    )
+    return parser.parse_args(argv)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    report = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            output_file.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
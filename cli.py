@@ -3,7 +3,23 @@ import argparse
 import asyncio
 import logging
 
-from anki.generate import generate, PageBasedArg, CollectionBasedArg
+from anki.generate import (
+    generate,
+    generate_decks,
+    PageBasedArg,
+    CollectionBasedArg,
+    DeckManifestArg,
+)
+from anki.manifest import DEFAULT_STALENESS
+from anki.transcode import DEFAULT_FORMAT as DEFAULT_MEDIA_FORMAT
+from anki.transcode import DEFAULT_MAX_DIMENSION
+from anki.transcode import DEFAULT_WORKERS as DEFAULT_MEDIA_WORKERS
+from anki.transcode import FORMATS as MEDIA_FORMATS
+from leetcode_anki.helpers.batch import DEFAULT_BATCH_SIZE
+from leetcode_anki.helpers.metrics import PROFILERS, profiled
+from pdf.pool import DEFAULT_TIMEOUT as DEFAULT_PDF_TIMEOUT
+from pdf.pool import DEFAULT_WORKERS as DEFAULT_PDF_WORKERS
+from leetcode_anki.helpers.data import DEFAULT_BURST, DEFAULT_CONCURRENCY, DEFAULT_RATE
 logging.getLogger().setLevel(logging.INFO)
 
 def parse_args() -> argparse.Namespace:
@@ -16,6 +32,133 @@ def parse_args() -> argparse.Namespace:
     parser_a.add_argument('bar', type=int, help='bar help')
     parser_b = subparsers.add_parser('b', help='b help')
     parser_b.add_argument('--baz', choices='XYZ', help='baz help')
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        help="Number of problems fetched in parallel",
+        default=DEFAULT_CONCURRENCY,
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        help="Maximum number of leetcode API requests per second",
+        default=DEFAULT_RATE,
+    )
+    parser.add_argument(
+        "--burst",
+        type=int,
+        help="Number of requests allowed to exceed --rate in a burst",
+        default=DEFAULT_BURST,
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        help="Maximum number of problems requested in one query",
+        default=DEFAULT_BATCH_SIZE,
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only refetch problems which are new or stale since the previous build",
+    )
+    parser.add_argument(
+        "--staleness",
+        type=float,
+        help="Age (in seconds) after which a problem is refetched in incremental mode",
+        default=DEFAULT_STALENESS,
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue the previous interrupted fetch instead of starting over",
+    )
+    parser.add_argument(
+        "--decks",
+        help="JSON manifest of several decks to build from one fetch",
+    )
+    parser.add_argument(
+        "--split-decks",
+        action="store_true",
+        help="With --decks, write one .apkg per deck instead of sub-decks",
+    )
+    parser.add_argument(
+        "--render-workers",
+        type=int,
+        help="Number of processes to render notes in (useful for large decks)",
+        default=1,
+    )
+    parser.add_argument(
+        "--media",
+        action="store_true",
+        help="Download the images of the problems into the deck, so the cards "
+        "work offline",
+    )
+    parser.add_argument(
+        "--optimise-media",
+        action="store_true",
+        help="Downsize the images and convert them to a compact format "
+        "(requires Pillow)",
+    )
+    parser.add_argument(
+        "--media-max-dimension",
+        type=int,
+        help="Images are downsized to fit in a square of this many pixels",
+        default=DEFAULT_MAX_DIMENSION,
+    )
+    parser.add_argument(
+        "--media-format",
+        choices=sorted(MEDIA_FORMATS),
+        help="Format the images are converted to",
+        default=DEFAULT_MEDIA_FORMAT,
+    )
+    parser.add_argument(
+        "--media-workers",
+        type=int,
+        help="Number of processes to convert images in",
+        default=DEFAULT_MEDIA_WORKERS,
+    )
+    parser.add_argument(
+        "--media-budget",
+        type=float,
+        help="Megabytes the images of the deck may take, the largest images "
+        "stay remote above it (the notes are not counted)",
+    )
+    parser.add_argument(
+        "--pdf",
+        action="store_true",
+        help="Also render a PDF per problem (requires wkhtmltopdf)",
+    )
+    parser.add_argument(
+        "--pdf-book",
+        action="store_true",
+        help="Also put all the problems in one PDF book with a table of "
+        "contents (requires wkhtmltopdf and pypdf)",
+    )
+    parser.add_argument(
+        "--pdf-workers",
+        type=int,
+        help="Maximum number of PDFs rendered at once",
+        default=DEFAULT_PDF_WORKERS,
+    )
+    parser.add_argument(
+        "--pdf-timeout",
+        type=float,
+        help="Seconds a single PDF may take to render before it's retried",
+        default=DEFAULT_PDF_TIMEOUT,
+    )
+    parser.add_argument(
+        "--metrics",
+        help="Write the timings and counters of the run to this JSON file",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=PROFILERS,
+        help="Profile the run (pyinstrument has to be installed separately)",
+    )
+    parser.add_argument(
+        "--profile-output",
+        help="File for the cProfile stats or the pyinstrument HTML report",
+    )
 
     # by_page = parser.add_argument_group('All problems')
     # oll_collections = parser.add_argument_group('One Line Leet problems')
@@ -44,6 +187,22 @@ def parse_args() -> argparse.Namespace:
         # "--output-file", type=str, help="Output filename", default=OUTPUT_FILE
     # )
     args = parser.parse_args()
+    if args.decks:
+        # Deck manifests are always built from a full fetch, without PDFs
+        unsupported = [
+            option
+            for option, used in (
+                ("--incremental", args.incremental),
+                ("--staleness", args.staleness != DEFAULT_STALENESS),
+                ("--pdf", args.pdf),
+                ("--pdf-book", args.pdf_book),
+            )
+            if used
+        ]
+        if unsupported:
+            parser.error(f"{', '.join(unsupported)} can't be used with --decks")
+    elif args.split_decks:
+        parser.error("--split-decks needs --decks")
     return args
 
 async def main() -> None:
@@ -51,6 +210,11 @@ async def main() -> None:
     The main script logic
     """
     args = parse_args()
+    with profiled(args.profile, args.profile_output):
+        await run(args)
+
+
+async def run(args: argparse.Namespace) -> None:
     # start, stop, page_size, list_id, output_file = (
         # args.start,
         # args.stop,
@@ -65,7 +229,50 @@ async def main() -> None:
         "11",
         "generated/"
     )
-    app_arg = CollectionBasedArg()
+    media_args = dict(
+        media=args.media,
+        optimise_media=args.optimise_media,
+        media_max_dimension=args.media_max_dimension,
+        media_format=args.media_format,
+        media_workers=args.media_workers,
+        media_budget=(
+            int(args.media_budget * 1024 * 1024)
+            if args.media_budget is not None
+            else None
+        ),
+    )
+    if args.decks:
+        await generate_decks(
+            DeckManifestArg(
+                args.decks,
+                args.split_decks,
+                concurrency=args.concurrency,
+                rate=args.rate,
+                burst=args.burst,
+                batch_size=args.batch_size,
+                resume=args.resume,
+                render_workers=args.render_workers,
+                metrics_path=args.metrics,
+                **media_args,
+            )
+        )
+        return
+    app_arg = CollectionBasedArg(
+        concurrency=args.concurrency,
+        rate=args.rate,
+        burst=args.burst,
+        batch_size=args.batch_size,
+        incremental=args.incremental,
+        staleness=args.staleness,
+        resume=args.resume,
+        render_workers=args.render_workers,
+        metrics_path=args.metrics,
+        pdf=args.pdf,
+        pdf_workers=args.pdf_workers,
+        pdf_timeout=args.pdf_timeout,
+        pdf_book=args.pdf_book,
+        **media_args,
+    )
     await generate(app_arg)
 
 if __name__ == "__main__":
@@ -74,7 +281,7 @@ if __name__ == "__main__":
     try:
         loop.run_until_complete(main()) # asyncio.run(main(loop=loop))
     except KeyboardInterrupt:
-        pass
+        logging.warning("Interrupted, run again with --resume to continue the fetch")
 
 # employee.py
 
@@ -5,17 +5,31 @@ known.
 """
 
 import csv
-from typing import List
+import logging
+import re
+from typing import Iterator, List, Optional, Set
+from urllib.parse import urlsplit
+
+COLUMNS = ("title", "url", "level", "category", "oll_short", "oll_desc")
+
+SLUG_PATTERN = re.compile(r"^[a-z0-9]+(?:-[a-z0-9]+)*$")
 
 
 class OLLEntity:
+    __slots__ = ("slug", "oll_short", "oll_desc")
+
     def __init__(self, slug, oll_short, oll_desc) -> None:
         self.slug = slug
         self.oll_short = oll_short
         self.oll_desc = oll_desc
 
+    def __repr__(self):
+        return f"OLLEntity({self.slug!r}, {self.oll_short!r}, {self.oll_desc!r})"
+
 
 class OLLEntry:
+    __slots__ = ("title", "url", "level", "category", "oll_short", "oll_desc", "slug")
+
     def __init__(self, title, url, level, category, oll_short, oll_desc) -> None:
         self.title = title
         self.url = url
@@ -23,20 +37,109 @@ class OLLEntry:
         self.category = category
         self.oll_short = oll_short
         self.oll_desc = oll_desc
+        self.slug = slug_from_url(url)
 
     def __repr__(self):
         return f"OLLEntry({self.title!r}, {self.url!r}, {self.level!r}, {self.category!r}, {self.oll_short!r}, {self.oll_desc!r})"
 
     def get_slug(self) -> OLLEntity:
-        return OLLEntity(self.url.replace("https://leetcode.com/problems/", "").replace("/", ""), self.oll_short, self.oll_desc)
+        return OLLEntity(self.slug, self.oll_short, self.oll_desc)
+
+
+class OLLRowError(ValueError):
+    """
+    Malformed row of an OLL CSV file
+    """
+
+    def __init__(self, path: str, line: int, message: str) -> None:
+        super().__init__(f"{path}:{line}: {message}")
+        self.path = path
+        self.line = line
+
+
+def slug_from_url(url: str) -> str:
+    """
+    Problem slug from a problem URL. Accepts the URL with or without scheme,
+    host and trailing path ("/description/", "/solutions/"), as well as a
+    bare slug
+    """
+    value = url.strip()
+    if value.startswith(("leetcode.", "www.")):
+        value = "//" + value
+    parts = [part for part in urlsplit(value).path.split("/") if part]
+    if "problems" in parts:
+        index = parts.index("problems")
+        parts = parts[index + 1 : index + 2]
+
+    slug = parts[0].lower() if len(parts) == 1 else ""
+    if not SLUG_PATTERN.match(slug):
+        raise ValueError(f"Not a Leetcode problem URL: {url!r}")
+    return slug
+
+
+def split_oll_short(oll_short: str) -> List[str]:
+    """
+    Parse "[two-pointer, hash-map]" into ["two-pointer", "hash-map"]
+    """
+    extracted = oll_short.strip().strip("[]")
+    return [part.strip() for part in extracted.split(",") if part.strip()]
+
+
+def iter_oll_csv(
+    path: str, errors: Optional[List[OLLRowError]] = None
+) -> Iterator[OLLEntry]:
+    """
+    Stream the entries of an OLL CSV file, in file order.
+
+    The first row is the header. Rows which can't be parsed are skipped and
+    reported with their line numbers, in the log and in `errors` if given.
+    A problem listed more than once is only yielded the first time.
+    """
+    def report(line: int, message: str) -> None:
+        error = OLLRowError(path, line, message)
+        logging.warning("Skipping row: %s", error)
+        if errors is not None:
+            errors.append(error)
+
+    seen: Set[str] = set()
+    with open(path, newline="", encoding="utf-8") as csvfile:
+        leets = csv.reader(csvfile, delimiter=",", quotechar='"')
+        next(leets, None)
+        while True:
+            try:
+                row = next(leets)
+            except StopIteration:
+                break
+            except csv.Error as exc:
+                report(leets.line_num, str(exc))
+                continue
+
+            if not any(field.strip() for field in row):
+                continue
+
+            try:
+                if len(row) != len(COLUMNS):
+                    raise ValueError(
+                        f"Expected {len(COLUMNS)} columns, got {len(row)}"
+                    )
+                title, url, level, category, oll_short, oll_desc = row
+                entry = OLLEntry(
+                    title, url, level, category, split_oll_short(oll_short), oll_desc
+                )
+            except ValueError as exc:
+                report(leets.line_num, str(exc))
+                continue
+
+            if entry.slug in seen:
+                logging.warning(
+                    "%s:%s: Duplicate problem %s", path, leets.line_num, entry.slug
+                )
+                continue
+
+            seen.add(entry.slug)
+            yield entry
 
 
 def parse_oll_csv(path: str) -> List[OLLEntry]:
-    with open(path, newline='') as csvfile:
-        leets = csv.reader(csvfile, delimiter=',', quotechar='"')
-        acc = []
-        next(leets)
-        for row in leets:
-            oll_entry = OLLEntry(*row)
-            acc.append(oll_entry)
-        return acc
+    return list(iter_oll_csv(path))
+
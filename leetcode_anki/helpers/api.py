@@ -1,78 +1,424 @@
+import asyncio
+import collections
+import datetime
+import email.utils
 import functools
+import http.cookies
 import os
+import random
+import threading
 import time
-from typing import Any, Callable, Tuple, Type, TypeVar
+import urllib.parse
+from typing import Any, Callable, Deque, Dict, Optional, Tuple, Type, TypeVar
 import logging
 # https://github.com/prius/python-leetcode
 import leetcode.api.default_api  # type: ignore
 import leetcode.api_client  # type: ignore
-import leetcode.auth  # type: ignore
 import leetcode.configuration  # type: ignore
+import leetcode.rest  # type: ignore
+import urllib3  # type: ignore
+from urllib3.exceptions import ProtocolError  # type: ignore
 
-def _get_leetcode_api_client() -> leetcode.api.default_api.DefaultApi:
+from leetcode_anki.helpers import metrics
+
+# Default number of keep-alive connections to leetcode.com. It should be at
+# least the fetch concurrency, otherwise connections are discarded and
+# re-established (with a new TLS handshake) all the time
+DEFAULT_POOL_SIZE = 4
+
+_client_lock = threading.Lock()
+_client: Optional["_LeetcodeApi"] = None
+
+
+def _get_csrf_cookie(host: str, session_id: str) -> str:
+    """
+    CSRF token, which the home page of `host` sets as a cookie. Unlike
+    `leetcode.auth.get_csrf_cookie` it asks the configured host (e.g. the
+    stand-in server), not always leetcode.com
+    """
+    response = urllib3.PoolManager().request(
+        "GET",
+        urllib.parse.urljoin(host, "/"),
+        headers={"Cookie": f"LEETCODE_SESSION={session_id}"},
+        timeout=urllib3.Timeout(total=30),
+    )
+    cookies: "http.cookies.SimpleCookie[str]" = http.cookies.SimpleCookie()
+    for header in response.headers.getlist("Set-Cookie"):
+        cookies.load(header)
+    if "csrftoken" not in cookies:
+        raise ValueError(f"No CSRF token from {host} (HTTP {response.status})")
+    return cookies["csrftoken"].value
+
+
+class _LeetcodeApi(leetcode.api.default_api.DefaultApi):
+    """
+    Leetcode API which refreshes the CSRF token once it expires.
+
+    Leetcode responds with 403 to requests with a stale token, such requests
+    are sent again with a fresh token
+    """
+
+    def __init__(self, api_client: leetcode.api_client.ApiClient) -> None:
+        super().__init__(api_client)
+        self._csrf_lock = threading.Lock()
+
+    def _refresh_csrf_token(self, stale_token: str) -> None:
+        configuration = self.api_client.configuration
+        api_key = configuration.api_key
+        with self._csrf_lock:
+            # Another thread may have refreshed it already
+            if api_key["csrftoken"] != stale_token:
+                return
+            logging.info("CSRF token expired, requesting a new one")
+            with metrics.timed("csrf_fetch"):
+                csrf_token = _get_csrf_cookie(
+                    configuration.host, api_key["LEETCODE_SESSION"]
+                )
+            api_key["x-csrftoken"] = csrf_token
+            api_key["csrftoken"] = csrf_token
+
+    def _graphql_post(self, **kwargs: Any) -> Any:
+        with metrics.timed("graphql"):
+            return super().graphql_post(**kwargs)
+
+    def graphql_post(self, **kwargs: Any) -> Any:
+        csrf_token = self.api_client.configuration.api_key["csrftoken"]
+        try:
+            return self._graphql_post(**kwargs)
+        except leetcode.rest.ApiException as exc:
+            metrics.count(f"http_{exc.status}")
+            if exc.status != 403:
+                raise
+            self._refresh_csrf_token(csrf_token)
+            return self._graphql_post(**kwargs)
+
+
+class _MeteredApiClient(leetcode.api_client.ApiClient):
+    """
+    API client which counts the bytes received
+    """
+
+    def request(self, *args: Any, **kwargs: Any) -> Any:
+        response = super().request(*args, **kwargs)
+        # Preloaded responses wrap the urllib3 one (and decode the body). A
+        # urllib3 response keeps the body once it's read, so reading it here
+        # doesn't take it away from the caller
+        data = getattr(response, "urllib3_response", response).data
+        if isinstance(data, bytes):
+            metrics.count("bytes_fetched", len(data))
+        return response
+
+
+def _rest_client(
+    configuration: leetcode.configuration.Configuration,
+) -> leetcode.rest.RESTClientObject:
+    """
+    REST client for the configuration. It records the responses to
+    LEETCODE_RECORD_DIR when the variable is set
+    """
+    record_dir = os.environ.get("LEETCODE_RECORD_DIR")
+    if not record_dir:
+        return leetcode.rest.RESTClientObject(configuration)
+
+    # Imported here, the replay module is only needed for recording
+    from leetcode_anki.helpers.replay import (  # pylint: disable=import-outside-toplevel
+        FixtureStore,
+        RecordingRESTClient,
+    )
+
+    logging.info("Recording Leetcode responses to %s", record_dir)
+    return RecordingRESTClient(configuration, FixtureStore(record_dir))
+
+
+def _resize_pool(api_instance: _LeetcodeApi, pool_size: int) -> None:
+    configuration = api_instance.api_client.configuration
+    if configuration.connection_pool_maxsize >= pool_size:
+        return
+
+    configuration.connection_pool_maxsize = pool_size
+    old = api_instance.api_client.rest_client
+    api_instance.api_client.rest_client = _rest_client(configuration)
+    # Idle keep-alive connections of the old pool would stay open otherwise,
+    # the ones in use are closed when they are released
+    old.pool_manager.clear()
+
+
+def _get_leetcode_api_client(
+    pool_size: int = DEFAULT_POOL_SIZE,
+) -> leetcode.api.default_api.DefaultApi:
     """
     Leetcode API instance constructor.
 
     This is a singleton, because we don't need to create a separate client
-    each time
+    each time: all the callers share one CSRF token and one pool of
+    keep-alive connections. The pool grows to the largest `pool_size`
+    requested.
+
+    LEETCODE_API_HOST points the client to another server (e.g. the
+    stand-in server from `replay`), LEETCODE_CSRF_TOKEN skips the request
+    for a CSRF cookie
     """
+    global _client  # pylint: disable=global-statement
+
+    with _client_lock:
+        if _client is not None:
+            _resize_pool(_client, pool_size)
+            return _client
+
+        with metrics.timed("client_init"):
+            _client = _new_client(pool_size)
+        return _client
+
+
+def _new_client(pool_size: int) -> _LeetcodeApi:
     configuration = leetcode.configuration.Configuration()
+    configuration.host = os.environ.get("LEETCODE_API_HOST", configuration.host)
     session_id = os.environ["LEETCODE_SESSION_ID"]
-    csrf_token = leetcode.auth.get_csrf_cookie(session_id)
+    csrf_token = os.environ.get("LEETCODE_CSRF_TOKEN")
+    if not csrf_token:
+        with metrics.timed("csrf_fetch"):
+            csrf_token = _get_csrf_cookie(configuration.host, session_id)
     configuration.api_key["x-csrftoken"] = csrf_token
     configuration.api_key["csrftoken"] = csrf_token
     configuration.api_key["LEETCODE_SESSION"] = session_id
-    configuration.api_key["Referer"] = "https://leetcode.com"
+    configuration.api_key["Referer"] = configuration.host
     configuration.debug = False
-    api_instance = leetcode.api.default_api.DefaultApi(
-        leetcode.api_client.ApiClient(configuration)
+    configuration.connection_pool_maxsize = pool_size
+    api_client = _MeteredApiClient(configuration)
+    api_client.rest_client = _rest_client(configuration)
+    return _LeetcodeApi(api_client)
+
+
+def connection_stats() -> Dict[str, int]:
+    """
+    Number of requests sent by the shared client and number of connections it
+    had to open for them. Every request above the number of connections
+    reused a keep-alive connection
+    """
+    stats = {"requests": 0, "connections": 0, "reused": 0}
+    if _client is None:
+        return stats
+
+    pools = _client.api_client.rest_client.pool_manager.pools
+    for key in pools.keys():
+        pool = pools[key]
+        stats["requests"] += pool.num_requests
+        stats["connections"] += pool.num_connections
+
+    stats["reused"] = max(0, stats["requests"] - stats["connections"])
+    return stats
+
+
+async def graphql_post_async(
+    api_instance: leetcode.api.default_api.DefaultApi, **kwargs: Any
+) -> Any:
+    """
+    Non-blocking version of `graphql_post`.
+
+    The API client is synchronous, so the request runs in the default
+    executor and the event loop stays free for other work
+    """
+    return await asyncio.get_running_loop().run_in_executor(
+        None, functools.partial(api_instance.graphql_post, **kwargs)
     )
-    return api_instance
 
 
 _T = TypeVar("_T")
 
+# Network errors worth retrying, in addition to HTTP 429 and 5xx responses
+TRANSIENT_EXCEPTIONS: Tuple[Type[Exception], ...] = (
+    ProtocolError,
+    urllib3.exceptions.TimeoutError,
+    urllib3.exceptions.MaxRetryError,
+)
+
+# Retry-After values above this many seconds are not honoured as is
+MAX_RETRY_AFTER = 300
+
+
+class RetryBudget:
+    """
+    Process-wide limit on the number of retries.
+
+    At most `max_retries` retries are allowed in any `window` seconds. Once
+    the budget is spent, failures are raised right away instead of being
+    retried, so an outage doesn't turn into thousands of stacked sleeps
+    """
+
+    def __init__(self, max_retries: int, window: float) -> None:
+        self._max_retries = max_retries
+        self._window = window
+        self._spent: Deque[float] = collections.deque()
+        self._lock = threading.Lock()
+
+    def try_spend(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            while self._spent and now - self._spent[0] > self._window:
+                self._spent.popleft()
+            if len(self._spent) >= self._max_retries:
+                return False
+            self._spent.append(now)
+            return True
+
+
+_retry_budget = RetryBudget(max_retries=100, window=60)
+_retry_counters: "collections.Counter[str]" = collections.Counter()
+_retry_counters_lock = threading.Lock()
+
+
+def _count_retry(name: str) -> None:
+    with _retry_counters_lock:
+        _retry_counters[name] += 1
+
+
+def retry_counters() -> Dict[str, int]:
+    """
+    Number of retries per endpoint (wrapped function), plus the number of
+    failures which were not retried because the retry budget was spent
+    """
+    with _retry_counters_lock:
+        return dict(_retry_counters)
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    """
+    Seconds to wait according to the Retry-After header of 429/503 responses
+    """
+    headers = getattr(exc, "headers", None)
+    if not headers:
+        return None
+
+    value = headers.get("Retry-After")
+    if value is None:
+        return None
+
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            retry_at = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        seconds = (retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+
+    return min(max(0.0, seconds), MAX_RETRY_AFTER)
+
+
+def _is_retryable_status(exc: BaseException) -> bool:
+    if not isinstance(exc, leetcode.rest.ApiException):
+        return False
+    return exc.status == 429 or (exc.status or 0) >= 500
+
+
 class _RetryDecorator:
     _times: int
-    _exceptions: Tuple[Type[Exception]]
+    _exceptions: Tuple[Type[Exception], ...]
     _delay: float
+    _max_delay: float
+    _backoff: float
 
     def __init__(
-        self, times: int, exceptions: Tuple[Type[Exception]], delay: float
+        self,
+        times: int,
+        exceptions: Tuple[Type[Exception], ...],
+        delay: float,
+        max_delay: float,
+        backoff: float,
+        budget: RetryBudget,
     ) -> None:
         self._times = times
         self._exceptions = exceptions
         self._delay = delay
+        self._max_delay = max_delay
+        self._backoff = backoff
+        self._budget = budget
+
+    def _should_retry(self, exc: BaseException) -> bool:
+        return isinstance(exc, self._exceptions) or _is_retryable_status(exc)
+
+    def _sleep_time(self, attempt: int, exc: BaseException) -> float:
+        """
+        Exponential backoff with full jitter, unless the server told us how
+        long to wait
+        """
+        retry_after = _retry_after(exc)
+        if retry_after is not None:
+            return retry_after
+        ceiling = min(self._max_delay, self._delay * self._backoff ** attempt)
+        return random.uniform(0, ceiling)
+
+    def _on_failure(self, name: str, attempt: int, exc: BaseException) -> float:
+        """
+        Decide whether the failed attempt is retried. Returns number of
+        seconds to sleep before the next attempt, raises otherwise
+        """
+        if not self._should_retry(exc):
+            raise exc
+
+        if attempt + 1 >= self._times:
+            logging.error("%s failed after %s tries", name, self._times)
+            raise exc
+
+        if not self._budget.try_spend():
+            _count_retry("budget_exhausted")
+            logging.error("Retry budget is spent, not retrying %s", name)
+            raise exc
+
+        _count_retry(name)
+        sleep_time = self._sleep_time(attempt, exc)
+        logging.warning(
+            "%s failed (%r), try %s/%s, retrying in %.1fs",
+            name,
+            exc,
+            attempt + 1,
+            self._times,
+            sleep_time,
+        )
+        return sleep_time
 
     def __call__(self, func: Callable[..., _T]) -> Callable[..., _T]:
-        times: int = self._times
-        exceptions: Tuple[Type[Exception]] = self._exceptions
-        delay: float = self._delay
+        name: str = func.__qualname__
+
+        if asyncio.iscoroutinefunction(func):
+            # The API client is synchronous, requests are retried in the
+            # thread they run in (the executor, for coroutines)
+            raise TypeError(f"Only synchronous functions are retried: {name}")
 
         @functools.wraps(func)
         def wrapper(*args: Any, **kwargs: Any) -> _T:
-            for attempt in range(times - 1):
+            for attempt in range(self._times):
                 try:
                     return func(*args, **kwargs)
-                except exceptions:
-                    logging.exception(
-                        f"Exception occurred, try %s/%s", attempt + 1, times
-                    )
-                    time.sleep(delay)
-
-            logging.error("Last try")
-            return func(*args, **kwargs)
+                except Exception as exc:  # pylint: disable=broad-except
+                    sleep_time = self._on_failure(name, attempt, exc)
+                    with metrics.timed("retry_sleep"):
+                        time.sleep(sleep_time)
+            raise AssertionError("unreachable")
 
         return wrapper
 
 
 def retry(
-    times: int, exceptions: Tuple[Type[Exception]], delay: float
+    times: int,
+    exceptions: Tuple[Type[Exception], ...],
+    delay: float,
+    max_delay: float = 60,
+    backoff: float = 2,
+    budget: Optional[RetryBudget] = None,
 ) -> _RetryDecorator:
     """
     Retry Decorator
     Retries the wrapped function/method `times` times if the exceptions listed
-    in `exceptions` are thrown
+    in `exceptions` are thrown, or if Leetcode responds with 429 or 5xx.
+
+    The n-th retry waits a random time up to `delay * backoff ** n` seconds
+    (capped at `max_delay`), or as long as the Retry-After header says.
+    All retries draw from the shared retry budget
     """
+    if times < 1:
+        raise ValueError(f"Times must be at least 1: {times}")
 
-    return _RetryDecorator(times, exceptions, delay)
+    return _RetryDecorator(
+        times, exceptions, delay, max_delay, backoff, budget or _retry_budget
+    )
@@ -0,0 +1,128 @@
+import json
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+import leetcode.models.graphql_query  # type: ignore
+import urllib3  # type: ignore
+from leetcode.api.default_api import DefaultApi  # type: ignore
+from leetcode.models.graphql_question_detail import GraphqlQuestionDetail  # type: ignore
+
+from leetcode_anki.helpers.serialization import from_json
+
+DEFAULT_BATCH_SIZE = 16
+
+# Seconds to wait for a batch response before the batch is considered timed out
+BATCH_TIMEOUT = 30
+
+QUESTION_FIELDS = """
+    content
+    questionId
+    questionFrontendId
+    title
+    titleSlug
+    isPaidOnly
+    difficulty
+    likes
+    dislikes
+    categoryTitle
+    freqBar
+    topicTags {
+        name
+        slug
+    }
+    stats
+    hints
+"""
+
+
+def build_batch_query(slugs: List[str]) -> leetcode.models.graphql_query.GraphqlQuery:
+    """
+    Build a single GraphQL document querying all the slugs at once.
+
+    Each question is requested under its own alias (q0, q1, ...), so the
+    response can be mapped back to the slug by position
+    """
+    if not slugs:
+        raise ValueError("Batch must contain at least one slug")
+
+    arguments = ", ".join(f"$s{i}: String!" for i in range(len(slugs)))
+    selections = "\n".join(
+        f"q{i}: question(titleSlug: $s{i}) {{{QUESTION_FIELDS}}}"
+        for i in range(len(slugs))
+    )
+    return leetcode.models.graphql_query.GraphqlQuery(
+        query=f"query questionContentBatch({arguments}) {{\n{selections}\n}}",
+        variables={f"s{i}": slug for i, slug in enumerate(slugs)},
+        operation_name="questionContentBatch",
+    )
+
+
+def fetch_batch(
+    api_instance: DefaultApi, slugs: List[str]
+) -> Dict[str, Optional[GraphqlQuestionDetail]]:
+    """
+    Fetch details for all the slugs in one request.
+
+    Returns dict slug -> question details. Details are None for the slugs
+    Leetcode doesn't know about
+    """
+    response = api_instance.graphql_post(
+        body=build_batch_query(slugs),
+        _preload_content=False,
+        _request_timeout=BATCH_TIMEOUT,
+    )
+    payload: Dict[str, Any] = json.loads(response.data)
+    data = payload.get("data") or {}
+
+    for error in payload.get("errors") or []:
+        logging.warning("GraphQL error in batch: %s", error.get("message", error))
+
+    return {
+        slug: from_json(data.get(f"q{i}"), GraphqlQuestionDetail)
+        for i, slug in enumerate(slugs)
+    }
+
+
+def is_timeout(exc: BaseException) -> bool:
+    """
+    Whether the exception means the server didn't respond in time
+    """
+    if isinstance(exc, urllib3.exceptions.TimeoutError):
+        return True
+
+    if isinstance(exc, urllib3.exceptions.MaxRetryError):
+        return isinstance(exc.reason, urllib3.exceptions.TimeoutError)
+
+    return False
+
+
+class AdaptiveBatchSize:
+    """
+    Batch size controller.
+
+    Large batches save round trips, but a batch that is too large makes
+    Leetcode time out. The size is halved on every timeout and grows back by
+    one after every successful batch, up to `maximum`
+    """
+
+    def __init__(self, maximum: int = DEFAULT_BATCH_SIZE) -> None:
+        if maximum < 1:
+            raise ValueError(f"Batch size must be at least 1: {maximum}")
+
+        self._maximum = maximum
+        self._size = maximum
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def shrink(self) -> None:
+        with self._lock:
+            self._size = max(1, self._size // 2)
+            logging.info("Batch timed out, batch size is now %s", self._size)
+
+    def grow(self) -> None:
+        with self._lock:
+            self._size = min(self._maximum, self._size + 1)
@@ -0,0 +1,169 @@
+import collections
+import contextlib
+import functools
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import IO, Any, Iterator, Optional
+
+from leetcode_anki.helpers import metrics
+
+# Cached responses are evicted in least recently used order once the cache
+# grows past this size
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+@contextlib.contextmanager
+def atomic_write(
+    path: str, mode: str = "wb", encoding: Optional[str] = None
+) -> Iterator[IO[Any]]:
+    """
+    File to write `path` through: a temporary file next to it, which
+    replaces `path` once the block completes. A crashed run never leaves a
+    truncated file behind
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, encoding=encoding) as tmp_file:
+            yield tmp_file
+        # mkstemp creates files readable by the owner only
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class DiskCache:
+    """
+    Persistent cache of API responses.
+
+    Entries are content-addressed: every key is hashed with sha256 and the
+    value is stored as JSON in `<directory>/<hash[:2]>/<hash>.json`, together
+    with the key and the time it was stored. Writes are atomic (temporary file
+    + rename), so a crashed run never leaves a truncated entry behind.
+
+    Entries are evicted in least recently used order once the total size of
+    the cache exceeds `max_bytes`. File modification time is used as the last
+    use time, so the order survives between runs.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        if max_bytes <= 0:
+            raise ValueError(f"Cache size must be positive: {max_bytes}")
+
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index: Optional["collections.OrderedDict[str, int]"] = None
+        self._size = 0
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self._directory, digest[:2], f"{digest}.json")
+
+    def _load_index(self) -> "collections.OrderedDict[str, int]":
+        """
+        Scan the cache directory once, ordering the entries by last use
+        """
+        if self._index is not None:
+            return self._index
+
+        entries = []
+        for root, _, files in os.walk(self._directory):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, path, stat.st_size))
+
+        entries.sort()
+        self._index = collections.OrderedDict(
+            (path, size) for _, path, size in entries
+        )
+        self._size = sum(self._index.values())
+        return self._index
+
+    def get(self, key: str, ttl: Optional[float] = None) -> Optional[Any]:
+        """
+        Return cached value for the key, or None if there is no entry or the
+        entry is older than `ttl` seconds
+        """
+        value = self._get(key, ttl)
+        metrics.count("cache_misses" if value is None else "cache_hits")
+        return value
+
+    def _get(self, key: str, ttl: Optional[float]) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as entry_file:
+                entry = json.load(entry_file)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            logging.warning("Corrupted cache entry for %s, ignoring", key)
+            return None
+
+        if entry.get("key") != key:
+            # Hash collision, practically impossible
+            return None
+
+        if ttl is not None and time.time() - entry["stored_at"] > ttl:
+            return None
+
+        with self._lock:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                return entry["value"]
+            index = self._load_index()
+            if path in index:
+                index.move_to_end(path)
+
+        return entry["value"]
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        Atomically store the value for the key
+        """
+        path = self._path(key)
+        payload = json.dumps(
+            {"key": key, "stored_at": time.time(), "value": value}
+        ).encode("utf-8")
+
+        with atomic_write(path) as tmp_file:
+            tmp_file.write(payload)
+
+        with self._lock:
+            index = self._load_index()
+            self._size += len(payload) - index.pop(path, 0)
+            index[path] = len(payload)
+            self._evict(index)
+
+    def _evict(self, index: "collections.OrderedDict[str, int]") -> None:
+        while self._size > self._max_bytes and len(index) > 1:
+            path, size = index.popitem(last=False)
+            self._size -= size
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            logging.debug("Evicted %s from cache", path)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_disk_cache(directory: str, max_bytes: int = DEFAULT_MAX_BYTES) -> DiskCache:
+    """
+    Disk cache instance shared by every data source using the same directory
+    """
+    return DiskCache(directory, max_bytes)
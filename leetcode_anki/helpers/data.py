@@ -1,33 +1,107 @@
 # pylint: disable=missing-module-docstring
+import asyncio
+import collections
 import functools
+import hashlib
 import json
 import logging
 import math
-import time
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from functools import cached_property
-from typing import Any, Callable, Dict, List
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
 from abc import ABCMeta, abstractmethod
 from tqdm import tqdm  # type: ignore
 import urllib3  # type: ignore
 from urllib3.exceptions import ProtocolError  # type: ignore
 from leetcode.api.default_api import DefaultApi  # type: ignore
 import leetcode.models.graphql_query  # type: ignore
-import leetcode.models.graphql_query_get_question_detail_variables  # type: ignore
 import leetcode.models.graphql_query_problemset_question_list_variables  # type: ignore
 import leetcode.models.graphql_query_problemset_question_list_variables_filter_input  # type: ignore
 import leetcode.models.graphql_question_detail  # type: ignore
 from leetcode.models.graphql_question_detail import GraphqlQuestionDetail  # type: ignore
-from leetcode_anki.helpers.api import retry, _get_leetcode_api_client
+from leetcode_anki.helpers.api import (
+    TRANSIENT_EXCEPTIONS,
+    retry,
+    _get_leetcode_api_client,
+)
+from leetcode_anki.helpers.batch import (
+    DEFAULT_BATCH_SIZE,
+    AdaptiveBatchSize,
+    fetch_batch,
+    is_timeout,
+)
+from leetcode_anki.helpers.cache import DiskCache, _get_disk_cache
+from leetcode_anki.helpers.journal import CheckpointJournal
+from leetcode_anki.helpers import metrics
+from leetcode_anki.helpers.lists import (
+    LIST_PAGE_SIZE,
+    SYNC_FIELDS,
+    fetch_list_page,
+    row_signature,
+)
+from leetcode_anki.helpers.ratelimit import TokenBucket, _get_rate_limiter
+from leetcode_anki.helpers.record import DIFFICULTY_HTML, ProblemRecord, parse_oll_short
+from leetcode_anki.helpers.serialization import from_json, to_json
+from leetcode_anki.helpers.store import ProblemStore, _get_problem_store
 from csv_reader import OLLEntity
 
 CACHE_DIR = "cache"
 
+# How long cached API responses stay fresh, in seconds. Problem details
+# rarely change, lists of problems change more often
+QUESTION_CACHE_TTL = 7 * 24 * 60 * 60
+PAGE_CACHE_TTL = 24 * 60 * 60
+
+# Defaults for the fetch engine. Leetcode starts rejecting requests somewhere
+# above one request per second, so stay just below that
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RATE = 0.8
+DEFAULT_BURST = 2
+
+# Number of problem records kept in memory, the rest are rebuilt from the
+# problem store when needed
+RECORD_CACHE_SIZE = 256
+
+# Number of times a problem is put back to the queue after a failed batch
+BATCH_ATTEMPTS = 3
+
+# Number of times a page is fetched before the whole fetch is given up
+PAGE_ATTEMPTS = 3
+
 class GraphqlQuestionDetailWithOLL:
     def __init__(self, details: GraphqlQuestionDetail, oll_desc: OLLEntity) -> None:
         self.details: GraphqlQuestionDetail = details
         self.oll_desc: OLLEntity = oll_desc
 
 class LeetcodeData(metaclass=ABCMeta):
+    """
+    Problems are loaded either all at once (see `load`), or one by one when
+    a problem is asked for before the whole set is loaded. On-demand loads
+    fetch the problem together with the ones hinted with `prefetch`, so a
+    caller which knows what it'll need next gets them in a few batches
+    """
+
+    _concurrency: int = DEFAULT_CONCURRENCY
+    _rate: float = DEFAULT_RATE
+    _burst: float = DEFAULT_BURST
+    _batch_size: int = DEFAULT_BATCH_SIZE
+    _cache_ttl: float = QUESTION_CACHE_TTL
+    _resume: bool = False
+    _loading: Optional["asyncio.Future[Any]"] = None
+
     @classmethod
     def __subclasshook__(cls, subclass):
         return (hasattr(subclass, '_get_problem_data') and
@@ -36,25 +110,238 @@ class LeetcodeData(metaclass=ABCMeta):
 
     @cached_property
     def api_instance(self) -> DefaultApi:
-        return _get_leetcode_api_client()
+        # One pooled connection per worker
+        return _get_leetcode_api_client(pool_size=self._concurrency)
+
+    @cached_property
+    def _rate_limiter(self) -> TokenBucket:
+        return _get_rate_limiter(self._rate, self._burst)
+
+    @cached_property
+    def _disk_cache(self) -> DiskCache:
+        return _get_disk_cache(os.path.join(CACHE_DIR, "responses"))
+
+    @cached_property
+    def _store(self) -> ProblemStore:
+        return _get_problem_store(os.path.join(CACHE_DIR, "problems.sqlite"))
+
+    @property
+    @abstractmethod
+    def _journal_name(self) -> str:
+        """
+        Name of the checkpoint journal, unique for the set of fetched problems
+        """
+
+    @cached_property
+    def _journal(self) -> CheckpointJournal:
+        return CheckpointJournal(
+            os.path.join(CACHE_DIR, "journal", f"{self._journal_name}.jsonl")
+        )
 
     @abstractmethod
     async def _get_problem_data(self, problem_slug: str) -> GraphqlQuestionDetail:
         pass
 
+    def _get_oll_entity(self, problem_slug: str) -> Optional[OLLEntity]:
+        """
+        OLL description of the problem, if the data source has one
+        """
+        return None
+
+    @cached_property
+    def _records(self) -> "collections.OrderedDict[str, ProblemRecord]":
+        return collections.OrderedDict()
+
+    def _get_record(self, problem_slug: str) -> ProblemRecord:
+        """
+        Record of the problem. Only the RECORD_CACHE_SIZE most recently used
+        records are kept, the rest are built from the store again
+        """
+        record = self._records.get(problem_slug)
+        if record is None:
+            record = ProblemRecord.from_detail(
+                self._get_problem_data(problem_slug),  # type: ignore
+                self._get_oll_entity(problem_slug),
+            )
+            self._records[problem_slug] = record
+            if len(self._records) > RECORD_CACHE_SIZE:
+                self._records.popitem(last=False)
+        else:
+            self._records.move_to_end(problem_slug)
+        return record
+
+    @cached_property
+    def _loaded(self) -> Set[str]:
+        """
+        Problems loaded on demand
+        """
+        return set()
+
+    @cached_property
+    def _prefetch_hints(self) -> Dict[str, None]:
+        return {}
+
+    @cached_property
+    def _load_lock(self) -> threading.Lock:
+        return threading.Lock()
+
+    def _is_loaded(self, problem_slug: str) -> bool:
+        if problem_slug in self._loaded:
+            return True
+        return "_cache" in self.__dict__ and problem_slug in self._cache  # type: ignore
+
+    def prefetch(self, problem_slugs: Iterable[str]) -> None:
+        """
+        Hint that the problems will be needed soon. They're fetched, in
+        batches, together with the next problem loaded on demand
+        """
+        with self._load_lock:
+            for problem_slug in problem_slugs:
+                if not self._is_loaded(problem_slug):
+                    self._prefetch_hints[problem_slug] = None
+
+    def _fetch_slugs(self, problem_slugs: List[str]) -> Iterable[str]:
+        """
+        Fetch the problems into the problem store, returns the slugs fetched
+        """
+        return LeetcodeSlugData(
+            [OLLEntity(problem_slug, "", "") for problem_slug in problem_slugs],
+            self._concurrency,
+            self._rate,
+            self._burst,
+            self._batch_size,
+            self._cache_ttl,
+        ).refresh()
+
+    def _load_slug(self, problem_slug: str) -> None:
+        """
+        Load the problem and the prefetch hints, fetching the ones which are
+        not in the problem store or are older than `cache_ttl`
+        """
+        with self._load_lock:
+            if self._is_loaded(problem_slug):
+                return
+
+            wanted = [problem_slug] + [
+                slug
+                for slug in self._prefetch_hints
+                if slug != problem_slug and not self._is_loaded(slug)
+            ]
+            self._prefetch_hints.clear()
+
+            fresh = self._store.fresh(wanted, self._cache_ttl)
+            self._loaded.update(fresh)
+            pending = [slug for slug in wanted if slug not in fresh]
+            metrics.count("store_hits", len(fresh))
+            metrics.count("store_misses", len(pending))
+            logging.info(
+                "Loading %s problems on demand, %s to fetch", len(wanted), len(pending)
+            )
+            if pending:
+                self._loaded.update(self._fetch_slugs(pending))
+
+    async def _ensure_loaded(self, problem_slug: str) -> None:
+        """
+        Load the problem without blocking the event loop, unless it's
+        already loaded or the whole set is being loaded
+        """
+        if self._is_loaded(problem_slug):
+            return
+
+        if self._loading is not None:
+            await self._loading
+            if self._is_loaded(problem_slug):
+                return
+
+        await asyncio.get_running_loop().run_in_executor(
+            None, self._load_slug, problem_slug
+        )
+
+    def _get_stored_problem(self, problem_slug: str) -> GraphqlQuestionDetail:
+        """
+        Details of the problem, read from the problem store. Problems which
+        are not loaded yet are loaded on demand
+        """
+        if not self._is_loaded(problem_slug):
+            self._load_slug(problem_slug)
+        if not self._is_loaded(problem_slug):
+            raise ValueError(f"Problem {problem_slug} is not in cache")
+
+        detail = self._store.get(problem_slug)
+        if detail is None:
+            raise ValueError(f"Problem {problem_slug} is missing from the store")
+        return detail
+
+    def stored(self, problem_slug: str) -> GraphqlQuestionDetail:
+        """
+        Problem details straight from the problem store, for callers outside
+        of the event loop. Blocks while the problem is loaded on demand
+        """
+        return self._get_problem_data(problem_slug)  # type: ignore
+
+    def iter_records(self, problem_slugs: Iterable[str]) -> Iterator[ProblemRecord]:
+        """
+        Records of the problems one by one, without keeping them all in
+        memory. Problems which are not loaded are fetched in batches the
+        first time one of them is needed
+        """
+        if "_cache" not in self.__dict__:
+            problem_slugs = list(problem_slugs)
+            self.prefetch(problem_slugs)
+
+        for problem_slug in problem_slugs:
+            yield self._get_record(problem_slug)
+
+    async def load(self) -> None:
+        """
+        Fetch the problems without blocking the event loop.
+
+        Fetching is done with the blocking API client, so it runs in the
+        default executor while the loop keeps serving other tasks. Concurrent
+        callers wait for the same fetch
+        """
+        if "_cache" in self.__dict__:
+            return
+
+        if self._loading is None:
+            self._loading = asyncio.get_running_loop().run_in_executor(
+                None, lambda: self._cache
+            )
+
+        await self._loading
+
+    async def _get_problem_data_async(
+        self, problem_slug: str
+    ) -> GraphqlQuestionDetail:
+        await self._ensure_loaded(problem_slug)
+        return self._get_problem_data(problem_slug)  # type: ignore
+
+    async def details(self, problem_slug: str) -> GraphqlQuestionDetail:
+        """
+        Problem details as returned by the API
+        """
+        return await self._get_problem_data_async(problem_slug)
+
+    async def record(self, problem_slug: str) -> ProblemRecord:
+        """
+        Normalized record with all the problem data, built once per problem
+        """
+        await self._ensure_loaded(problem_slug)
+        return self._get_record(problem_slug)
+
     async def _get_description(self, problem_slug: str) -> str:
         """
         Problem description
         """
-        data = self._get_problem_data(problem_slug)
+        data = await self._get_problem_data_async(problem_slug)
         return data.content or "No content"  # type: ignore
 
     async def _stats(self, problem_slug: str) -> Dict[str, str]:
         """
         Various stats about problem. Such as number of accepted solutions, etc.
         """
-        data = self._get_problem_data(problem_slug)
-        logging.info("_stats %s", data)
+        data = await self._get_problem_data_async(problem_slug)
+        logging.debug("_stats %s", data)
         return json.loads(data.stats)  # type: ignore
 
     async def submissions_total(self, problem_slug: str) -> int:
@@ -80,17 +367,11 @@ class LeetcodeData(metaclass=ABCMeta):
         Problem difficulty. Returns colored HTML version, so it can be used
         directly in Anki
         """
-        data = self._get_problem_data(problem_slug)
+        data = await self._get_problem_data_async(problem_slug)
         diff = data.difficulty  # type: ignore
 
-        if diff == "Easy":
-            return "<font color='green'>Easy</font>"
-
-        if diff == "Medium":
-            return "<font color='orange'>Medium</font>"
-
-        if diff == "Hard":
-            return "<font color='red'>Hard</font>"
+        if diff in DIFFICULTY_HTML:
+            return DIFFICULTY_HTML[diff]
 
         raise ValueError(f"Incorrect difficulty: {diff}")
 
@@ -98,21 +379,21 @@ class LeetcodeData(metaclass=ABCMeta):
         """
         Problem's "available for paid subsribers" status
         """
-        data = self._get_problem_data(problem_slug)  # type: ignore
+        data = await self._get_problem_data_async(problem_slug)
         return data.is_paid_only  # type: ignore
 
     async def problem_id(self, problem_slug: str) -> str:
         """
         Numerical id of the problem
         """
-        data = self._get_problem_data(problem_slug)
+        data = await self._get_problem_data_async(problem_slug)
         return data.question_frontend_id  # type: ignore
 
     async def likes(self, problem_slug: str) -> int:
         """
         Number of likes for the problem
         """
-        data = self._get_problem_data(problem_slug)
+        data = await self._get_problem_data_async(problem_slug)
         likes = data.likes  # type: ignore
 
         if not isinstance(likes, int):
@@ -124,7 +405,7 @@ class LeetcodeData(metaclass=ABCMeta):
         """
         Number of dislikes for the problem
         """
-        data = self._get_problem_data(problem_slug)
+        data = await self._get_problem_data_async(problem_slug)
         dislikes = data.dislikes  # type: ignore
 
         if not isinstance(dislikes, int):
@@ -136,7 +417,7 @@ class LeetcodeData(metaclass=ABCMeta):
         """
         List of the tags for this problem (string slugs)
         """
-        data = self._get_problem_data(problem_slug)
+        data = await self._get_problem_data_async(problem_slug)
         tags = list(map(lambda x: x.slug, data.topic_tags))  # type: ignore
         # type: ignore
         tags.append(f"difficulty-{data.difficulty.lower()}-tag")
@@ -146,28 +427,28 @@ class LeetcodeData(metaclass=ABCMeta):
         """
         Returns percentage for frequency bar
         """
-        data = self._get_problem_data(problem_slug)
+        data = await self._get_problem_data_async(problem_slug)
         return data.freq_bar or 0  # type: ignore
 
     async def hint(self, problem_slug: str) -> float:
         """
         Returns percentage for frequency bar
         """
-        data = self._get_problem_data(problem_slug)
+        data = await self._get_problem_data_async(problem_slug)
         return data.hints or ""  # type: ignore
 
     async def title(self, problem_slug: str) -> float:
         """
         Returns problem title
         """
-        data = self._get_problem_data(problem_slug)
+        data = await self._get_problem_data_async(problem_slug)
         return data.title  # type: ignore
 
     async def category(self, problem_slug: str) -> float:
         """
         Returns problem category title
         """
-        data = self._get_problem_data(problem_slug)
+        data = await self._get_problem_data_async(problem_slug)
         return data.category_title  # type: ignore
 
     async def all_problems_handles(self) -> List[str]:
@@ -176,95 +457,231 @@ class LeetcodeData(metaclass=ABCMeta):
 
         Example: ["two-sum", "three-sum"]
         """
+        await self.load()
         return list(self._cache.keys()) # type: ignore
 
 class LeetcodeSlugData(LeetcodeData):
-    def __init__(self, problem_to_parse: List[OLLEntity]) -> None:
+    """
+    Retrieves and caches the data for the problems listed in an OLL
+    collection.
+
+    Slugs are packed into batched GraphQL queries (see `helpers.batch`) which
+    are issued from a bounded thread pool of `concurrency` workers and paced
+    by a token bucket shared across the process, allowing `rate` requests per
+    second with bursts of up to `burst` requests. Batches start at
+    `batch_size` slugs and shrink whenever Leetcode times out.
+
+    Problems found in the disk cache and not older than `cache_ttl` seconds
+    are not fetched at all.
+
+    Every fetched problem is written to a checkpoint journal. If the fetch is
+    interrupted, a new instance created with `resume=True` replays the journal
+    and only fetches the problems missing from it.
+    """
+
+    def __init__(
+        self,
+        problem_to_parse: List[OLLEntity],
+        concurrency: int = DEFAULT_CONCURRENCY,
+        rate: float = DEFAULT_RATE,
+        burst: float = DEFAULT_BURST,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        cache_ttl: float = QUESTION_CACHE_TTL,
+        resume: bool = False,
+    ) -> None:
+        if concurrency < 1:
+            raise ValueError(f"Concurrency must be at least 1: {concurrency}")
+
+        if batch_size < 1:
+            raise ValueError(f"Batch size must be at least 1: {batch_size}")
+
         self.problem_to_parse = problem_to_parse
+        self._concurrency = concurrency
+        self._rate = rate
+        self._burst = burst
+        self._batch_size = batch_size
+        self._cache_ttl = cache_ttl
+        self._resume = resume
+
+    @property
+    def _journal_name(self) -> str:
+        digest = hashlib.sha256(
+            "\n".join(problem.slug for problem in self.problem_to_parse).encode("utf-8")
+        ).hexdigest()
+        return f"slugs-{digest[:16]}"
+
+    def _sync(self) -> List[OLLEntity]:
+        """
+        Make sure every problem is in the problem store, fetching the ones
+        which are missing or older than `cache_ttl`. Returns the problems
+        available, in the order of the collection
+        """
+        stored: Set[str] = set()
+        if self._resume:
+            replayed = self._journal.replay()
+            self._store.put_many(
+                from_json(value, GraphqlQuestionDetail) for value in replayed.values()
+            )
+            stored.update(replayed)
+        else:
+            self._journal.reset()
+
+        stored |= self._store.fresh(
+            (
+                problem.slug
+                for problem in self.problem_to_parse
+                if problem.slug not in stored
+            ),
+            self._cache_ttl,
+        )
+        pending: Deque[OLLEntity] = collections.deque(
+            problem for problem in self.problem_to_parse if problem.slug not in stored
+        )
+
+        logging.info(
+            "%s problems found in cache, %s to fetch", len(stored), len(pending)
+        )
+        metrics.count("store_hits", len(stored))
+        metrics.count("store_misses", len(pending))
+        if pending:
+            stored.update(self._fetch_batches(pending))
+        self._journal.reset()
 
-    def get_problems(self):
-        problems = []
-        for problem in self.problem_to_parse[:5]:
-            logging.info("get problem: %s", problem.slug)
-            problems.extend(self._get_problems_data(problem))
+        problems = [
+            problem for problem in self.problem_to_parse if problem.slug in stored
+        ]
         logging.info("problems count: %s", len(problems))
         return problems
 
-    @cached_property
-    def _cache(
-        self,
+    def get_problems(self) -> List[GraphqlQuestionDetailWithOLL]:
+        return [
+            GraphqlQuestionDetailWithOLL(self._store.get(problem.slug), problem)
+            for problem in self._sync()
+        ]
+
+    def refresh(self) -> Dict[str, GraphqlQuestionDetail]:
+        """
+        Fetch all the problems from Leetcode, bypassing the disk cache.
+        Returns dict slug -> question details
+        """
+        self._journal.reset()
+        fetched = self._fetch_batches(collections.deque(self.problem_to_parse))
+        self._journal.reset()
+        return fetched
+
+    def _fetch_batches(
+        self, pending: Deque[OLLEntity]
     ) -> Dict[str, GraphqlQuestionDetail]:
         """
-        Cached method to return dict (problem_slug -> question details)
+        Fetch all the pending problems, keeping at most `concurrency` batches
+        in flight. Failed batches are split according to the adaptive batch
+        size and put back to the queue; a problem is given up on after
+        BATCH_ATTEMPTS failures
         """
-        problems = self.get_problems()
-        return {problem.details.title_slug: problem for problem in problems}
+        # Build the client before spawning workers, so they all share it
+        self.api_instance  # pylint: disable=pointless-statement
+        batch_size = AdaptiveBatchSize(self._batch_size)
+        failures: Dict[str, int] = collections.Counter()
+        fetched: Dict[str, GraphqlQuestionDetail] = {}
+        in_flight: Dict["Future[Dict[str, GraphqlQuestionDetail]]", List[OLLEntity]] = {}
+
+        with ThreadPoolExecutor(max_workers=self._concurrency) as executor, tqdm(
+            total=len(pending), unit="problem"
+        ) as progress:
+            try:
+                while pending or in_flight:
+                    while pending and len(in_flight) < self._concurrency:
+                        batch = [
+                            pending.popleft()
+                            for _ in range(min(batch_size.size, len(pending)))
+                        ]
+                        in_flight[executor.submit(self._get_problems_batch, batch)] = batch
+
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        batch = in_flight.pop(future)
+                        try:
+                            result = future.result()
+                        except Exception as exc:  # pylint: disable=broad-except
+                            if is_timeout(exc):
+                                batch_size.shrink()
+                            else:
+                                logging.exception("Failed to fetch batch")
+                            for problem in reversed(batch):
+                                failures[problem.slug] += 1
+                                if failures[problem.slug] < BATCH_ATTEMPTS:
+                                    pending.appendleft(problem)
+                                else:
+                                    logging.error("Giving up on problem %s", problem.slug)
+                                    progress.update(1)
+                            continue
+
+                        for slug, question_detail in result.items():
+                            self._journal.append(slug, to_json(question_detail))
+                        fetched.update(result)
+                        batch_size.grow()
+                        progress.update(len(batch))
+            except BaseException:
+                # Don't wait for the queued batches, they'll be fetched on resume
+                for future in in_flight:
+                    future.cancel()
+                raise
+
+        return fetched
 
     @retry(times=3, exceptions=(ProtocolError,), delay=5)
-    # type: ignore
-    def _get_problems_data(self, problem) -> List[GraphqlQuestionDetail]:
-        api_instance = self.api_instance
-        graphql_request = leetcode.models.graphql_query.GraphqlQuery(
-            query="""
-                query questionContent($titleSlug: String!) {
-                    question(titleSlug: $titleSlug) {
-                        content
-                        questionId
-                        questionFrontendId
-                        title
-                        titleSlug
-                        isPaidOnly
-                        difficulty
-                        likes
-                        dislikes
-                        categoryTitle
-                        freqBar
-                        topicTags {
-                            name
-                            slug
-                        }
-                        stats
-                        hints
-                    }
-                }
-            """,
-            variables=leetcode.models.graphql_query_get_question_detail_variables.GraphqlQueryGetQuestionDetailVariables(
-                title_slug=problem.slug,
-            ),
-            operation_name="questionContent",
-        )
-        time.sleep(2)  # Leetcode has a rate limiter
-        problems = []
-        try:
-            data = api_instance.graphql_post(body=graphql_request).data
-            question_detail = data.question
-            problems.append(GraphqlQuestionDetailWithOLL(question_detail, problem))
-        finally:
-            return problems
+    def _get_problems_batch(
+        self, problems: List[OLLEntity]
+    ) -> Dict[str, GraphqlQuestionDetail]:
+        slugs = [problem.slug for problem in problems]
+        logging.info("get problems: %s", ", ".join(slugs))
+        self._rate_limiter.acquire()  # Leetcode has a rate limiter
+        fetched: Dict[str, GraphqlQuestionDetail] = {}
+        for slug, question_detail in fetch_batch(self.api_instance, slugs).items():
+            if question_detail is None:
+                logging.warning("Problem %s not found", slug)
+                continue
+            fetched[slug] = question_detail
+        self._store.put_many(fetched.values())
+        return fetched
+
+    @cached_property
+    def _cache(
+        self,
+    ) -> Dict[str, OLLEntity]:
+        """
+        Cached method to return dict (problem_slug -> OLL entity) of the
+        problems available in the problem store
+        """
+        return {problem.slug: problem for problem in self._sync()}
 
     def _get_problem_data(
         self, problem_slug: str
     ) -> GraphqlQuestionDetail:
-        cache = self._cache
-        if problem_slug in cache:
-            return cache[problem_slug].details # type: ignore
-        raise ValueError(f"Problem {problem_slug} is not in cache")
+        return self._get_stored_problem(problem_slug)
+
+    @cached_property
+    def _entities(self) -> Dict[str, OLLEntity]:
+        return {problem.slug: problem for problem in self.problem_to_parse}
 
     def _get_oll_data(
         self, problem_slug: str
     ) -> OLLEntity:
-        cache = self._cache
-        if problem_slug in cache:
-            return cache[problem_slug].oll_desc # type: ignore
+        if problem_slug in self._entities and self._is_loaded(problem_slug):
+            return self._entities[problem_slug]
 
         raise ValueError(f"Problem {problem_slug} is not in cache")
 
+    def _get_oll_entity(self, problem_slug: str) -> Optional[OLLEntity]:
+        return self._get_oll_data(problem_slug)
+
     async def oll_short(self, problem_slug: str) -> str:
+        await self._ensure_loaded(problem_slug)
         data = self._get_oll_data(problem_slug)
-        extracted = data.oll_short.replace("[","").replace("]","")
-        return extracted.split(",") if extracted != "" else ""
+        return parse_oll_short(data.oll_short)  # type: ignore
 
     async def oll_desc(self, problem_slug: str) -> str:
+        await self._ensure_loaded(problem_slug)
         data = self._get_oll_data(problem_slug)
         return data.oll_desc or ""  # type: ignore
 
@@ -274,10 +691,32 @@ class LeetcodePageData(LeetcodeData):
 
     This data can be later accessed using provided methods with corresponding
     names.
+
+    Page offsets are known up front from the problems count, so up to
+    `concurrency` pages are fetched at once, paced by the shared rate limiter.
+    A failed page is fetched again on its own, up to PAGE_ATTEMPTS times.
+
+    Fetched pages are written to a checkpoint journal, so an interrupted fetch
+    can be continued by an instance created with `resume=True`.
+
+    With `light_sync=True` the pages are not fetched in full. The range is
+    listed with a few cheap fields first, and only the details of new and
+    changed problems are fetched, see `_sync_problems_data`.
     """
 
     def __init__(
-        self, start: int, stop: int, page_size: int = 1000, list_id: str = ""
+        self,
+        start: int,
+        stop: int,
+        page_size: int = 1000,
+        list_id: str = "",
+        concurrency: int = DEFAULT_CONCURRENCY,
+        rate: float = DEFAULT_RATE,
+        burst: float = DEFAULT_BURST,
+        resume: bool = False,
+        light_sync: bool = False,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        cache_ttl: float = QUESTION_CACHE_TTL,
     ) -> None:
         """
         Initialize leetcode API and disk cache for API responses
@@ -295,23 +734,111 @@ class LeetcodePageData(LeetcodeData):
             raise ValueError(
                 f"Start (){start}) must be not greater than stop ({stop})")
 
+        if concurrency < 1:
+            raise ValueError(f"Concurrency must be at least 1: {concurrency}")
+
         self._start = start
         self._stop = stop
         self._page_size = page_size
         self._list_id = list_id
+        self._concurrency = concurrency
+        self._rate = rate
+        self._burst = burst
+        self._resume = resume
+        self._light_sync = light_sync
+        self._batch_size = batch_size
+        self._cache_ttl = cache_ttl
+
+    @property
+    def _journal_name(self) -> str:
+        return (
+            f"pages-{self._list_id or 'all'}-{self._start}-{self._stop}-{self._page_size}"
+        )
 
     @cached_property
     def _cache(
         self,
-    ) -> Dict[str, GraphqlQuestionDetail]:
+    ) -> Dict[str, None]:
         """
-        Cached method to return dict (problem_slug -> question details)
+        Cached method to return dict (problem_slug -> None) of the problems
+        in the problem store, in page order. Details are read back from the
+        store one by one
         """
-        problems = self._get_problems_data()
-        return {problem.title_slug: problem for problem in problems}
+        if self._light_sync:
+            problems = self._sync_problems_data()
+        else:
+            problems = self._get_problems_data()
+            self._store.put_many(problems)
+        return dict.fromkeys(problem.title_slug for problem in problems)
 
-    @retry(times=3, exceptions=(ProtocolError,), delay=5)
+    @retry(times=3, exceptions=TRANSIENT_EXCEPTIONS, delay=5)
+    def _get_sync_page(self, skip: int, limit: int) -> List[Dict[str, Any]]:
+        self._rate_limiter.acquire()  # Leetcode has a rate limiter
+        _, rows = fetch_list_page(
+            self.api_instance, self._list_id, skip, limit, SYNC_FIELDS
+        )
+        return rows
+
+    def _sync_problems_data(self) -> List[GraphqlQuestionDetail]:
+        """
+        Two-phase sync of the problems.
+
+        First the whole range is listed with just the cheap SYNC_FIELDS. A
+        problem whose change signal matches the one stored with its cached
+        details (not older than `cache_ttl`) is taken from the cache, the
+        details of the new and changed problems are fetched in batches
+        """
+        problem_count = self._get_problems_count()
+        start = self._start
+        stop = min(self._stop, problem_count)
+
+        rows: List[Dict[str, Any]] = []
+        for skip in range(start, stop + 1, LIST_PAGE_SIZE):
+            limit = min(LIST_PAGE_SIZE, stop + 1 - skip)
+            rows.extend(self._get_sync_page(skip, limit))
+
+        stored: Set[str] = self._store.fresh(
+            (row["titleSlug"] for row in rows), self._cache_ttl
+        )
+        signatures: Dict[str, str] = {}
+        changed: Deque[OLLEntity] = collections.deque()
+        for row in rows:
+            slug = row["titleSlug"]
+            signatures[slug] = row_signature(row)
+            if slug in stored and self._store.signature(slug) == signatures[slug]:
+                continue
+            stored.discard(slug)
+            changed.append(OLLEntity(slug, "", ""))
+
+        logging.info(
+            "Light sync: %s problems listed, %s new or changed",
+            len(rows),
+            len(changed),
+        )
+        if changed:
+            fetched = LeetcodeSlugData(
+                list(changed),
+                self._concurrency,
+                self._rate,
+                self._burst,
+                self._batch_size,
+            ).refresh()
+            self._store.put_many(fetched.values(), signatures)
+            stored.update(fetched)
+
+        return [
+            self._store.get(row["titleSlug"])
+            for row in rows
+            if row["titleSlug"] in stored
+        ]
+
+    @retry(times=3, exceptions=TRANSIENT_EXCEPTIONS, delay=5)
     def _get_problems_count(self) -> int:
+        cache_key = f"count:{self._list_id}"
+        cached = self._disk_cache.get(cache_key, ttl=PAGE_CACHE_TTL)
+        if cached is not None:
+            return cached
+
         api_instance = self.api_instance
 
         graphql_request = leetcode.models.graphql_query.GraphqlQuery(
@@ -343,14 +870,22 @@ class LeetcodePageData(LeetcodeData):
             operation_name="problemsetQuestionList",
         )
 
-        time.sleep(2)  # Leetcode has a rate limiter
+        self._rate_limiter.acquire()  # Leetcode has a rate limiter
         data = api_instance.graphql_post(body=graphql_request).data
-        return data.problemset_question_list.total_num or 0
+        total_num = data.problemset_question_list.total_num or 0
+        self._disk_cache.set(cache_key, total_num)
+        return total_num
 
-    @retry(times=3, exceptions=(ProtocolError,), delay=5)
+    @retry(times=3, exceptions=TRANSIENT_EXCEPTIONS, delay=5)
     def _get_problems_data_page(
         self, offset: int, page_size: int, page: int
     ) -> List[GraphqlQuestionDetail]:
+        skip = offset + page * page_size
+        cache_key = f"page:{self._list_id}:{skip}:{page_size}"
+        cached = self._disk_cache.get(cache_key, ttl=PAGE_CACHE_TTL)
+        if cached is not None:
+            return from_json(cached, "list[GraphqlQuestionDetail]")
+
         api_instance = self.api_instance
         graphql_request = leetcode.models.graphql_query.GraphqlQuery(
             query="""
@@ -385,7 +920,7 @@ class LeetcodePageData(LeetcodeData):
             variables=leetcode.models.graphql_query_problemset_question_list_variables.GraphqlQueryProblemsetQuestionListVariables(
                 category_slug="",
                 limit=page_size,
-                skip=offset + page * page_size,
+                skip=skip,
                 filters=leetcode.models.graphql_query_problemset_question_list_variables_filter_input.GraphqlQueryProblemsetQuestionListVariablesFilterInput(
                     list_id=self._list_id
                 ),
@@ -393,11 +928,12 @@ class LeetcodePageData(LeetcodeData):
             operation_name="problemsetQuestionList",
         )
 
-        time.sleep(2)  # Leetcode has a rate limiter
+        self._rate_limiter.acquire()  # Leetcode has a rate limiter
         data = api_instance.graphql_post(
             body=graphql_request
         ).data.problemset_question_list.questions
 
+        self._disk_cache.set(cache_key, to_json(data))
         return data
 
     def _get_problems_data(
@@ -415,27 +951,128 @@ class LeetcodePageData(LeetcodeData):
 
         page_size = min(self._page_size, stop - start + 1)
 
-        problems: List[
-            GraphqlQuestionDetail
-        ] = []
-
         logging.info("Fetching %s problems %s per page",
                      stop - start + 1, page_size)
 
-        for page in tqdm(
-            range(math.ceil((stop - start + 1) / page_size)),
+        pages_count = math.ceil((stop - start + 1) / page_size)
+        pages: Dict[int, List[GraphqlQuestionDetail]] = {}
+        attempts: Dict[int, int] = collections.Counter()
+
+        if self._resume:
+            for key, value in self._journal.replay().items():
+                pages[int(key)] = from_json(value, "list[GraphqlQuestionDetail]")
+        else:
+            self._journal.reset()
+        missing_pages = [page for page in range(pages_count) if page not in pages]
+
+        # Build the client before spawning workers, so they all share it
+        self.api_instance  # pylint: disable=pointless-statement
+        with ThreadPoolExecutor(max_workers=self._concurrency) as executor, tqdm(
+            total=pages_count,
+            initial=pages_count - len(missing_pages),
             unit="problem",
             unit_scale=page_size,
-        ):
-            data = self._get_problems_data_page(start, page_size, page)
-            problems.extend(data)
+        ) as progress:
+            in_flight: Dict["Future[List[GraphqlQuestionDetail]]", int] = {
+                executor.submit(self._get_problems_data_page, start, page_size, page): page
+                for page in missing_pages
+            }
+            try:
+                while in_flight:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    # Pages are journaled as they complete, in any order. The
+                    # journal may have gaps, resume fetches whatever is missing
+                    for future in done:
+                        page = in_flight.pop(future)
+                        try:
+                            pages[page] = future.result()
+                        except Exception:  # pylint: disable=broad-except
+                            attempts[page] += 1
+                            if attempts[page] >= PAGE_ATTEMPTS:
+                                raise
+                            logging.exception(
+                                "Failed to fetch page %s, try %s/%s",
+                                page,
+                                attempts[page],
+                                PAGE_ATTEMPTS,
+                            )
+                            retry_future = executor.submit(
+                                self._get_problems_data_page, start, page_size, page
+                            )
+                            in_flight[retry_future] = page
+                            continue
+                        self._journal.append(str(page), to_json(pages[page]))
+                        progress.update(1)
+            except BaseException:
+                # Don't wait for the queued pages, they'll be fetched on resume
+                for future in in_flight:
+                    future.cancel()
+                raise
+
+        self._journal.reset()
+
+        # Reassemble pages in order
+        problems: List[GraphqlQuestionDetail] = []
+        for page in range(pages_count):
+            problems.extend(pages[page])
 
         return problems
 
     def _get_problem_data(
         self, problem_slug: str
     ) -> GraphqlQuestionDetail:
-        cache = self._cache
-        if problem_slug in cache:
-            return cache[problem_slug]
-        raise ValueError(f"Problem {problem_slug} is not in cache")
+        return self._get_stored_problem(problem_slug)
+
+
+class LeetcodeList:
+    """
+    Slugs of the problems in a Leetcode list (leetcode.com/list/<list_id>).
+
+    Only the slugs are selected, so the list is cheap to get even when the
+    details of its problems are fetched elsewhere, e.g. once for several lists
+    """
+
+    def __init__(
+        self,
+        list_id: str,
+        rate: float = DEFAULT_RATE,
+        burst: float = DEFAULT_BURST,
+        page_size: int = LIST_PAGE_SIZE,
+    ) -> None:
+        if page_size < 1:
+            raise ValueError(f"Page size must be at least 1: {page_size}")
+
+        self._list_id = list_id
+        self._rate = rate
+        self._burst = burst
+        self._page_size = page_size
+
+    @cached_property
+    def _disk_cache(self) -> DiskCache:
+        return _get_disk_cache(os.path.join(CACHE_DIR, "responses"))
+
+    @retry(times=3, exceptions=TRANSIENT_EXCEPTIONS, delay=5)
+    def _get_page(self, skip: int) -> Tuple[int, List[str]]:
+        _get_rate_limiter(self._rate, self._burst).acquire()
+        total, rows = fetch_list_page(
+            _get_leetcode_api_client(), self._list_id, skip, self._page_size
+        )
+        return total, [row["titleSlug"] for row in rows]
+
+    @cached_property
+    def slugs(self) -> List[str]:
+        cache_key = f"list:{self._list_id}"
+        cached = self._disk_cache.get(cache_key, ttl=PAGE_CACHE_TTL)
+        if cached is not None:
+            return cached
+
+        total, slugs = self._get_page(0)
+        while len(slugs) < total:
+            _, page = self._get_page(len(slugs))
+            if not page:
+                break
+            slugs.extend(page)
+
+        logging.info("List %s has %s problems", self._list_id, len(slugs))
+        self._disk_cache.set(cache_key, slugs)
+        return slugs
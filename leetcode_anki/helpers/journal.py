@@ -0,0 +1,72 @@
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict
+
+
+class CheckpointJournal:
+    """
+    Append-only journal of fetched items, used to resume interrupted fetches.
+
+    Every record is a single JSON line {"key": ..., "value": ...} which is
+    flushed to disk as soon as it is written, so at most the record being
+    written is lost if the process dies. A torn last line is ignored on replay.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    def replay(self) -> Dict[str, Any]:
+        """
+        Return all the journaled items (key -> value). Later records win
+        """
+        records: Dict[str, Any] = {}
+        complete_size = 0
+        try:
+            with open(self._path, "rb") as journal_file:
+                for line_number, line in enumerate(journal_file, start=1):
+                    if not line.endswith(b"\n"):
+                        # Torn write of the last record
+                        break
+                    complete_size += len(line)
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        logging.warning(
+                            "Skipping corrupted line %s in %s", line_number, self._path
+                        )
+                        continue
+                    records[record["key"]] = record["value"]
+            # Drop the torn record, so new records start on a fresh line
+            if os.path.getsize(self._path) > complete_size:
+                os.truncate(self._path, complete_size)
+        except FileNotFoundError:
+            pass
+
+        logging.info("Replayed %s items from %s", len(records), self._path)
+        return records
+
+    def append(self, key: str, value: Any) -> None:
+        line = json.dumps({"key": key, "value": value}) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(self._path) or ".", exist_ok=True)
+            with open(self._path, "a", encoding="utf-8") as journal_file:
+                journal_file.write(line)
+                journal_file.flush()
+                os.fsync(journal_file.fileno())
+
+    def reset(self) -> None:
+        """
+        Forget everything journaled by the previous run
+        """
+        with self._lock:
+            try:
+                os.unlink(self._path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,94 @@
+import hashlib
+import json
+from typing import Any, Dict, List, Tuple
+
+import leetcode.models.graphql_query  # type: ignore
+from leetcode.api.default_api import DefaultApi  # type: ignore
+
+# Number of slugs requested per page. Only slugs are selected, so pages can
+# be much larger than the problem pages
+LIST_PAGE_SIZE = 1000
+
+LIST_FIELDS = "titleSlug"
+
+# Cheap fields used by the light sync to tell whether a problem changed.
+# Stats and likes change all the time and are not part of the signal, the
+# content itself isn't available without fetching it
+SYNC_FIELDS = """
+    titleSlug
+    questionFrontendId
+    title
+    difficulty
+    isPaidOnly
+    topicTags {
+        slug
+    }
+"""
+
+LIST_QUERY = """
+query problemsetQuestionList($categorySlug: String, $limit: Int, $skip: Int, $filters: QuestionListFilterInput) {{
+  problemsetQuestionList: questionList(
+    categorySlug: $categorySlug
+    limit: $limit
+    skip: $skip
+    filters: $filters
+  ) {{
+    totalNum
+    questions: data {{
+      {fields}
+    }}
+  }}
+}}
+"""
+
+
+def build_list_query(
+    list_id: str, skip: int, limit: int, fields: str = LIST_FIELDS
+) -> leetcode.models.graphql_query.GraphqlQuery:
+    """
+    Query for the problems in a Leetcode list (all the problems if `list_id`
+    is empty), selecting only `fields` of every problem
+    """
+    return leetcode.models.graphql_query.GraphqlQuery(
+        query=LIST_QUERY.format(fields=fields),
+        variables={
+            "categorySlug": "",
+            "skip": skip,
+            "limit": limit,
+            "filters": {"listId": list_id} if list_id else {},
+        },
+        operation_name="problemsetQuestionList",
+    )
+
+
+def fetch_list_page(
+    api_instance: DefaultApi,
+    list_id: str,
+    skip: int,
+    limit: int,
+    fields: str = LIST_FIELDS,
+) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    Fetch one page of the list. Returns the total number of problems in the
+    list and the problems on the page (in the wire format)
+    """
+    response = api_instance.graphql_post(
+        body=build_list_query(list_id, skip, limit, fields), _preload_content=False
+    )
+    payload: Dict[str, Any] = json.loads(response.data)
+    question_list = (payload.get("data") or {}).get("problemsetQuestionList") or {}
+    return question_list.get("totalNum") or 0, question_list.get("questions") or []
+
+
+def row_signature(row: Dict[str, Any]) -> str:
+    """
+    Change signal of a problem fetched with SYNC_FIELDS
+    """
+    signal = [
+        row.get("questionFrontendId"),
+        row.get("title"),
+        row.get("difficulty"),
+        row.get("isPaidOnly"),
+        sorted(tag.get("slug") for tag in row.get("topicTags") or []),
+    ]
+    return hashlib.sha256(json.dumps(signal).encode("utf-8")).hexdigest()
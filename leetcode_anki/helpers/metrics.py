@@ -0,0 +1,197 @@
+"""
+Run-wide timers and counters.
+
+Hot paths record how long each stage took (`timed`) and count what they
+handled (`count`). Everything is aggregated in memory, so recording costs a
+couple of clock reads and a dict update; the report at the end of the run
+tells where the time went:
+
+    with timed("graphql"):
+        response = api_instance.graphql_post(...)
+    count("bytes_fetched", len(response.data))
+
+    logging.info("Run metrics:\n%s", format_report(report()))
+"""
+import collections
+import contextlib
+import cProfile
+import io
+import json
+import logging
+import pstats
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional
+
+PROFILERS = ("cprofile", "pyinstrument")
+
+
+class StageTimer:
+    """
+    Aggregated timings of one stage
+    """
+
+    __slots__ = ("calls", "total", "min", "max")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.calls += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "calls": self.calls,
+            "total": round(self.total, 6),
+            "mean": round(self.total / self.calls, 6) if self.calls else 0.0,
+            "min": round(self.min, 6) if self.calls else 0.0,
+            "max": round(self.max, 6),
+        }
+
+
+class Metrics:
+    """
+    Timers and counters shared by all the threads of the run
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._timers: Dict[str, StageTimer] = collections.defaultdict(StageTimer)
+        self._counters: "collections.Counter[str]" = collections.Counter()
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self._timers[stage].add(seconds)
+
+    def count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += value
+
+    @contextlib.contextmanager
+    def timed(self, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "elapsed": round(time.monotonic() - self._started, 6),
+                "stages": {
+                    stage: timer.to_dict()
+                    for stage, timer in sorted(
+                        self._timers.items(), key=lambda item: -item[1].total
+                    )
+                },
+                "counters": dict(sorted(self._counters.items())),
+            }
+
+
+_metrics = Metrics()
+
+
+def timed(stage: str) -> "contextlib.AbstractContextManager[None]":
+    """
+    Time the block as one call of `stage`
+    """
+    return _metrics.timed(stage)
+
+
+def count(name: str, value: int = 1) -> None:
+    _metrics.count(name, value)
+
+
+def report() -> Dict[str, Any]:
+    """
+    Timers (slowest stage first) and counters recorded since the start of
+    the run (or the last `reset`)
+    """
+    return _metrics.report()
+
+
+def reset() -> None:
+    global _metrics  # pylint: disable=global-statement
+    _metrics = Metrics()
+
+
+def format_report(data: Dict[str, Any]) -> str:
+    """
+    Text version of `report`
+    """
+    lines = [
+        f"{'stage':<24}{'calls':>10}{'total, s':>12}{'mean, ms':>12}{'max, ms':>12}"
+    ]
+    for stage, timer in data["stages"].items():
+        lines.append(
+            f"{stage:<24}{timer['calls']:>10}{timer['total']:>12.3f}"
+            f"{timer['mean'] * 1000:>12.2f}{timer['max'] * 1000:>12.2f}"
+        )
+    for name, value in data["counters"].items():
+        lines.append(f"{name:<24}{value:>10}")
+    lines.append(f"{'elapsed, s':<24}{data['elapsed']:>10.3f}")
+    return "\n".join(lines)
+
+
+def write_report(path: str, data: Dict[str, Any]) -> None:
+    """
+    Write the JSON report to `path`
+    """
+    with open(path, "w", encoding="utf-8") as report_file:
+        json.dump(data, report_file, indent=2)
+        report_file.write("\n")
+
+
+@contextlib.contextmanager
+def profiled(profiler: Optional[str], output: Optional[str] = None) -> Iterator[None]:
+    """
+    Profile the block with cProfile or pyinstrument (if installed). The
+    cProfile stats are written to `output` (see `python -m pstats`), the
+    pyinstrument report to `output` as HTML; the top of the profile is
+    logged either way
+    """
+    if profiler is None:
+        yield
+        return
+
+    if profiler not in PROFILERS:
+        raise ValueError(f"Unknown profiler: {profiler}")
+
+    if profiler == "cprofile":
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            stream = io.StringIO()
+            stats = pstats.Stats(profile, stream=stream)
+            stats.sort_stats("cumulative").print_stats(25)
+            logging.info("Profile:\n%s", stream.getvalue())
+            if output:
+                profile.dump_stats(output)
+        return
+
+    try:
+        import pyinstrument  # type: ignore # pylint: disable=import-outside-toplevel
+    except ImportError as exc:
+        raise ValueError("pyinstrument is not installed") from exc
+
+    sampler = pyinstrument.Profiler(async_mode="enabled")
+    sampler.start()
+    try:
+        yield
+    finally:
+        sampler.stop()
+        logging.info("Profile:\n%s", sampler.output_text())
+        if output:
+            with open(output, "w", encoding="utf-8") as output_file:
+                output_file.write(sampler.output_html())
@@ -0,0 +1,85 @@
+import functools
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+
+    Tokens are refilled continuously at `rate` tokens per second up to
+    `capacity`. Every request to the API takes one token, so `rate` is the
+    sustained number of requests per second and `capacity` is the size of the
+    allowed burst.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1) -> None:
+        if rate <= 0:
+            raise ValueError(f"Rate must be positive: {rate}")
+
+        if capacity < 1:
+            raise ValueError(f"Capacity must be at least 1: {capacity}")
+
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._tokens = min(self._capacity, self._tokens + elapsed * self._rate)
+        self._updated = now
+
+    def reserve(self, tokens: float = 1) -> float:
+        """
+        Take `tokens` from the bucket and return the number of seconds the
+        caller has to wait before it is allowed to proceed
+        """
+        if tokens > self._capacity:
+            raise ValueError(
+                f"Can't take {tokens} tokens from a bucket of {self._capacity}"
+            )
+
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self._rate
+
+    def try_reserve(self, tokens: float = 1) -> float:
+        """
+        Take `tokens` only if they are available right away. Returns 0 on
+        success, otherwise the number of seconds until they would be
+        available (the bucket is left untouched)
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self._rate
+
+    def acquire(self, tokens: float = 1) -> None:
+        """
+        Block the current thread until `tokens` are available
+        """
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_rate_limiter(rate: float, capacity: float = 1) -> TokenBucket:
+    """
+    Rate limiter shared by every fetcher in the process.
+
+    This is a singleton per (rate, capacity) pair, so all the data sources
+    configured with the same settings draw from the same bucket
+    """
+    return TokenBucket(rate, capacity)
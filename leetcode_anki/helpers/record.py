@@ -0,0 +1,142 @@
+import json
+from typing import List, Optional, Union
+
+from leetcode.models.graphql_question_detail import GraphqlQuestionDetail  # type: ignore
+
+from csv_reader import OLLEntity, split_oll_short
+
+DIFFICULTY_HTML = {
+    "Easy": "<font color='green'>Easy</font>",
+    "Medium": "<font color='orange'>Medium</font>",
+    "Hard": "<font color='red'>Hard</font>",
+}
+
+
+def parse_oll_short(oll_short: Union[List[str], str]) -> Union[List[str], str]:
+    """
+    Parse "[two-pointer,hash-map]" into ["two-pointer", "hash-map"]. Entities
+    read from CSV files come with the list parsed already
+    """
+    if not isinstance(oll_short, list):
+        oll_short = split_oll_short(oll_short or "")
+    return oll_short or ""
+
+
+class ProblemRecord:
+    """
+    Normalized data of a single problem.
+
+    Built once per problem from the API response: stats are parsed, tags
+    extracted and difficulty rendered to HTML, so notes can be generated
+    without going back to the raw response
+    """
+
+    __slots__ = (
+        "slug",
+        "problem_id",
+        "title",
+        "category",
+        "content",
+        "difficulty",
+        "difficulty_html",
+        "paid",
+        "likes",
+        "dislikes",
+        "submissions_total",
+        "submissions_accepted",
+        "accept_rate",
+        "freq_bar",
+        "hints",
+        "tags",
+        "oll_short",
+        "oll_desc",
+    )
+
+    def __init__(
+        self,
+        slug: str,
+        problem_id: str,
+        title: str,
+        category: str,
+        content: str,
+        difficulty: str,
+        paid: bool,
+        likes: int,
+        dislikes: int,
+        submissions_total: int,
+        submissions_accepted: int,
+        freq_bar: float,
+        hints: Union[List[str], str],
+        tags: List[str],
+        oll_short: Union[List[str], str, None] = None,
+        oll_desc: Optional[str] = None,
+    ) -> None:
+        if difficulty not in DIFFICULTY_HTML:
+            raise ValueError(f"Incorrect difficulty: {difficulty}")
+
+        if not isinstance(likes, int):
+            raise ValueError(f"Likes should be int: {likes}")
+
+        if not isinstance(dislikes, int):
+            raise ValueError(f"Dislikes should be int: {dislikes}")
+
+        self.slug = slug
+        self.problem_id = problem_id
+        self.title = title
+        self.category = category
+        self.content = content
+        self.difficulty = difficulty
+        self.difficulty_html = DIFFICULTY_HTML[difficulty]
+        self.paid = paid
+        self.likes = likes
+        self.dislikes = dislikes
+        self.submissions_total = submissions_total
+        self.submissions_accepted = submissions_accepted
+        self.accept_rate = (
+            int(submissions_accepted / submissions_total * 100)
+            if submissions_total
+            else 0
+        )
+        self.freq_bar = freq_bar
+        self.hints = hints
+        self.tags = tags
+        self.oll_short = oll_short
+        self.oll_desc = oll_desc
+
+    @classmethod
+    def from_detail(
+        cls, detail: GraphqlQuestionDetail, oll: Optional[OLLEntity] = None
+    ) -> "ProblemRecord":
+        stats = json.loads(detail.stats)
+        tags = [tag.slug for tag in detail.topic_tags or []]
+        tags.append(f"difficulty-{detail.difficulty.lower()}-tag")
+        return cls(
+            slug=detail.title_slug,
+            problem_id=detail.question_frontend_id,
+            title=detail.title,
+            category=detail.category_title,
+            content=detail.content or "No content",
+            difficulty=detail.difficulty,
+            paid=detail.is_paid_only,
+            likes=detail.likes,
+            dislikes=detail.dislikes,
+            submissions_total=int(stats["totalSubmissionRaw"]),
+            submissions_accepted=int(stats["totalAcceptedRaw"]),
+            freq_bar=detail.freq_bar or 0,
+            hints=detail.hints or "",
+            tags=tags,
+            oll_short=parse_oll_short(oll.oll_short) if oll else None,
+            oll_desc=(oll.oll_desc or "") if oll else None,
+        )
+
+    def __getstate__(self) -> tuple:
+        # Plain tuple of the slot values keeps the pickled records compact
+        # when they are shipped to worker processes
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state: tuple) -> None:
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+    def __repr__(self) -> str:
+        return f"ProblemRecord({self.slug!r})"
@@ -0,0 +1,365 @@
+"""
+Record/replay of Leetcode GraphQL traffic and a local stand-in server.
+
+Set LEETCODE_RECORD_DIR to record every successful GraphQL response the
+client receives into a fixture directory. The stand-in server serves such
+fixtures back (and can synthesize problem lists of any size) with
+configurable latency, error rate and rate limiting, so the fetch path can be
+exercised and benchmarked without talking to leetcode.com. Point the client
+to it with LEETCODE_API_HOST, it hands out a CSRF token like leetcode.com:
+
+    python -m leetcode_anki.helpers.replay --fixtures fixtures/ --port 8080
+    LEETCODE_API_HOST=http://127.0.0.1:8080 LEETCODE_SESSION_ID=x \\
+        python cli.py anki
+"""
+import argparse
+import hashlib
+import http.server
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import leetcode.rest  # type: ignore
+
+from leetcode_anki.helpers.cache import atomic_write
+from leetcode_anki.helpers.ratelimit import TokenBucket
+
+GRAPHQL_PATH = "/graphql"
+
+# CSRF token the stand-in server hands out
+STAND_IN_CSRF_TOKEN = "stand-in"
+
+# (HTTP status, JSON payload)
+Response = Tuple[int, Any]
+Responder = Callable[[Dict[str, Any]], Optional[Response]]
+
+
+def fixture_key(body: Dict[str, Any]) -> str:
+    """
+    Identity of a GraphQL request: its query (whitespace-insensitive),
+    variables and operation name
+    """
+    canonical = {
+        "query": " ".join((body.get("query") or "").split()),
+        "variables": body.get("variables") or {},
+        "operationName": body.get("operationName"),
+    }
+    return hashlib.sha256(
+        json.dumps(canonical, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+class FixtureStore:
+    """
+    Directory of recorded responses, one JSON file per request
+    """
+
+    def __init__(self, directory: str) -> None:
+        self._directory = directory
+
+    def _path(self, body: Dict[str, Any]) -> str:
+        return os.path.join(self._directory, f"{fixture_key(body)}.json")
+
+    def load(self, body: Dict[str, Any]) -> Optional[Response]:
+        try:
+            with open(self._path(body), encoding="utf-8") as fixture_file:
+                fixture = json.load(fixture_file)
+        except FileNotFoundError:
+            return None
+
+        return fixture["status"], fixture["response"]
+
+    def save(self, body: Dict[str, Any], status: int, payload: Any) -> None:
+        with atomic_write(self._path(body), "w", encoding="utf-8") as tmp_file:
+            json.dump(
+                {"request": body, "status": status, "response": payload},
+                tmp_file,
+            )
+
+    def __call__(self, body: Dict[str, Any]) -> Optional[Response]:
+        return self.load(body)
+
+
+class RecordingRESTClient(leetcode.rest.RESTClientObject):
+    """
+    REST client which saves every successful GraphQL response to a fixture
+    store
+    """
+
+    def __init__(self, configuration: Any, store: FixtureStore) -> None:
+        super().__init__(configuration)
+        self._store = store
+
+    def request(self, method: str, url: str, *args: Any, **kwargs: Any) -> Any:
+        response = super().request(method, url, *args, **kwargs)
+        body = kwargs.get("body")
+        if url.endswith(GRAPHQL_PATH) and isinstance(body, dict):
+            # Reading `data` caches it, the caller still gets the content
+            self._store.save(body, response.status, json.loads(response.data))
+        return response
+
+
+def synthetic_slug(index: int) -> str:
+    return f"problem-{index}"
+
+
+def synthetic_question(index: int, content_size: int = 2048) -> Dict[str, Any]:
+    """
+    Deterministic made up problem in the GraphQL wire format
+    """
+    rng = random.Random(index)
+    total = rng.randint(1000, 1000000)
+    return {
+        "content": f"<p>Problem {index}</p>"
+        + "<p>lorem ipsum</p>" * (content_size // 18),
+        "questionId": str(index),
+        "questionFrontendId": str(index),
+        "title": f"Problem {index}",
+        "titleSlug": synthetic_slug(index),
+        "isPaidOnly": index % 7 == 0,
+        "difficulty": ("Easy", "Medium", "Hard")[index % 3],
+        "likes": rng.randint(0, 10000),
+        "dislikes": rng.randint(0, 1000),
+        "categoryTitle": "Algorithms",
+        "freqBar": rng.uniform(0, 100),
+        "topicTags": [{"name": "Array", "slug": "array"}],
+        "stats": json.dumps(
+            {
+                "totalSubmissionRaw": total,
+                "totalAcceptedRaw": rng.randint(0, total),
+            }
+        ),
+        "hints": [f"Hint for problem {index}"],
+    }
+
+
+class SyntheticLeetcode:
+    """
+    Responder which makes up `problem_count` problems (problem-1 ...
+    problem-N) and answers the queries this project sends: problem list
+    pages, question batches and the current user
+    """
+
+    def __init__(self, problem_count: int, content_size: int = 2048) -> None:
+        self._problem_count = problem_count
+        self._content_size = content_size
+
+    def _index(self, slug: str) -> Optional[int]:
+        match = re.fullmatch(r"problem-(\d+)", slug)
+        if not match or not 1 <= int(match.group(1)) <= self._problem_count:
+            return None
+        return int(match.group(1))
+
+    def _question_list(self, variables: Dict[str, Any]) -> Dict[str, Any]:
+        skip = variables.get("skip") or 0
+        limit = variables.get("limit") or 0
+        stop = min(self._problem_count, skip + limit)
+        return {
+            "problemsetQuestionList": {
+                "totalNum": self._problem_count,
+                "questions": [
+                    synthetic_question(index + 1, self._content_size)
+                    for index in range(skip, stop)
+                ],
+            }
+        }
+
+    def _question_batch(self, variables: Dict[str, Any]) -> Dict[str, Any]:
+        data: Dict[str, Any] = {}
+        for name, slug in variables.items():
+            index = self._index(slug)
+            data[f"q{name[1:]}"] = (
+                synthetic_question(index, self._content_size) if index else None
+            )
+        return data
+
+    def __call__(self, body: Dict[str, Any]) -> Optional[Response]:
+        variables = body.get("variables") or {}
+        operation = body.get("operationName")
+        if operation == "problemsetQuestionList":
+            return 200, {"data": self._question_list(variables)}
+        if operation == "questionContentBatch":
+            return 200, {"data": self._question_batch(variables)}
+        if "user" in (body.get("query") or ""):
+            return 200, {
+                "data": {"user": {"username": "stand-in", "isCurrentUserPremium": False}}
+            }
+        return None
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    server: "StandInServer"
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self, status: int, payload: Any, headers: Dict[str, str]) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        # The home page sets the CSRF token, like leetcode.com does
+        if self.path != "/":
+            self._reply(404, {"errors": [{"message": "Not found"}]}, {})
+            return
+
+        self._reply(200, {}, {"Set-Cookie": f"csrftoken={STAND_IN_CSRF_TOKEN}; Path=/"})
+
+    def do_POST(self) -> None:  # pylint: disable=invalid-name
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if self.path.rstrip("/") != GRAPHQL_PATH:
+            self._reply(404, {"errors": [{"message": "Not found"}]}, {})
+            return
+
+        status, payload, headers = self.server.respond(body)
+        self._reply(status, payload, headers)
+
+    def log_message(self, format: str, *args: Any) -> None:  # pylint: disable=redefined-builtin
+        logging.debug("Stand-in server: " + format, *args)
+
+
+class StandInServer(http.server.ThreadingHTTPServer):
+    """
+    Local replacement of leetcode.com/graphql.
+
+    Requests are answered by the first of `responders` which knows the
+    query. Every response is delayed by `latency` seconds, `error_rate` of
+    the requests fail with 500 and requests above `rate` per second (with
+    bursts of `burst`) are rejected with 429 and a Retry-After header
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        responders: List[Responder],
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0,
+        error_rate: float = 0,
+        rate: Optional[float] = None,
+        burst: int = 1,
+        seed: Optional[int] = None,
+    ) -> None:
+        super().__init__((host, port), _Handler)
+        self._responders = responders
+        self._latency = latency
+        self._error_rate = error_rate
+        self._bucket = TokenBucket(rate, burst) if rate else None
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"requests": 0, "errors": 0, "rate_limited": 0, "unknown": 0}
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+    def respond(self, body: Dict[str, Any]) -> Tuple[int, Any, Dict[str, str]]:
+        self._count("requests")
+
+        if self._bucket:
+            wait = self._bucket.try_reserve()
+            if wait > 0:
+                self._count("rate_limited")
+                return 429, {"errors": [{"message": "Too many requests"}]}, {
+                    "Retry-After": str(max(1, round(wait)))
+                }
+
+        if self._latency:
+            time.sleep(self._latency)
+
+        with self._lock:
+            failed = self._random.random() < self._error_rate
+        if failed:
+            self._count("errors")
+            return 500, {"errors": [{"message": "Injected error"}]}, {}
+
+        for responder in self._responders:
+            response = responder(body)
+            if response is not None:
+                return response[0], response[1], {}
+
+        self._count("unknown")
+        logging.warning(
+            "Stand-in server: no response for %s", body.get("operationName")
+        )
+        return 400, {"errors": [{"message": "Unknown query"}]}, {}
+
+    def start(self) -> "StandInServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> "StandInServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Leetcode GraphQL stand-in server")
+    parser.add_argument("--fixtures", help="Directory with recorded responses")
+    parser.add_argument(
+        "--synthetic",
+        type=int,
+        default=0,
+        help="Make up this many problems for the queries without fixtures",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0, help="Seconds")
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--rate", type=float, help="Requests per second")
+    parser.add_argument("--burst", type=int, default=1)
+    args = parser.parse_args()
+
+    responders: List[Responder] = []
+    if args.fixtures:
+        responders.append(FixtureStore(args.fixtures))
+    if args.synthetic:
+        responders.append(SyntheticLeetcode(args.synthetic))
+
+    logging.basicConfig(level=logging.INFO)
+    server = StandInServer(
+        responders,
+        args.host,
+        args.port,
+        args.latency,
+        args.error_rate,
+        args.rate,
+        args.burst,
+    )
+    logging.info("Serving on %s", server.url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
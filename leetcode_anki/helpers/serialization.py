@@ -0,0 +1,63 @@
+import re
+from typing import Any, Union
+
+import leetcode.models  # type: ignore
+
+_PRIMITIVE_TYPES = (str, int, float, bool, bytes)
+_NATIVE_TYPES = {"int", "long", "float", "str", "bool", "object"}
+
+
+def to_json(obj: Any) -> Any:
+    """
+    Convert swagger model (or a list/dict of them) to plain JSON-compatible
+    data, using the same keys Leetcode uses on the wire
+    """
+    if obj is None or isinstance(obj, _PRIMITIVE_TYPES):
+        return obj
+
+    if isinstance(obj, (list, tuple)):
+        return [to_json(item) for item in obj]
+
+    if isinstance(obj, dict):
+        return {key: to_json(value) for key, value in obj.items()}
+
+    return {
+        obj.attribute_map[attr]: to_json(getattr(obj, attr))
+        for attr in obj.swagger_types
+        if getattr(obj, attr) is not None
+    }
+
+
+def from_json(data: Any, klass: Union[str, type]) -> Any:
+    """
+    Inverse of `to_json`. `klass` is either a model class or a swagger type
+    string, e.g. "GraphqlQuestionDetail" or "list[GraphqlQuestionDetail]"
+    """
+    if data is None:
+        return None
+
+    if isinstance(klass, str):
+        if klass.startswith("list["):
+            sub_klass = re.match(r"list\[(.*)\]", klass).group(1)  # type: ignore
+            return [from_json(item, sub_klass) for item in data]
+
+        if klass.startswith("dict("):
+            sub_klass = re.match(r"dict\(([^,]*), (.*)\)", klass).group(2)  # type: ignore
+            return {key: from_json(value, sub_klass) for key, value in data.items()}
+
+        if klass in _NATIVE_TYPES:
+            return data
+
+        klass = getattr(leetcode.models, klass)
+
+    if not klass.swagger_types:  # type: ignore
+        # "AnyOf" models carry the raw data
+        return data
+
+    kwargs = {}
+    for attr, attr_type in klass.swagger_types.items():  # type: ignore
+        key = klass.attribute_map[attr]  # type: ignore
+        if key in data:
+            kwargs[attr] = from_json(data[key], attr_type)
+
+    return klass(**kwargs)  # type: ignore
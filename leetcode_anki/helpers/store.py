@@ -0,0 +1,209 @@
+import functools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from leetcode.models.graphql_question_detail import GraphqlQuestionDetail  # type: ignore
+
+from leetcode_anki.helpers.serialization import from_json, to_json
+
+try:
+    import zstandard  # type: ignore
+except ImportError:  # zstd is optional, zlib is always available
+    zstandard = None
+
+# SQLite limits the number of parameters of a statement
+_QUERY_CHUNK = 500
+
+# Part of the database file SQLite is allowed to memory-map
+MMAP_SIZE = 256 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS problems (
+    slug TEXT PRIMARY KEY,
+    stored_at REAL NOT NULL,
+    codec TEXT NOT NULL,
+    meta BLOB NOT NULL,
+    content BLOB NOT NULL,
+    signature TEXT
+)
+"""
+
+
+def _compress(data: bytes) -> Tuple[str, bytes]:
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=9).compress(data)
+    return "zlib", zlib.compress(data, 9)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("Problem store is zstd-compressed, install zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unknown codec: {codec}")
+
+
+class ProblemStore:
+    """
+    Local store of problem details.
+
+    Every problem is one row of an SQLite database, keyed by slug. The HTML
+    content (the bulk of the data) and the rest of the details are
+    compressed separately (zstd if installed, zlib otherwise), so problems
+    are read one by one, and the content only when it is needed, instead of
+    keeping every deserialized problem in memory for the whole run.
+
+    Readers and writers in several threads share one connection guarded by a
+    lock; each write is a short transaction.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        # Opened on first use, so creating a store costs nothing
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self._path) or ".", exist_ok=True)
+            connection = sqlite3.connect(self._path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+            connection.execute(SCHEMA)
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def put_many(
+        self,
+        details: Iterable[GraphqlQuestionDetail],
+        signatures: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """
+        Store problem details, replacing the previous versions. `signatures`
+        are the light sync change signals of the problems (slug -> signal),
+        a problem without one keeps its previous signal
+        """
+        rows = []
+        now = time.time()
+        for detail in details:
+            meta = to_json(detail)
+            content = (meta.pop("content", None) or "").encode("utf-8")
+            codec, meta_blob = _compress(json.dumps(meta).encode("utf-8"))
+            _, content_blob = _compress(content)
+            signature = (signatures or {}).get(detail.title_slug)
+            rows.append(
+                (detail.title_slug, now, codec, meta_blob, content_blob, signature)
+            )
+
+        with self._lock:
+            with self._db:
+                self._db.executemany(
+                    """
+                    INSERT INTO problems VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(slug) DO UPDATE SET
+                        stored_at=excluded.stored_at,
+                        codec=excluded.codec,
+                        meta=excluded.meta,
+                        content=excluded.content,
+                        signature=COALESCE(excluded.signature, problems.signature)
+                    """,
+                    rows,
+                )
+
+    def put(
+        self, detail: GraphqlQuestionDetail, signature: Optional[str] = None
+    ) -> None:
+        self.put_many([detail], {detail.title_slug: signature} if signature else None)
+
+    def _row(self, slug: str, columns: str) -> Optional[Tuple[Any, ...]]:
+        with self._lock:
+            return self._db.execute(
+                f"SELECT {columns} FROM problems WHERE slug = ?", (slug,)
+            ).fetchone()
+
+    def get(
+        self, slug: str, ttl: Optional[float] = None
+    ) -> Optional[GraphqlQuestionDetail]:
+        """
+        Problem details, or None if the problem is not stored or was stored
+        more than `ttl` seconds ago
+        """
+        row = self._row(slug, "stored_at, codec, meta, content")
+        if row is None:
+            return None
+
+        stored_at, codec, meta_blob, content_blob = row
+        if ttl is not None and time.time() - stored_at > ttl:
+            return None
+
+        meta = json.loads(_decompress(codec, meta_blob))
+        meta["content"] = _decompress(codec, content_blob).decode("utf-8") or None
+        return from_json(meta, GraphqlQuestionDetail)
+
+    def content(self, slug: str) -> Optional[str]:
+        """
+        HTML content of the problem alone
+        """
+        row = self._row(slug, "codec, content")
+        if row is None:
+            return None
+        return _decompress(row[0], row[1]).decode("utf-8")
+
+    def signature(self, slug: str) -> Optional[str]:
+        row = self._row(slug, "signature")
+        return row[0] if row else None
+
+    def fresh(self, slugs: Iterable[str], ttl: Optional[float] = None) -> Set[str]:
+        """
+        Those of the slugs which are stored, and not longer than `ttl` ago
+        """
+        slugs = list(slugs)
+        min_stored_at = 0.0 if ttl is None else time.time() - ttl
+        found: Set[str] = set()
+        with self._lock:
+            for offset in range(0, len(slugs), _QUERY_CHUNK):
+                chunk = slugs[offset : offset + _QUERY_CHUNK]
+                placeholders = ", ".join("?" * len(chunk))
+                found.update(
+                    slug
+                    for (slug,) in self._db.execute(
+                        f"SELECT slug FROM problems WHERE stored_at >= ? "
+                        f"AND slug IN ({placeholders})",
+                        [min_stored_at, *chunk],
+                    )
+                )
+        return found
+
+    def slugs(self) -> List[str]:
+        with self._lock:
+            return [slug for (slug,) in self._db.execute("SELECT slug FROM problems")]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM problems").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+@functools.lru_cache(maxsize=None)
+def _get_problem_store(path: str) -> ProblemStore:
+    """
+    Problem store shared by every data source in the process
+    """
+    logging.info("Problem store: %s", path)
+    return ProblemStore(path)
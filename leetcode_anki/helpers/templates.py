@@ -0,0 +1,210 @@
+"""
+Page and card templates shared by the Anki notes and the PDF pages.
+
+Templates use the Anki syntax: `{{Field}}` is replaced by the field,
+`{{#Field}}...{{/Field}}` is kept only when the field isn't empty and
+`{{^Field}}...{{/Field}}` only when it is. A template is parsed once, when
+it's created; rendering a problem is then a walk over the parsed parts:
+
+    PROBLEM_PAGE.render(record_fields(record))
+
+The card templates are rendered by Anki itself, their source goes to the
+note model as is.
+"""
+import re
+from typing import Dict, List, Mapping, Tuple, Union
+
+from leetcode_anki.helpers.record import ProblemRecord
+
+_TAG = re.compile(r"{{([#^/]?)([^{}]+)}}")
+
+# A part is either a literal or a (kind, field, children) tag, where kind is
+# "" for a field and "#" or "^" for a section
+_Part = Union[str, Tuple[str, str, list]]
+
+
+def _compile(source: str) -> List[_Part]:
+    root: List[_Part] = []
+    stack: List[Tuple[str, List[_Part]]] = [("", root)]
+    position = 0
+    for match in _TAG.finditer(source):
+        if match.start() > position:
+            stack[-1][1].append(source[position : match.start()])
+        position = match.end()
+        kind, name = match.group(1), match.group(2).strip()
+        if kind == "/":
+            if len(stack) == 1 or stack[-1][0] != name:
+                raise ValueError(f"Unexpected end of section: {name}")
+            stack.pop()
+        elif kind:
+            children: List[_Part] = []
+            stack[-1][1].append((kind, name, children))
+            stack.append((name, children))
+        else:
+            stack[-1][1].append(("", name, []))
+    if len(stack) > 1:
+        raise ValueError(f"Unclosed section: {stack[-1][0]}")
+    if position < len(source):
+        root.append(source[position:])
+    return root
+
+
+def _render(parts: List[_Part], fields: Mapping[str, str], output: List[str]) -> None:
+    for part in parts:
+        if isinstance(part, str):
+            output.append(part)
+            continue
+        kind, name, children = part
+        value = fields.get(name, "")
+        if not kind:
+            output.append(value)
+        elif bool(value.strip()) == (kind == "#"):
+            _render(children, fields, output)
+
+
+class Template:
+    """
+    Template parsed once and rendered with the fields of any number of
+    problems. Unknown fields render empty
+    """
+
+    __slots__ = ("source", "_parts")
+
+    def __init__(self, source: str) -> None:
+        self.source = source
+        self._parts = _compile(source)
+
+    def render(self, fields: Mapping[str, str]) -> str:
+        output: List[str] = []
+        _render(self._parts, fields, output)
+        return "".join(output)
+
+    def __repr__(self) -> str:
+        return f"Template({self.source[:30]!r})"
+
+
+# Fields of the note model, in the order of the note fields
+FIELDS = [
+    "Slug",
+    "Id",
+    "Title",
+    "Topic",
+    "Content",
+    "Difficulty",
+    "Paid",
+    "Likes",
+    "Dislikes",
+    "SubmissionsTotal",
+    "SubmissionsAccepted",
+    "SubmissionAcceptRate",
+    "Frequency",
+    "Hints",
+]
+
+# Extra fields of the model with the One Line Leet descriptions, by the
+# name the templates and `record_fields` refer to them
+OLL_WAYS = "OLL Ways"
+OLL_DESCRIPTION = "OLL Description"
+
+# The model name of the description has a trailing space, which has to stay
+# for the decks already imported. Anki, like `Template`, ignores the spaces
+# around the name in a tag
+OLL_FIELDS = [OLL_WAYS, OLL_DESCRIPTION + " "]
+
+CARD_FRONT = Template(
+    """
+<h2>{{Id}}. {{Title}}</h2>
+<b>Difficulty:</b> {{Difficulty}}<br/>
+&#128077; {{Likes}} &#128078; {{Dislikes}}<br/>
+<b>Submissions (total/accepted):</b>
+{{SubmissionsTotal}}/{{SubmissionsAccepted}}
+({{SubmissionAcceptRate}}%)
+<br/>
+<b>Topic:</b> {{Topic}}<br/>
+<b>Frequency:</b>
+<progress value="{{Frequency}}" max="100">
+{{Frequency}}%
+</progress>
+<br/>
+<b>URL:</b>
+<a href='https://leetcode.com/problems/{{Slug}}/'>
+    https://leetcode.com/problems/{{Slug}}/
+</a>
+<br/>
+<h3>Description</h3>
+{{Content}}
+"""
+)
+
+_CARD_BACK = """
+{{FrontSide}}
+<hr id="answer">
+<b>Discuss URL:</b>
+<a href='https://leetcode.com/problems/{{Slug}}/discuss/'>
+    https://leetcode.com/problems/{{Slug}}/discuss/
+</a>
+<br/>
+<b>Solution URL:</b>
+<a href='https://leetcode.com/problems/{{Slug}}/solution/'>
+    https://leetcode.com/problems/{{Slug}}/solution/
+</a>
+<br/>
+<b>Hints:</b>
+{{Hints}}
+"""
+
+CARD_BACK = Template(_CARD_BACK)
+
+OLL_CARD_BACK = Template(
+    _CARD_BACK
+    + f"""<br/>
+<b>One Line Leet:</b>
+<pre>{{{{{OLL_WAYS}}}}}</pre>
+<p>{{{{{OLL_DESCRIPTION}}}}}</p>
+<br/>
+"""
+)
+
+# Standalone page of a problem, rendered to PDF
+PROBLEM_PAGE = Template(
+    "<!DOCTYPE html>"
+    '<html lang="en">'
+    '<head><meta charset="utf-8" /><title>{{Id}}. {{Title}}</title></head>'
+    "<body>"
+    "<h1>{{Id}}. {{Title}}</h1>"
+    "<p>{{Difficulty}} &middot; {{Topic}}</p>"
+    "{{Content}}"
+    f"{{{{#{OLL_DESCRIPTION}}}}}"
+    f"<h2>One Line Leet</h2><p>{{{{{OLL_DESCRIPTION}}}}}</p>"
+    f"{{{{/{OLL_DESCRIPTION}}}}}"
+    "</body>"
+    "</html>"
+)
+
+
+def record_fields(record: ProblemRecord) -> Dict[str, str]:
+    """
+    Fields of the problem by the name templates refer to them, in the order
+    of the note fields. The OLL fields are only there for problems read
+    with their OLL entity
+    """
+    fields = {
+        "Slug": record.slug,
+        "Id": str(record.problem_id),
+        "Title": str(record.title),
+        "Topic": str(record.category),
+        "Content": record.content,
+        "Difficulty": record.difficulty_html,
+        "Paid": "yes" if record.paid else "no",
+        "Likes": str(record.likes),
+        "Dislikes": str(record.dislikes),
+        "SubmissionsTotal": str(record.submissions_total),
+        "SubmissionsAccepted": str(record.submissions_accepted),
+        "SubmissionAcceptRate": str(record.accept_rate),
+        "Frequency": str(record.freq_bar),
+        "Hints": str(record.hints),
+    }
+    if record.oll_desc is not None:
+        fields[OLL_WAYS] = str(record.oll_short)
+        fields[OLL_DESCRIPTION] = str(record.oll_desc)
+    return fields
@@ -0,0 +1,258 @@
+"""
+All the problems in one PDF book.
+
+Every problem is rendered to a PDF fragment of its own, cached under the
+hash of its HTML, so a rebuild only renders the problems which changed.
+The fragments are then streamed to the book one at a time (see
+`pdf.merge`), behind a table of contents, with a bookmark per problem.
+Every book records the fragments it uses; once it's written, the fragments
+it doesn't use anymore are deleted, unless another book uses them.
+
+Merging needs pypdf, which is optional:
+
+    pip install pypdf
+"""
+import hashlib
+import html
+import io
+import json
+import logging
+import os
+import tempfile
+from typing import AsyncIterator, List, Optional, Set
+
+import leetcode_anki.helpers.data
+from leetcode_anki.helpers import metrics
+from leetcode_anki.helpers.cache import atomic_write
+from leetcode_anki.helpers.data import LeetcodeData
+from pdf.html_wrapper import problem_html
+from pdf.merge import StreamingMerger
+from pdf.pool import DEFAULT_TIMEOUT, DEFAULT_WORKERS, PdfJob, PdfWorkerPool, Renderer
+from pdf.pool import WkhtmltopdfRenderer
+
+try:
+    import pypdf  # type: ignore
+except ImportError:  # Only needed to merge the book
+    pypdf = None
+
+BOOK_FILE = "leetcode.pdf"
+
+# Fragments are kept in this directory of the cache
+FRAGMENT_DIR = "pdf"
+
+# The fragments every book uses are listed in this directory of the
+# fragment cache
+BOOKS_DIR = "books"
+
+# Number of times the table of contents is rendered to settle the page
+# numbers (they depend on the length of the table itself)
+TOC_ATTEMPTS = 3
+
+
+
+class BookEntry:
+    """
+    One problem of the book and its rendered fragment
+    """
+
+    __slots__ = ("slug", "title", "path")
+
+    def __init__(self, slug: str, title: str, path: str) -> None:
+        self.slug = slug
+        self.title = title
+        self.path = path
+
+    def __repr__(self) -> str:
+        return f"BookEntry({self.slug!r})"
+
+
+def fragment_path(cache_dir: str, page: str) -> str:
+    digest = hashlib.sha256(page.encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, digest[:2], f"{digest}.pdf")
+
+
+async def render_fragments(
+    leetcode_data: LeetcodeData,
+    slugs: List[str],
+    cache_dir: str,
+    pool: PdfWorkerPool,
+) -> List[BookEntry]:
+    """
+    Render the problems which are not in the fragment cache yet. Returns
+    the entries of the book in the order of `slugs`; problems which failed
+    to render are left out
+    """
+    leetcode_data.prefetch(slugs)
+    entries: List[BookEntry] = []
+
+    async def jobs() -> AsyncIterator[PdfJob]:
+        for slug in slugs:
+            record = await leetcode_data.record(slug)
+            page = problem_html(record)
+            entry = BookEntry(
+                slug, f"{record.problem_id}. {record.title}", fragment_path(cache_dir, page)
+            )
+            entries.append(entry)
+            if os.path.exists(entry.path):
+                metrics.count("pdf_fragment_hits")
+                continue
+            metrics.count("pdf_fragment_misses")
+            yield PdfJob(slug, page, entry.path)
+
+    await pool.run(jobs())
+    return [entry for entry in entries if os.path.exists(entry.path)]
+
+
+def toc_html(entries: List[BookEntry], first_pages: List[int]) -> str:
+    rows = "\n".join(
+        f"<tr><td>{html.escape(entry.title)}</td><td>{page}</td></tr>"
+        for entry, page in zip(entries, first_pages)
+    )
+    return (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+        "<style>table{width:100%}td:last-child{text-align:right}</style></head>"
+        f"<body><h1>Contents</h1><table>{rows}</table></body></html>"
+    )
+
+
+def _page_count(path: str) -> int:
+    with open(path, "rb") as fragment:
+        return len(pypdf.PdfReader(fragment).pages)
+
+
+def _first_pages(page_counts: List[int], toc_pages: int) -> List[int]:
+    first_pages = []
+    page = toc_pages + 1
+    for count in page_counts:
+        first_pages.append(page)
+        page += count
+    return first_pages
+
+
+async def render_toc(
+    entries: List[BookEntry], page_counts: List[int], renderer: Renderer
+) -> bytes:
+    """
+    Table of contents with the first page of every problem. The numbers are
+    shifted by the length of the table, which is only known once it's
+    rendered, so it's rendered again until the length settles
+    """
+    toc_pages = 1
+    for _ in range(TOC_ATTEMPTS):
+        with metrics.timed("pdf_toc"):
+            toc = await renderer(toc_html(entries, _first_pages(page_counts, toc_pages)))
+        with tempfile.TemporaryFile() as toc_file:
+            toc_file.write(toc)
+            toc_file.seek(0)
+            rendered_pages = len(pypdf.PdfReader(toc_file).pages)
+        if rendered_pages == toc_pages:
+            break
+        toc_pages = rendered_pages
+    return toc
+
+
+def merge_book(entries: List[BookEntry], toc: bytes, output: str) -> int:
+    """
+    Write the table of contents and the fragments to `output`, with a
+    bookmark per problem. Only one fragment is in memory at a time. Returns
+    the number of pages
+    """
+    with atomic_write(output) as output_file:
+        merger = StreamingMerger(output_file)
+        merger.append(io.BytesIO(toc))
+        for entry in entries:
+            with open(entry.path, "rb") as fragment:
+                first_page = merger.append(fragment)
+            merger.add_outline_item(entry.title, first_page)
+        merger.close()
+    return merger.page_count
+
+
+def _book_manifest(cache_dir: str, output: str) -> str:
+    digest = hashlib.sha256(os.path.abspath(output).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, BOOKS_DIR, f"{digest[:16]}.json")
+
+
+def _load_fragments(path: str) -> Set[str]:
+    try:
+        with open(path, encoding="utf-8") as manifest_file:
+            return set(json.load(manifest_file))
+    except (OSError, ValueError):
+        return set()
+
+
+def prune_fragments(cache_dir: str, output: str, entries: List[BookEntry]) -> int:
+    """
+    Record the fragments of the book in `output` and delete the ones it
+    used before but doesn't anymore (problems that changed or left the
+    book), unless another book of `cache_dir` uses them. Returns the number
+    of fragments deleted
+    """
+    manifest = _book_manifest(cache_dir, output)
+    current = {os.path.relpath(entry.path, cache_dir) for entry in entries}
+    unused = _load_fragments(manifest) - current
+    if unused:
+        books_dir = os.path.dirname(manifest)
+        for name in os.listdir(books_dir):
+            path = os.path.join(books_dir, name)
+            if path != manifest and name.endswith(".json"):
+                unused -= _load_fragments(path)
+
+    pruned = 0
+    for name in sorted(unused):
+        path = os.path.join(cache_dir, name)
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            continue
+        pruned += 1
+        try:
+            os.rmdir(os.path.dirname(path))
+        except OSError:  # Other fragments are left in the directory
+            pass
+
+    with atomic_write(manifest, "w", encoding="utf-8") as manifest_file:
+        json.dump(sorted(current), manifest_file)
+    metrics.count("pdf_fragments_pruned", pruned)
+    return pruned
+
+
+async def generate_book(
+    leetcode_data: LeetcodeData,
+    slugs: List[str],
+    output: str,
+    cache_dir: Optional[str] = None,
+    workers: int = DEFAULT_WORKERS,
+    timeout: float = DEFAULT_TIMEOUT,
+    renderer: Optional[Renderer] = None,
+) -> int:
+    """
+    Build the book of the problems in `output`, rendering only the problems
+    missing from the fragment cache in `cache_dir`. Returns the number of
+    problems in the book
+    """
+    if pypdf is None:
+        raise ValueError("PDF book needs pypdf, install it with: pip install pypdf")
+
+    if cache_dir is None:
+        cache_dir = os.path.join(leetcode_anki.helpers.data.CACHE_DIR, FRAGMENT_DIR)
+
+    renderer = renderer or WkhtmltopdfRenderer()
+    pool = PdfWorkerPool(renderer, workers, timeout)
+    entries = await render_fragments(leetcode_data, slugs, cache_dir, pool)
+    if not entries:
+        raise ValueError("No problems to put in the book")
+
+    page_counts = [_page_count(entry.path) for entry in entries]
+    toc = await render_toc(entries, page_counts, renderer)
+    with metrics.timed("pdf_merge"):
+        pages = merge_book(entries, toc, output)
+    pruned = prune_fragments(cache_dir, output, entries)
+    logging.info(
+        "PDF book %s: %s problems, %s pages, %s old fragments deleted",
+        output,
+        len(entries),
+        pages,
+        pruned,
+    )
+    return len(entries)
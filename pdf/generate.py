@@ -1,17 +1,47 @@
 import asyncio
-from pathlib import Path
-from pydf import AsyncPydf
+import os
+from typing import AsyncIterator, List, Optional
 
-async def generate_async():
-    apydf = AsyncPydf()
+from leetcode_anki.helpers.data import LeetcodeData
+from pdf.html_wrapper import problem_html
+from pdf.pool import (
+    DEFAULT_TIMEOUT,
+    DEFAULT_WORKERS,
+    PdfJob,
+    PdfResult,
+    PdfWorkerPool,
+    Renderer,
+    WkhtmltopdfRenderer,
+)
 
-    async def gen(i):
-        pdf_content = await apydf.generate_pdf('<h1>this is html</h1>')
-        Path(f'output_{i:03}.pdf').write_bytes(pdf_content)
+PDF_DIR = "pdf/"
 
-    coros = [gen(i) for i in range(50)]
-    await asyncio.gather(*coros)
 
-def main():
-  loop = asyncio.get_event_loop()
-  loop.run_until_complete(generate_async())
+async def generate_async(
+    leetcode_data: LeetcodeData,
+    slugs: List[str],
+    output_dir: str,
+    workers: int = DEFAULT_WORKERS,
+    timeout: float = DEFAULT_TIMEOUT,
+    renderer: Optional[Renderer] = None,
+) -> PdfResult:
+    """
+    Render a PDF per problem into `output_dir`, with at most `workers`
+    wkhtmltopdf processes (or `renderer` calls) at once. Problems are read
+    one by one from the problem store as the workers free up
+    """
+    # Problems which aren't loaded yet are fetched in batches
+    leetcode_data.prefetch(slugs)
+
+    async def jobs() -> AsyncIterator[PdfJob]:
+        for slug in slugs:
+            record = await leetcode_data.record(slug)
+            path = os.path.join(output_dir, f"{slug}.pdf")
+            yield PdfJob(slug, problem_html(record), path)
+
+    pool = PdfWorkerPool(renderer or WkhtmltopdfRenderer(), workers, timeout)
+    return await pool.run(jobs())
+
+
+def main(leetcode_data: LeetcodeData, slugs: List[str], output_dir: str) -> None:
+    asyncio.run(generate_async(leetcode_data, slugs, output_dir))
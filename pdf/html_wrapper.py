@@ -1,19 +1,9 @@
-from airium import Airium # type: ignore
+from leetcode_anki.helpers.record import ProblemRecord
+from leetcode_anki.helpers.templates import PROBLEM_PAGE, record_fields
 
-def wrap() -> str:
-    a = Airium() # type: ignore
-    a('<!DOCTYPE html>')
-    with a.html(lang="pl"):
-        with a.head():
-            a.meta(charset="utf-8")
-            a.title(_t="Airium example")
 
-        with a.body():
-            with a.h3(id="id23409231", klass='main_header'):
-                a("Hello World.")
-
-    html = str(a)  # casting to string extracts the value
-    # or directly to UTF-8 encoded bytes:
-    html_bytes = bytes(a)  # casting to bytes is a shortcut to str(a).encode('utf-8')
-    print(html)
-    return html
+def problem_html(record: ProblemRecord) -> str:
+    """
+    Standalone HTML page of the problem, for rendering to PDF
+    """
+    return PROBLEM_PAGE.render(record_fields(record))
@@ -0,0 +1,207 @@
+"""
+Merging PDF documents without holding them in memory.
+
+pypdf's `PdfWriter` keeps every page of the merged document in memory until
+it's written. `StreamingMerger` writes the objects of every document to the
+output as soon as the document is added, and only keeps their offsets and
+the ids of the pages, so merging takes about the memory of the largest
+document, not of the result:
+
+    with open(path, "wb") as output:
+        merger = StreamingMerger(output)
+        first_page = merger.append(fragment)
+        merger.add_outline_item("Two Sum", first_page)
+        merger.close()
+
+The page tree, the bookmarks and the cross-reference table are written by
+`close`. Only the pages and what they link are copied: document-level data
+of the inputs (bookmarks, named destinations, forms) is left out.
+
+Reading the documents needs pypdf, which is optional:
+
+    pip install pypdf
+"""
+from typing import IO, Dict, List, Tuple
+
+try:
+    from pypdf import PdfReader  # type: ignore
+    from pypdf.generic import (  # type: ignore
+        ArrayObject,
+        DictionaryObject,
+        IndirectObject,
+        NameObject,
+        NullObject,
+        NumberObject,
+        PdfObject,
+        TextStringObject,
+    )
+except ImportError:  # Only needed to merge the book
+    PdfReader = None
+
+# Objects of the document tree are never copied from the inputs
+_DOCUMENT_TYPES = ("/Catalog", "/Pages")
+
+_CATALOG_ID = 1
+_PAGES_ID = 2
+
+
+def _ref(idnum: int) -> "IndirectObject":
+    return IndirectObject(idnum, 0, None)
+
+
+class StreamingMerger:
+    """
+    PDF document written to `output` one input document at a time, see the
+    module docstring
+    """
+
+    def __init__(self, output: IO[bytes]) -> None:
+        if PdfReader is None:
+            raise ValueError("Merging PDFs needs pypdf, install it with: pip install pypdf")
+
+        self._output = output
+        self._offsets: Dict[int, int] = {}
+        self._next_id = _PAGES_ID + 1
+        self._pages: List[int] = []
+        self._outline: List[Tuple[str, int]] = []
+        output.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    @property
+    def page_count(self) -> int:
+        return len(self._pages)
+
+    def _new_id(self) -> int:
+        idnum = self._next_id
+        self._next_id += 1
+        return idnum
+
+    def _write(self, idnum: int, obj: "PdfObject") -> None:
+        self._offsets[idnum] = self._output.tell()
+        self._output.write(f"{idnum} 0 obj\n".encode("ascii"))
+        obj.write_to_stream(self._output)
+        self._output.write(b"\nendobj\n")
+
+    def append(self, document: IO[bytes]) -> int:
+        """
+        Copy the pages of the document to the output. Returns the index of
+        its first page
+        """
+        reader = PdfReader(document)
+        first_page = len(self._pages)
+        # Ids of the objects of the document in the output
+        ids: Dict[Tuple[int, int], int] = {}
+        pending: List[Tuple[int, "PdfObject"]] = []
+
+        def reference(indirect: "IndirectObject") -> "PdfObject":
+            key = (indirect.idnum, indirect.generation)
+            if key not in ids:
+                obj = indirect.get_object()
+                if (
+                    isinstance(obj, DictionaryObject)
+                    and obj.get("/Type") in _DOCUMENT_TYPES
+                ):
+                    return NullObject()
+                ids[key] = self._new_id()
+                pending.append((ids[key], obj))
+            return _ref(ids[key])
+
+        def renumber(obj: "PdfObject") -> "PdfObject":
+            # Objects are changed in place, the reader is dropped afterwards.
+            # Values are read with the dict and list methods, the ones of
+            # pypdf resolve the references
+            if isinstance(obj, IndirectObject):
+                # Values shared by the pages are only renumbered once
+                return obj if obj.pdf is None else reference(obj)
+            if isinstance(obj, DictionaryObject):
+                for key, value in list(dict.items(obj)):
+                    dict.__setitem__(obj, key, renumber(value))
+            elif isinstance(obj, ArrayObject):
+                for index, value in enumerate(list.__iter__(obj)):
+                    list.__setitem__(obj, index, renumber(value))
+            return obj
+
+        pages = list(reader.pages)
+        # Links and annotations of the document point to its pages
+        for page in pages:
+            page_ref = page.indirect_reference
+            idnum = self._new_id()
+            if page_ref is not None:
+                ids[(page_ref.idnum, page_ref.generation)] = idnum
+            self._pages.append(idnum)
+
+        # pypdf copies the attributes a page inherits (resources, media
+        # box...) into the page, so the page tree of the document is not needed
+        for page, idnum in zip(pages, self._pages[first_page:]):
+            dict.pop(page, "/Parent", None)
+            renumber(page)
+            dict.__setitem__(page, NameObject("/Parent"), _ref(_PAGES_ID))
+            self._write(idnum, page)
+
+        while pending:
+            idnum, obj = pending.pop()
+            self._write(idnum, renumber(obj))
+
+        return first_page
+
+    def add_outline_item(self, title: str, page: int) -> None:
+        """
+        Bookmark to the page (by index) at the top level of the outline
+        """
+        if not 0 <= page < len(self._pages):
+            raise ValueError(f"No page {page} in the document")
+
+        self._outline.append((title, page))
+
+    def close(self) -> None:
+        """
+        Write the page tree, the bookmarks and the cross-reference table
+        """
+        pages = DictionaryObject()
+        pages[NameObject("/Type")] = NameObject("/Pages")
+        pages[NameObject("/Kids")] = ArrayObject(_ref(idnum) for idnum in self._pages)
+        pages[NameObject("/Count")] = NumberObject(len(self._pages))
+        self._write(_PAGES_ID, pages)
+
+        catalog = DictionaryObject()
+        catalog[NameObject("/Type")] = NameObject("/Catalog")
+        catalog[NameObject("/Pages")] = _ref(_PAGES_ID)
+        if self._outline:
+            catalog[NameObject("/Outlines")] = _ref(self._write_outline())
+            catalog[NameObject("/PageMode")] = NameObject("/UseOutlines")
+        self._write(_CATALOG_ID, catalog)
+
+        xref_offset = self._output.tell()
+        lines = [f"xref\n0 {self._next_id}\n", "0000000000 65535 f \n"]
+        lines.extend(
+            f"{self._offsets[idnum]:010d} 00000 n \n"
+            for idnum in range(1, self._next_id)
+        )
+        lines.append(
+            f"trailer\n<< /Size {self._next_id} /Root {_CATALOG_ID} 0 R >>\n"
+            f"startxref\n{xref_offset}\n%%EOF\n"
+        )
+        self._output.write("".join(lines).encode("ascii"))
+
+    def _write_outline(self) -> int:
+        outline_id = self._new_id()
+        item_ids = [self._new_id() for _ in self._outline]
+        for index, ((title, page), idnum) in enumerate(zip(self._outline, item_ids)):
+            item = DictionaryObject()
+            item[NameObject("/Title")] = TextStringObject(title)
+            item[NameObject("/Parent")] = _ref(outline_id)
+            item[NameObject("/Dest")] = ArrayObject(
+                [_ref(self._pages[page]), NameObject("/Fit")]
+            )
+            if index > 0:
+                item[NameObject("/Prev")] = _ref(item_ids[index - 1])
+            if index + 1 < len(item_ids):
+                item[NameObject("/Next")] = _ref(item_ids[index + 1])
+            self._write(idnum, item)
+
+        outline = DictionaryObject()
+        outline[NameObject("/Type")] = NameObject("/Outlines")
+        outline[NameObject("/First")] = _ref(item_ids[0])
+        outline[NameObject("/Last")] = _ref(item_ids[-1])
+        outline[NameObject("/Count")] = NumberObject(len(item_ids))
+        self._write(outline_id, outline)
+        return outline_id
@@ -0,0 +1,232 @@
+"""
+Bounded pool of PDF renderers.
+
+Every document is rendered by its own wkhtmltopdf process. Starting one
+process per problem at once doesn't scale past a few dozen documents, so
+documents go through a bounded queue to a fixed number of workers instead:
+
+    pool = PdfWorkerPool(WkhtmltopdfRenderer(), workers=4)
+    result = await pool.run(jobs)
+
+`jobs` is produced lazily (e.g. from the problem store); the producer waits
+while the queue is full, so only a few documents are in memory at a time.
+A render which takes longer than `timeout` is killed and, like a failed
+one, retried up to `attempts` times. Every PDF is written to its file as
+soon as it's rendered.
+"""
+import asyncio
+import logging
+import os
+from typing import (
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    List,
+    Optional,
+    Union,
+)
+
+from pydf.wkhtmltopdf import WK_PATH, _convert_args  # type: ignore
+
+from leetcode_anki.helpers import metrics
+from leetcode_anki.helpers.cache import atomic_write
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+# Seconds a single document may take to render
+DEFAULT_TIMEOUT = 60.0
+
+# Number of times a document is rendered before it's given up on
+DEFAULT_ATTEMPTS = 3
+
+Renderer = Callable[[str], Awaitable[bytes]]
+
+
+class WkhtmltopdfRenderer:
+    """
+    Render HTML with a wkhtmltopdf process per document. `options` are
+    passed to wkhtmltopdf the same way pydf does (page_size="A4" becomes
+    --page-size A4)
+    """
+
+    def __init__(self, binary: str = WK_PATH, **options: object) -> None:
+        self._command = [binary] + _convert_args(quiet=True, **options)
+
+    async def __call__(self, html: str) -> bytes:
+        process = await asyncio.create_subprocess_exec(
+            *self._command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            pdf, stderr = await process.communicate(html.encode("utf-8"))
+        finally:
+            # Cancelled (timed out): don't leave the process behind
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+
+        # wkhtmltopdf exit codes can be false, the output is what matters
+        if process.returncode != 0 and pdf[:4] != b"%PDF":
+            raise RuntimeError(
+                f"wkhtmltopdf failed ({process.returncode}): "
+                f"{stderr.decode('utf-8', 'replace').strip()}"
+            )
+        return pdf
+
+
+class PdfJob:
+    """
+    One document: its name (for the logs), the HTML and the output file
+    """
+
+    __slots__ = ("name", "html", "path")
+
+    def __init__(self, name: str, html: str, path: str) -> None:
+        self.name = name
+        self.html = html
+        self.path = path
+
+    def __repr__(self) -> str:
+        return f"PdfJob({self.name!r})"
+
+
+class PdfResult:
+    """
+    Outcome of a pool run
+    """
+
+    def __init__(self) -> None:
+        self.rendered = 0
+        self.retries = 0
+        self.failed: List[str] = []
+
+    def __repr__(self) -> str:
+        return (
+            f"PdfResult(rendered={self.rendered}, retries={self.retries}, "
+            f"failed={len(self.failed)})"
+        )
+
+
+def _write_file(path: str, data: bytes) -> None:
+    with atomic_write(path) as output_file:
+        output_file.write(data)
+
+
+async def _iterate(
+    jobs: Union[Iterable[PdfJob], AsyncIterable[PdfJob]]
+) -> AsyncIterator[PdfJob]:
+    if isinstance(jobs, AsyncIterable):
+        async for job in jobs:
+            yield job
+    else:
+        for job in jobs:
+            yield job
+
+
+class PdfWorkerPool:
+    """
+    Render documents with at most `workers` renders running at once, see
+    the module docstring
+    """
+
+    def __init__(
+        self,
+        renderer: Renderer,
+        workers: int = DEFAULT_WORKERS,
+        timeout: float = DEFAULT_TIMEOUT,
+        attempts: int = DEFAULT_ATTEMPTS,
+        queue_size: Optional[int] = None,
+        retry_delay: float = 1.0,
+    ) -> None:
+        if workers < 1:
+            raise ValueError(f"Workers must be at least 1: {workers}")
+
+        if attempts < 1:
+            raise ValueError(f"Attempts must be at least 1: {attempts}")
+
+        self._renderer = renderer
+        self._workers = workers
+        self._timeout = timeout
+        self._attempts = attempts
+        self._queue_size = queue_size or workers * 2
+        self._retry_delay = retry_delay
+
+    async def _render(self, job: PdfJob, result: PdfResult) -> None:
+        for attempt in range(self._attempts):
+            try:
+                with metrics.timed("pdf_render"):
+                    pdf = await asyncio.wait_for(
+                        self._renderer(job.html), self._timeout
+                    )
+            except Exception as exc:  # pylint: disable=broad-except
+                if isinstance(exc, asyncio.TimeoutError):
+                    exc = TimeoutError(f"Timed out after {self._timeout}s")
+                if attempt + 1 >= self._attempts:
+                    logging.error("Giving up on PDF %s: %s", job.name, exc)
+                    result.failed.append(job.name)
+                    metrics.count("pdf_failed")
+                    return
+                logging.warning(
+                    "PDF %s failed (%s), try %s/%s",
+                    job.name,
+                    exc,
+                    attempt + 1,
+                    self._attempts,
+                )
+                result.retries += 1
+                metrics.count("pdf_retries")
+                await asyncio.sleep(self._retry_delay * 2**attempt)
+                continue
+
+            try:
+                with metrics.timed("pdf_write"):
+                    await asyncio.get_running_loop().run_in_executor(
+                        None, _write_file, job.path, pdf
+                    )
+            except OSError as exc:
+                logging.error("Failed to write PDF %s: %s", job.path, exc)
+                result.failed.append(job.name)
+                metrics.count("pdf_failed")
+                return
+            result.rendered += 1
+            return
+
+    async def _worker(
+        self, queue: "asyncio.Queue[Optional[PdfJob]]", result: PdfResult
+    ) -> None:
+        while True:
+            job = await queue.get()
+            if job is None:
+                return
+            await self._render(job, result)
+
+    async def run(
+        self, jobs: Union[Iterable[PdfJob], AsyncIterable[PdfJob]]
+    ) -> PdfResult:
+        """
+        Render all the jobs. Failed documents are listed in the result
+        instead of stopping the run
+        """
+        result = PdfResult()
+        queue: "asyncio.Queue[Optional[PdfJob]]" = asyncio.Queue(self._queue_size)
+        workers = [
+            asyncio.ensure_future(self._worker(queue, result))
+            for _ in range(self._workers)
+        ]
+        try:
+            async for job in _iterate(jobs):
+                # Waits while the queue is full
+                await queue.put(job)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+        logging.info("PDF: %s", result)
+        return result
@@ -0,0 +1,183 @@
+import json
+import os
+import sqlite3
+import tempfile
+import zipfile
+from typing import List
+
+import pytest
+
+import anki.decks
+import anki.generate
+import leetcode_anki.helpers.api
+import leetcode_anki.helpers.replay
+
+
+def write_csv(path, slugs: List[str]) -> str:
+    lines = ["title,url,level,category,oll_short,oll_desc"]
+    lines.extend(
+        f"{slug},https://leetcode.com/problems/{slug}/,Easy,Array,[a],desc {slug}"
+        for slug in slugs
+    )
+    path.write_text("\n".join(lines) + "\n")
+    return str(path)
+
+
+def deck_cards(path: str, tmp_path) -> List[tuple]:
+    with zipfile.ZipFile(path) as package:
+        package.extract("collection.anki2", tmp_path)
+    connection = sqlite3.connect(os.path.join(tmp_path, "collection.anki2"))
+    decks = json.loads(connection.execute("SELECT decks FROM col").fetchone()[0])
+    rows = connection.execute(
+        "SELECT cards.did, notes.sfld, notes.flds FROM cards JOIN notes ON cards.nid = notes.id"
+    )
+    return [(decks[str(did)]["name"], fields.split("\x1f")[0]) for did, _, fields in rows]
+
+
+class TestDeckSpecs:
+    def test_load(self, tmp_path) -> None:
+        path = tmp_path / "decks.json"
+        path.write_text(
+            json.dumps(
+                {"decks": [{"name": "A", "csv": "a.csv"}, {"name": "B", "list_id": "x"}]}
+            )
+        )
+
+        specs = anki.decks.load_deck_specs(str(path))
+
+        assert [(spec.name, spec.csv, spec.list_id) for spec in specs] == [
+            ("A", "a.csv", None),
+            ("B", None, "x"),
+        ]
+
+    @pytest.mark.parametrize(
+        "decks",
+        [
+            [],
+            [{"name": "A"}],
+            [{"name": "A", "csv": "a.csv", "list_id": "x"}],
+            [{"name": "A", "csv": "a.csv"}, {"name": "A", "csv": "b.csv"}],
+        ],
+    )
+    def test_invalid(self, tmp_path, decks) -> None:
+        path = tmp_path / "decks.json"
+        path.write_text(json.dumps({"decks": decks}))
+
+        with pytest.raises(ValueError):
+            anki.decks.load_deck_specs(str(path))
+
+    def test_names(self) -> None:
+        assert anki.decks.deck_id("Top Amazon") == anki.decks.deck_id("Top Amazon")
+        assert anki.decks.deck_id("Top Amazon") != anki.decks.deck_id("Top Google")
+        assert anki.decks.deck_file_name("Top Amazon (2024)") == "top-amazon-2024"
+
+
+class TestGenerateDecks:
+    @pytest.fixture(autouse=True)
+    def stand_in(self, monkeypatch):
+        monkeypatch.setenv("LEETCODE_SESSION_ID", "test")
+        monkeypatch.setenv("LEETCODE_CSRF_TOKEN", "test")
+        leetcode_anki.helpers.api._client = None
+        responder = leetcode_anki.helpers.replay.SyntheticLeetcode(4)
+        with leetcode_anki.helpers.replay.StandInServer([responder]) as server:
+            monkeypatch.setenv("LEETCODE_API_HOST", server.url)
+            yield server
+        leetcode_anki.helpers.api._client = None
+
+    def write_manifest(self, tmp_path) -> str:
+        path = tmp_path / "decks.json"
+        path.write_text(
+            json.dumps(
+                {
+                    "decks": [
+                        {
+                            "name": "First",
+                            "csv": write_csv(tmp_path / "a.csv", ["problem-2", "problem-1"]),
+                        },
+                        {
+                            "name": "Second",
+                            "csv": write_csv(tmp_path / "b.csv", ["problem-1", "problem-3"]),
+                        },
+                        {"name": "All", "list_id": "everything"},
+                    ]
+                }
+            )
+        )
+        return str(path)
+
+    # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
+    @pytest.mark.asyncio
+    async def test_sub_decks(self, tmp_path, stand_in) -> None:
+        output_dir = str(tmp_path / "out") + "/"
+        os.makedirs(output_dir)
+
+        await anki.generate.generate_decks(
+            anki.generate.DeckManifestArg(
+                self.write_manifest(tmp_path), output_dir=output_dir, rate=1000
+            )
+        )
+
+        cards = deck_cards(output_dir + anki.generate.OUTPUT_FILE, tmp_path)
+        assert cards == [
+            ("leetcode::First", "problem-2"),
+            ("leetcode::First", "problem-1"),
+            ("leetcode::Second", "problem-1"),
+            ("leetcode::Second", "problem-3"),
+            ("leetcode::All", "problem-1"),
+            ("leetcode::All", "problem-2"),
+            ("leetcode::All", "problem-3"),
+            ("leetcode::All", "problem-4"),
+        ]
+        # User, list and one batch with the union of the problems
+        assert stand_in.stats["requests"] == 3
+
+    # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
+    @pytest.mark.asyncio
+    async def test_split(self, tmp_path) -> None:
+        output_dir = str(tmp_path / "out") + "/"
+        os.makedirs(output_dir)
+
+        await anki.generate.generate_decks(
+            anki.generate.DeckManifestArg(
+                self.write_manifest(tmp_path), split=True, output_dir=output_dir, rate=1000
+            )
+        )
+
+        assert sorted(os.listdir(output_dir)) == ["all.apkg", "first.apkg", "second.apkg"]
+        assert deck_cards(output_dir + "second.apkg", tmp_path) == [
+            ("Second", "problem-1"),
+            ("Second", "problem-3"),
+        ]
+
+    # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
+    @pytest.mark.asyncio
+    async def test_split_failure(self, tmp_path, monkeypatch) -> None:
+        output_dir = str(tmp_path / "out") + "/"
+        os.makedirs(output_dir)
+        scratch = tmp_path / "scratch"
+        scratch.mkdir()
+        monkeypatch.setattr(tempfile, "tempdir", str(scratch))
+        render_notes = anki.generate.render_notes
+        calls = []
+
+        def failing_render_notes(*args):
+            calls.append(args)
+            if len(calls) == 2:
+                raise RuntimeError("render failed")
+            return render_notes(*args)
+
+        monkeypatch.setattr(anki.generate, "render_notes", failing_render_notes)
+
+        with pytest.raises(RuntimeError, match="render failed"):
+            await anki.generate.generate_decks(
+                anki.generate.DeckManifestArg(
+                    self.write_manifest(tmp_path),
+                    split=True,
+                    output_dir=output_dir,
+                    rate=1000,
+                )
+            )
+
+        # The failed deck leaves nothing behind, the finished one is kept
+        assert os.listdir(output_dir) == ["first.apkg"]
+        assert os.listdir(scratch) == []
@@ -0,0 +1,75 @@
+import os
+import stat
+from unittest import mock
+
+import anki.manifest
+from csv_reader import OLLEntity
+from leetcode_anki.models import LeetcodeAnkiFactory, LeetcodeNote
+
+MODEL = LeetcodeAnkiFactory.plain()
+
+
+def dummy_note(slug: str, title: str) -> LeetcodeNote:
+    return LeetcodeNote(
+        model=MODEL,
+        fields=[slug, "1", title] + [""] * 11,
+        tags=["test-tag"],
+        sort_field="001",
+    )
+
+
+class TestBuildManifest:
+    def test_new_problems_are_stale(self, tmp_path) -> None:
+        manifest = anki.manifest.BuildManifest(str(tmp_path / "m.json"), MODEL)
+
+        assert manifest.stale(["two-sum"], 100) == ["two-sum"]
+        assert manifest.note("two-sum") is None
+
+    def test_round_trip(self, tmp_path) -> None:
+        path = str(tmp_path / "m.json")
+        manifest = anki.manifest.BuildManifest(path, MODEL)
+
+        with mock.patch("time.time", mock.Mock(return_value=1000.0)):
+            assert manifest.update("two-sum", dummy_note("two-sum", "Two Sum"))
+            assert not manifest.update("two-sum", dummy_note("two-sum", "Two Sum"))
+            assert manifest.update("3sum", dummy_note("3sum", "3Sum"))
+        manifest.retain(["two-sum"])
+        manifest.save()
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+
+        reloaded = anki.manifest.BuildManifest(path, MODEL)
+        with mock.patch("time.time", mock.Mock(return_value=1050.0)):
+            assert reloaded.stale(["two-sum", "3sum"], 100) == ["3sum"]
+            assert reloaded.stale(["two-sum"], 10) == ["two-sum"]
+
+        note = reloaded.note("two-sum")
+        assert note is not None
+        assert note.fields[2] == "Two Sum"
+        assert note.tags == ["test-tag"]
+        assert note.guid == dummy_note("two-sum", "Two Sum").guid
+
+    def test_model_change_invalidates(self, tmp_path) -> None:
+        path = str(tmp_path / "m.json")
+        manifest = anki.manifest.BuildManifest(path, MODEL)
+        manifest.update("two-sum", dummy_note("two-sum", "Two Sum"))
+        manifest.save()
+
+        reloaded = anki.manifest.BuildManifest(path, LeetcodeAnkiFactory.nano_leet())
+        assert reloaded.note("two-sum") is None
+
+    def test_oll_change_is_stale(self, tmp_path) -> None:
+        path = str(tmp_path / "m.json")
+        manifest = anki.manifest.BuildManifest(path, MODEL)
+        oll = OLLEntity("two-sum", "[hash-map]", "Look up the complement")
+        with mock.patch("time.time", mock.Mock(return_value=1000.0)):
+            manifest.update("two-sum", dummy_note("two-sum", "Two Sum"), oll)
+        manifest.save()
+
+        reloaded = anki.manifest.BuildManifest(path, MODEL)
+        edited = OLLEntity("two-sum", "[hash-map]", "Store seen numbers")
+        with mock.patch("time.time", mock.Mock(return_value=1050.0)):
+            assert reloaded.stale(["two-sum"], 100, {"two-sum": oll}) == []
+            assert reloaded.stale(["two-sum"], 100, {"two-sum": edited}) == [
+                "two-sum"
+            ]
+            assert reloaded.stale(["two-sum"], 100) == ["two-sum"]
@@ -0,0 +1,190 @@
+import http.server
+import json
+import threading
+import zipfile
+from typing import Dict, Iterator, List
+
+import genanki  # type: ignore
+import pytest
+
+import anki.media
+import anki.writer
+import leetcode_anki.helpers.data
+from csv_reader import OLLEntity
+from test.helpers.test_store import question
+
+PNG = b"\x89PNG\r\n\x1a\nimage"
+
+
+class ImageServer(http.server.ThreadingHTTPServer):
+    def __init__(self, images: Dict[str, bytes]) -> None:
+        super().__init__(("127.0.0.1", 0), ImageHandler)
+        self.images = images
+        self.requests: List[str] = []
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+
+class ImageHandler(http.server.BaseHTTPRequestHandler):
+    server: ImageServer
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        self.server.requests.append(self.path)
+        image = self.server.images.get(self.path)
+        if image is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(image)))
+        self.end_headers()
+        self.wfile.write(image)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def server() -> Iterator[ImageServer]:
+    image_server = ImageServer(
+        {"/a.png": PNG, "/copy-of-a": PNG, "/b.jpg": b"jpeg image"}
+    )
+    thread = threading.Thread(target=image_server.serve_forever, daemon=True)
+    thread.start()
+    yield image_server
+    image_server.shutdown()
+    image_server.server_close()
+
+
+class TestLocalise:
+    def test_image_urls(self) -> None:
+        page = (
+            '<p><img alt="x" src="https://assets.leetcode.com/a.png" />'
+            "<IMG src='//assets.leetcode.com/b.jpg?x=1&amp;y=2'>"
+            '<img src="data:image/png;base64,AAAA">'
+            '<img src="leetcode-abc.png"></p>'
+        )
+
+        assert anki.media.image_urls(page) == [
+            "https://assets.leetcode.com/a.png",
+            "https://assets.leetcode.com/b.jpg?x=1&y=2",
+        ]
+        assert anki.media.linked_media(page) == ["leetcode-abc.png"]
+
+    def test_localise(self) -> None:
+        page = (
+            '<img width="40" src="https://assets.leetcode.com/a.png" />'
+            '<img src="https://assets.leetcode.com/missing.png">'
+        )
+
+        localised = anki.media.localise(
+            page, {"https://assets.leetcode.com/a.png": "leetcode-1.png"}
+        )
+
+        assert localised == (
+            '<img width="40" src="leetcode-1.png" />'
+            '<img src="https://assets.leetcode.com/missing.png">'
+        )
+
+    # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
+    #  `pytest.mark.asyncio`.
+    @pytest.mark.asyncio
+    async def test_localise_record(self) -> None:
+        url = "https://assets.leetcode.com/a.png"
+        leetcode_data = leetcode_anki.helpers.data.LeetcodeSlugData(
+            [OLLEntity("a", "", "")]
+        )
+        leetcode_data._store.put(question("a", f'<img src="{url}">'))
+        record = await leetcode_data.record("a")
+
+        localised = anki.media.localise_record(record, {url: "leetcode-1.png"})
+
+        assert localised.content == '<img src="leetcode-1.png">'
+        assert localised.title == record.title
+        # The cached record is still fine for the PDFs
+        assert (await leetcode_data.record("a")).content == f'<img src="{url}">'
+
+
+class TestMediaCache:
+    # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
+    #  `pytest.mark.asyncio`.
+    @pytest.mark.asyncio
+    async def test_fetch(self, tmp_path, server) -> None:
+        media = anki.media.MediaCache(str(tmp_path), concurrency=2)
+        pages = [
+            [server.url("/a.png"), server.url("/b.jpg")],
+            [server.url("/a.png"), server.url("/copy-of-a"), server.url("/missing.png")],
+        ]
+
+        names = await media.fetch(pages)
+
+        assert sorted(server.requests) == [
+            "/a.png",
+            "/b.jpg",
+            "/copy-of-a",
+            "/missing.png",
+        ]
+        assert server.url("/missing.png") not in names
+        # Same bytes, same file
+        assert names[server.url("/a.png")] == names[server.url("/copy-of-a")]
+        assert names[server.url("/a.png")].endswith(".png")
+        assert names[server.url("/b.jpg")].endswith(".jpg")
+        with open(media.path(names[server.url("/a.png")]), "rb") as image:
+            assert image.read() == PNG
+
+        server.requests.clear()
+        again = await anki.media.MediaCache(str(tmp_path)).fetch(pages)
+
+        assert again == names
+        assert server.requests == ["/missing.png"]
+
+    # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
+    #  `pytest.mark.asyncio`.
+    @pytest.mark.asyncio
+    async def test_package(self, tmp_path, server) -> None:
+        media = anki.media.MediaCache(str(tmp_path / "media"))
+        url = server.url("/a.png")
+        names = await media.fetch([[url]])
+        model = genanki.Model(
+            1234,
+            "Test model",
+            fields=[{"name": "Content"}],
+            templates=[{"name": "Card", "qfmt": "{{Content}}", "afmt": ""}],
+        )
+        notes = [
+            genanki.Note(
+                model=model, fields=[anki.media.localise(f'<img src="{url}">', names)]
+            )
+            for _ in range(2)
+        ]
+        path = str(tmp_path / "deck.apkg")
+
+        with anki.writer.StreamingPackageWriter(path, genanki.Deck(1, "Deck")) as writer:
+            for note in notes:
+                writer.add_note(note)
+                for media_path in media.files(note.fields):
+                    writer.add_media(media_path)
+
+        with zipfile.ZipFile(path) as package:
+            assert json.loads(package.read("media")) == {"0": names[url]}
+            assert package.read("0") == PNG
+
+    # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
+    #  `pytest.mark.asyncio`.
+    @pytest.mark.asyncio
+    async def test_delocalise(self, tmp_path, server) -> None:
+        media = anki.media.MediaCache(str(tmp_path))
+        url = server.url("/a.png")
+        names = await media.fetch([[url]])
+        name = names[url]
+        page = anki.media.localise(f'<img src="{url}">', names)
+
+        assert page == f'<img src="{name}">'
+        assert media.url(name) == url
+        assert media.delocalise(page) == f'<img src="{url}">'
+        assert media.delocalise('<img src="leetcode-unknown.png">') == (
+            '<img src="leetcode-unknown.png">'
+        )
+        assert media.files([page], names=set()) == []
+        assert media.files([page], names={name}) == [media.path(name)]
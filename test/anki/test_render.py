@@ -0,0 +1,58 @@
+import pickle
+
+import genanki  # type: ignore
+import pytest
+
+import anki.render
+from leetcode_anki.helpers.record import ProblemRecord
+from leetcode_anki.models import LeetcodeAnkiFactory
+
+
+def make_record(index: int) -> ProblemRecord:
+    return ProblemRecord(
+        slug=f"problem-{index}",
+        problem_id=str(index),
+        title=f"Problem {index}",
+        category="Algorithms",
+        content=f"<p>Content {index}</p>",
+        difficulty="Medium",
+        paid=False,
+        likes=index,
+        dislikes=1,
+        submissions_total=10,
+        submissions_accepted=5,
+        freq_bar=1.5,
+        hints=[],
+        tags=["array"],
+    )
+
+
+class TestRenderNotes:
+    def test_record_pickle(self) -> None:
+        record = make_record(1)
+
+        copy = pickle.loads(pickle.dumps(record))
+
+        assert [getattr(copy, name) for name in ProblemRecord.__slots__] == [
+            getattr(record, name) for name in ProblemRecord.__slots__
+        ]
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_order_and_content(self, workers: int) -> None:
+        model = LeetcodeAnkiFactory.plain()
+        records = [make_record(index) for index in range(20)]
+
+        notes = list(
+            anki.render.render_notes(records, model, workers=workers, chunk_size=3)
+        )
+
+        assert [note.fields[0] for note in notes] == [
+            f"problem-{index}" for index in range(20)
+        ]
+        assert notes[5].guid == genanki.guid_for("problem-5")
+        assert notes[5].tags == ["array"]
+        assert notes[5].model is model
+
+    def test_workers_validated(self) -> None:
+        with pytest.raises(ValueError):
+            list(anki.render.render_notes([], LeetcodeAnkiFactory.plain(), workers=0))
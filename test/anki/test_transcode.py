@@ -0,0 +1,136 @@
+import io
+import os
+import random
+
+import pytest
+
+import anki.media
+import anki.transcode
+
+
+def store(media: anki.media.MediaCache, name: str, data: bytes) -> str:
+    os.makedirs(os.path.dirname(media.path(name)), exist_ok=True)
+    with open(media.path(name), "wb") as media_file:
+        media_file.write(data)
+    return name
+
+
+def png(width: int, height: int) -> bytes:
+    image_module = pytest.importorskip("PIL.Image")
+    generator = random.Random(width * height)
+    image = image_module.new("RGB", (width, height), "white")
+    # Some noise, so the PNG compresses badly like a real picture
+    for _ in range(2000):
+        image.putpixel(
+            (generator.randrange(width), generator.randrange(height)),
+            (generator.randrange(256), 0, 0),
+        )
+    output = io.BytesIO()
+    exif = image.getexif()
+    exif[0x010E] = "secret description"
+    image.save(output, "PNG", exif=exif)
+    return output.getvalue()
+
+
+class TestMediaOptimiser:
+    def test_needs_pillow(self, tmp_path, monkeypatch) -> None:
+        monkeypatch.setattr(anki.transcode, "Image", None)
+
+        with pytest.raises(ValueError, match="Pillow"):
+            anki.transcode.MediaOptimiser(anki.media.MediaCache(str(tmp_path)))
+
+    def test_optimise(self, tmp_path, monkeypatch) -> None:
+        image_module = pytest.importorskip("PIL.Image")
+        media = anki.media.MediaCache(str(tmp_path))
+        names = {
+            "https://a/big.png": store(media, "leetcode-big.png", png(3000, 1500)),
+            "https://a/copy.png": "leetcode-big.png",
+            "https://a/small.png": store(media, "leetcode-small.png", png(200, 100)),
+            "https://a/chart.svg": store(media, "leetcode-chart.svg", b"<svg/>"),
+        }
+        # As if downloaded
+        anki.media._get_disk_cache(os.path.join(media.directory, "index")).set(
+            "url:leetcode-big.png", "https://a/big.png"
+        )
+        optimiser = anki.transcode.MediaOptimiser(media, 1024, workers=2)
+
+        optimised = optimiser.optimise(names)
+
+        big = optimised["https://a/big.png"]
+        assert big.startswith("leetcode-big-") and big.endswith(".webp")
+        assert optimised["https://a/copy.png"] == big
+        assert optimised["https://a/chart.svg"] == "leetcode-chart.svg"
+        # Notes of a later build can still be pointed back to the URL
+        assert media.url(big) == "https://a/big.png"
+        assert os.path.getsize(media.path(big)) < os.path.getsize(
+            media.path("leetcode-big.png")
+        )
+        with image_module.open(media.path(big)) as image:
+            assert image.size == (1024, 512)
+            assert not image.getexif()
+
+        def fail(job):
+            raise AssertionError(f"{job[0]} converted again")
+
+        monkeypatch.setattr(anki.transcode, "_transcode", fail)
+
+        assert optimiser.optimise(names) == optimised
+
+    def test_settings(self, tmp_path) -> None:
+        pytest.importorskip("PIL.Image")
+        media = anki.media.MediaCache(str(tmp_path))
+        names = {"https://a/big.png": store(media, "leetcode-big.png", png(2000, 2000))}
+
+        webp = anki.transcode.MediaOptimiser(media, 512, workers=1).optimise(names)
+        jpeg = anki.transcode.MediaOptimiser(
+            media, 512, image_format="jpeg", workers=1
+        ).optimise(names)
+
+        assert webp["https://a/big.png"].endswith(".webp")
+        assert jpeg["https://a/big.png"].endswith(".jpg")
+
+    def test_broken_image(self, tmp_path) -> None:
+        pytest.importorskip("PIL.Image")
+        media = anki.media.MediaCache(str(tmp_path))
+        names = {"https://a/broken.png": store(media, "leetcode-broken.png", b"oops")}
+
+        optimised = anki.transcode.MediaOptimiser(media, workers=1).optimise(names)
+
+        assert optimised == names
+
+    def test_decompression_bomb(self, tmp_path, monkeypatch) -> None:
+        image_module = pytest.importorskip("PIL.Image")
+        media = anki.media.MediaCache(str(tmp_path))
+        names = {
+            "https://a/bomb.png": store(media, "leetcode-bomb.png", png(300, 300)),
+            "https://a/big.png": store(media, "leetcode-big.png", png(200, 100)),
+        }
+        monkeypatch.setattr(image_module, "MAX_IMAGE_PIXELS", 20000)
+
+        optimised = anki.transcode.MediaOptimiser(media, 64, workers=1).optimise(names)
+
+        # The bomb is packed as it is, the rest is still converted
+        assert optimised["https://a/bomb.png"] == "leetcode-bomb.png"
+        assert optimised["https://a/big.png"].endswith(".webp")
+
+
+class TestFitBudget:
+    def test_largest_stay_remote(self, tmp_path) -> None:
+        media = anki.media.MediaCache(str(tmp_path))
+        names = {
+            "https://a/1": store(media, "leetcode-1.png", b"x" * 100),
+            "https://a/2": store(media, "leetcode-2.png", b"x" * 60),
+            "https://a/3": store(media, "leetcode-3.png", b"x" * 50),
+            "https://a/also-2": "leetcode-2.png",
+        }
+
+        assert anki.transcode.fit_budget(media, names, 1000) == names
+        assert anki.transcode.fit_budget(media, names, 120) == {
+            "https://a/2": "leetcode-2.png",
+            "https://a/3": "leetcode-3.png",
+            "https://a/also-2": "leetcode-2.png",
+        }
+        assert anki.transcode.fit_budget(media, names, 55) == {
+            "https://a/3": "leetcode-3.png"
+        }
+        assert anki.transcode.fit_budget(media, names, 0) == {}
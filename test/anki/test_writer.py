@@ -0,0 +1,83 @@
+import concurrent.futures
+import json
+import os
+import sqlite3
+import zipfile
+
+import genanki  # type: ignore
+import pytest
+
+import anki.writer
+
+MODEL = genanki.Model(
+    1234,
+    "Test model",
+    fields=[{"name": "Question"}, {"name": "Answer"}],
+    templates=[{"name": "Card", "qfmt": "{{Question}}", "afmt": "{{Answer}}"}],
+)
+
+
+def make_note(index: int) -> genanki.Note:
+    return genanki.Note(model=MODEL, fields=[f"question {index}", f"answer {index}"])
+
+
+def read_collection(path: str, tmp_path) -> sqlite3.Connection:
+    with zipfile.ZipFile(path) as package:
+        package.extract("collection.anki2", tmp_path)
+        assert json.loads(package.read("media")) == {}
+    return sqlite3.connect(os.path.join(tmp_path, "collection.anki2"))
+
+
+class TestStreamingPackageWriter:
+    def test_notes_are_written(self, tmp_path) -> None:
+        path = str(tmp_path / "deck.apkg")
+        deck = genanki.Deck(42, "Deck")
+
+        with anki.writer.StreamingPackageWriter(path, deck, commit_batch=2) as writer:
+            for index in range(5):
+                writer.add_note(make_note(index))
+
+        assert writer.count == 5
+        connection = read_collection(path, tmp_path)
+        fields = [row[0] for row in connection.execute("SELECT flds FROM notes")]
+        assert fields == [f"question {i}\x1fanswer {i}" for i in range(5)]
+        assert connection.execute("SELECT COUNT(*) FROM cards").fetchone() == (5,)
+        decks_json, models_json = connection.execute(
+            "SELECT decks, models FROM col"
+        ).fetchone()
+        assert json.loads(decks_json)["42"]["name"] == "Deck"
+        assert json.loads(models_json)["1234"]["name"] == "Test model"
+
+    def test_sub_decks(self, tmp_path) -> None:
+        path = str(tmp_path / "deck.apkg")
+        parent = genanki.Deck(1, "Parent")
+        child = genanki.Deck(2, "Parent::Child")
+
+        with anki.writer.StreamingPackageWriter(path, parent) as writer:
+            writer.add_deck(child)
+            writer.add_note(make_note(0), child)
+
+        connection = read_collection(path, tmp_path)
+        assert connection.execute("SELECT did FROM cards").fetchall() == [(2,)]
+
+    def test_close_in_other_thread(self, tmp_path) -> None:
+        path = str(tmp_path / "deck.apkg")
+        writer = anki.writer.StreamingPackageWriter(path, genanki.Deck(1, "Deck"))
+        writer.add_note(make_note(0))
+
+        with concurrent.futures.ThreadPoolExecutor(1) as executor:
+            executor.submit(writer.close).result()
+
+        assert os.path.exists(path)
+
+    def test_no_file_on_error(self, tmp_path) -> None:
+        path = str(tmp_path / "deck.apkg")
+
+        with pytest.raises(RuntimeError):
+            with anki.writer.StreamingPackageWriter(
+                path, genanki.Deck(1, "Deck")
+            ) as writer:
+                writer.add_note(make_note(0))
+                raise RuntimeError()
+
+        assert not os.path.exists(path)
@@ -0,0 +1,14 @@
+import pytest
+
+import leetcode_anki.helpers.data
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch) -> str:
+    """
+    Keep response cache and checkpoint journals of every test in a temporary
+    directory
+    """
+    directory = str(tmp_path / "cache")
+    monkeypatch.setattr(leetcode_anki.helpers.data, "CACHE_DIR", directory)
+    return directory
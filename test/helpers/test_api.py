@@ -0,0 +1,222 @@
+import functools
+import http.server
+import threading
+from typing import Iterator
+from unittest import mock
+
+import leetcode.rest  # type: ignore
+import pytest
+
+import leetcode_anki.helpers.api
+import leetcode_anki.helpers.replay
+
+
+@pytest.fixture(autouse=True)
+def reset_client() -> Iterator[None]:
+    leetcode_anki.helpers.api._client = None
+    yield
+    leetcode_anki.helpers.api._client = None
+
+
+@mock.patch.dict("os.environ", {"LEETCODE_SESSION_ID": "test"})
+@mock.patch("leetcode_anki.helpers.api._get_csrf_cookie")
+class TestLeetcodeApiClient:
+    def test_singleton(self, mock_get_csrf_cookie: mock.Mock) -> None:
+        mock_get_csrf_cookie.return_value = "csrf"
+
+        client = leetcode_anki.helpers.api._get_leetcode_api_client()
+
+        assert leetcode_anki.helpers.api._get_leetcode_api_client() is client
+        assert mock_get_csrf_cookie.call_count == 1
+
+    def test_pool_grows(self, mock_get_csrf_cookie: mock.Mock) -> None:
+        client = leetcode_anki.helpers.api._get_leetcode_api_client(pool_size=2)
+        configuration = client.api_client.configuration
+        assert configuration.connection_pool_maxsize == 2
+
+        old_pool = client.api_client.rest_client.pool_manager
+        with mock.patch.object(old_pool, "clear") as clear:
+            leetcode_anki.helpers.api._get_leetcode_api_client(pool_size=8)
+        assert configuration.connection_pool_maxsize == 8
+        assert client.api_client.rest_client.pool_manager is not old_pool
+        clear.assert_called_once_with()
+
+        leetcode_anki.helpers.api._get_leetcode_api_client(pool_size=4)
+        assert configuration.connection_pool_maxsize == 8
+
+    def test_csrf_refresh_on_403(self, mock_get_csrf_cookie: mock.Mock) -> None:
+        mock_get_csrf_cookie.side_effect = ["stale", "fresh"]
+        client = leetcode_anki.helpers.api._get_leetcode_api_client()
+        tokens = []
+
+        def graphql_post(self, **kwargs):
+            tokens.append(self.api_client.configuration.api_key["csrftoken"])
+            if len(tokens) == 1:
+                raise leetcode.rest.ApiException(status=403, reason="Forbidden")
+            return "response"
+
+        with mock.patch(
+            "leetcode.api.default_api.DefaultApi.graphql_post", graphql_post
+        ):
+            assert client.graphql_post(body=None) == "response"
+
+        assert tokens == ["stale", "fresh"]
+        assert mock_get_csrf_cookie.call_args_list == [
+            mock.call("https://leetcode.com", "test"),
+            mock.call("https://leetcode.com", "test"),
+        ]
+
+    def test_other_errors_are_raised(self, mock_get_csrf_cookie: mock.Mock) -> None:
+        client = leetcode_anki.helpers.api._get_leetcode_api_client()
+
+        with mock.patch(
+            "leetcode.api.default_api.DefaultApi.graphql_post",
+            side_effect=leetcode.rest.ApiException(status=500, reason="Error"),
+        ):
+            with pytest.raises(leetcode.rest.ApiException):
+                client.graphql_post(body=None)
+
+        assert mock_get_csrf_cookie.call_count == 1
+
+    def test_connection_stats(self, mock_get_csrf_cookie: mock.Mock) -> None:
+        assert leetcode_anki.helpers.api.connection_stats() == {
+            "requests": 0,
+            "connections": 0,
+            "reused": 0,
+        }
+
+        client = leetcode_anki.helpers.api._get_leetcode_api_client()
+        pool = client.api_client.rest_client.pool_manager.connection_from_url(
+            "https://leetcode.com"
+        )
+        pool.num_requests = 10
+        pool.num_connections = 2
+
+        assert leetcode_anki.helpers.api.connection_stats() == {
+            "requests": 10,
+            "connections": 2,
+            "reused": 8,
+        }
+
+
+class TestCsrfToken:
+    def test_from_configured_host(self, monkeypatch) -> None:
+        monkeypatch.setenv("LEETCODE_SESSION_ID", "test")
+        monkeypatch.delenv("LEETCODE_CSRF_TOKEN", raising=False)
+        with leetcode_anki.helpers.replay.StandInServer([]) as server:
+            monkeypatch.setenv("LEETCODE_API_HOST", server.url)
+            client = leetcode_anki.helpers.api._get_leetcode_api_client()
+            api_key = client.api_client.configuration.api_key
+
+            assert api_key["csrftoken"] == "stand-in"
+
+            api_key["csrftoken"] = "stale"
+            client._refresh_csrf_token("stale")
+
+            assert api_key["csrftoken"] == "stand-in"
+
+    def test_no_token(self, tmp_path) -> None:
+        # A server which sets no cookies
+        server = http.server.ThreadingHTTPServer(
+            ("127.0.0.1", 0),
+            functools.partial(
+                http.server.SimpleHTTPRequestHandler, directory=str(tmp_path)
+            ),
+        )
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            with pytest.raises(ValueError, match="No CSRF token"):
+                leetcode_anki.helpers.api._get_csrf_cookie(
+                    f"http://127.0.0.1:{server.server_address[1]}", "test"
+                )
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class TestRetry:
+    @mock.patch("time.sleep")
+    def test_retries_until_success(self, mock_sleep: mock.Mock) -> None:
+        func = mock.Mock(side_effect=[ValueError(), ValueError(), 42])
+        func.__qualname__ = "func"
+
+        wrapped = leetcode_anki.helpers.api.retry(
+            times=3, exceptions=(ValueError,), delay=1
+        )(func)
+
+        assert wrapped() == 42
+        assert func.call_count == 3
+        assert mock_sleep.call_count == 2
+        # Full jitter: up to delay, then up to 2 * delay
+        assert 0 <= mock_sleep.call_args_list[0].args[0] <= 1
+        assert 0 <= mock_sleep.call_args_list[1].args[0] <= 2
+
+    @mock.patch("time.sleep")
+    def test_last_try_raises(self, mock_sleep: mock.Mock) -> None:
+        func = mock.Mock(side_effect=ValueError())
+        func.__qualname__ = "func"
+
+        wrapped = leetcode_anki.helpers.api.retry(
+            times=3, exceptions=(ValueError,), delay=1
+        )(func)
+
+        with pytest.raises(ValueError):
+            wrapped()
+        assert func.call_count == 3
+        assert mock_sleep.call_count == 2
+
+    @mock.patch("time.sleep")
+    def test_other_exceptions_not_retried(self, mock_sleep: mock.Mock) -> None:
+        func = mock.Mock(side_effect=KeyError())
+        func.__qualname__ = "func"
+
+        wrapped = leetcode_anki.helpers.api.retry(
+            times=3, exceptions=(ValueError,), delay=1
+        )(func)
+
+        with pytest.raises(KeyError):
+            wrapped()
+        assert func.call_count == 1
+        mock_sleep.assert_not_called()
+
+    @mock.patch("time.sleep")
+    def test_retry_after(self, mock_sleep: mock.Mock) -> None:
+        rate_limited = leetcode.rest.ApiException(status=429)
+        rate_limited.headers = {"Retry-After": "7"}
+        not_found = leetcode.rest.ApiException(status=404)
+        func = mock.Mock(side_effect=[rate_limited, not_found])
+        func.__qualname__ = "func"
+
+        wrapped = leetcode_anki.helpers.api.retry(
+            times=3, exceptions=(ValueError,), delay=1
+        )(func)
+
+        with pytest.raises(leetcode.rest.ApiException):
+            wrapped()
+        assert func.call_count == 2
+        mock_sleep.assert_called_once_with(7.0)
+
+    @mock.patch("time.sleep")
+    def test_budget(self, mock_sleep: mock.Mock) -> None:
+        func = mock.Mock(side_effect=ValueError())
+        func.__qualname__ = "func"
+        budget = leetcode_anki.helpers.api.RetryBudget(max_retries=1, window=60)
+
+        wrapped = leetcode_anki.helpers.api.retry(
+            times=5, exceptions=(ValueError,), delay=1, budget=budget
+        )(func)
+
+        with pytest.raises(ValueError):
+            wrapped()
+        assert func.call_count == 2
+        assert leetcode_anki.helpers.api.retry_counters()["budget_exhausted"] >= 1
+
+    def test_coroutine(self) -> None:
+        async def fetch() -> int:
+            return 42
+
+        with pytest.raises(TypeError, match="synchronous"):
+            leetcode_anki.helpers.api.retry(times=2, exceptions=(ValueError,), delay=0)(
+                fetch
+            )
@@ -0,0 +1,127 @@
+import json
+from typing import Any, Dict, List
+from unittest import mock
+
+import pytest
+import urllib3  # type: ignore
+
+import leetcode_anki.helpers.batch
+import leetcode_anki.helpers.data
+from csv_reader import OLLEntity
+
+
+def dummy_response(slugs: Dict[str, Any]) -> mock.Mock:
+    response = mock.Mock()
+    response.data = json.dumps({"data": slugs}).encode()
+    return response
+
+
+def dummy_question(slug: str) -> Dict[str, Any]:
+    return {"titleSlug": slug, "title": slug.upper(), "difficulty": "Easy"}
+
+
+def dummy_graphql_post(body: Any, **kwargs: Any) -> mock.Mock:
+    return dummy_response(
+        {
+            alias: dummy_question(slug)
+            for alias, slug in zip(
+                (f"q{i}" for i in range(len(body.variables))),
+                body.variables.values(),
+            )
+        }
+    )
+
+
+class TestBatchQuery:
+    def test_build_batch_query(self) -> None:
+        query = leetcode_anki.helpers.batch.build_batch_query(["two-sum", "3sum"])
+
+        assert query.variables == {"s0": "two-sum", "s1": "3sum"}
+        assert "$s0: String!, $s1: String!" in query.query
+        assert "q0: question(titleSlug: $s0)" in query.query
+        assert "q1: question(titleSlug: $s1)" in query.query
+
+    def test_build_empty_batch(self) -> None:
+        with pytest.raises(ValueError):
+            leetcode_anki.helpers.batch.build_batch_query([])
+
+    def test_fetch_batch(self) -> None:
+        api = mock.Mock()
+        api.graphql_post.return_value = dummy_response(
+            {"q0": dummy_question("two-sum"), "q1": None}
+        )
+
+        result = leetcode_anki.helpers.batch.fetch_batch(api, ["two-sum", "missing"])
+
+        assert result["two-sum"].title == "TWO-SUM"
+        assert result["missing"] is None
+
+    def test_is_timeout(self) -> None:
+        timeout = urllib3.exceptions.ReadTimeoutError(None, "/", "timed out")
+
+        assert leetcode_anki.helpers.batch.is_timeout(timeout)
+        assert leetcode_anki.helpers.batch.is_timeout(
+            urllib3.exceptions.MaxRetryError(None, "/", timeout)
+        )
+        assert not leetcode_anki.helpers.batch.is_timeout(RuntimeError())
+
+
+class TestAdaptiveBatchSize:
+    def test_shrink_and_grow(self) -> None:
+        batch_size = leetcode_anki.helpers.batch.AdaptiveBatchSize(8)
+
+        batch_size.shrink()
+        assert batch_size.size == 4
+        batch_size.shrink()
+        batch_size.shrink()
+        batch_size.shrink()
+        assert batch_size.size == 1
+
+        for _ in range(20):
+            batch_size.grow()
+        assert batch_size.size == 8
+
+
+class TestLeetcodeSlugDataBatches:
+    def _slug_data(
+        self, slugs: List[str], batch_size: int
+    ) -> leetcode_anki.helpers.data.LeetcodeSlugData:
+        leetcode_data = leetcode_anki.helpers.data.LeetcodeSlugData(
+            [OLLEntity(slug, "", f"{slug} desc") for slug in slugs],
+            concurrency=2,
+            rate=1000,
+            batch_size=batch_size,
+        )
+        disk_cache = mock.Mock()
+        disk_cache.get.return_value = None
+        leetcode_data.__dict__["_disk_cache"] = disk_cache
+        leetcode_data.__dict__["api_instance"] = mock.Mock()
+        return leetcode_data
+
+    def test_pairs_details_with_oll(self) -> None:
+        slugs = [f"problem-{i}" for i in range(10)]
+        leetcode_data = self._slug_data(slugs, batch_size=4)
+        leetcode_data.api_instance.graphql_post.side_effect = dummy_graphql_post
+
+        problems = leetcode_data.get_problems()
+
+        assert [problem.details.title_slug for problem in problems] == slugs
+        assert [problem.oll_desc.oll_desc for problem in problems] == [
+            f"{slug} desc" for slug in slugs
+        ]
+        assert leetcode_data.api_instance.graphql_post.call_count == 3
+
+    def test_shrinks_on_timeout(self) -> None:
+        slugs = [f"problem-{i}" for i in range(4)]
+        leetcode_data = self._slug_data(slugs, batch_size=4)
+
+        def timeout_on_large_batches(body: Any, **kwargs: Any) -> mock.Mock:
+            if len(body.variables) > 2:
+                raise urllib3.exceptions.ReadTimeoutError(None, "/", "timed out")
+            return dummy_graphql_post(body)
+
+        leetcode_data.api_instance.graphql_post.side_effect = timeout_on_large_batches
+
+        problems = leetcode_data.get_problems()
+
+        assert [problem.details.title_slug for problem in problems] == slugs
@@ -0,0 +1,126 @@
+import os
+import stat
+from unittest import mock
+
+import leetcode.models.graphql_question_detail  # type: ignore
+import leetcode.models.graphql_question_topic_tag  # type: ignore
+import pytest
+
+import leetcode_anki.helpers.cache
+import leetcode_anki.helpers.serialization
+
+QUESTION_DETAIL = leetcode.models.graphql_question_detail.GraphqlQuestionDetail(
+    freq_bar=1.1,
+    question_frontend_id="1",
+    title="test title",
+    title_slug="test",
+    content="test content",
+    is_paid_only=False,
+    difficulty="Hard",
+    likes=1,
+    dislikes=1,
+    topic_tags=[
+        leetcode.models.graphql_question_topic_tag.GraphqlQuestionTopicTag(
+            name="test tag",
+            slug="test-tag",
+        )
+    ],
+    stats='{"totalSubmissionRaw": 1, "totalAcceptedRaw": 1}',
+    hints=["test hint 1", "test hint 2"],
+)
+
+
+class TestSerialization:
+    def test_round_trip(self) -> None:
+        data = leetcode_anki.helpers.serialization.to_json(QUESTION_DETAIL)
+
+        assert data["titleSlug"] == "test"
+        assert data["topicTags"] == [{"name": "test tag", "slug": "test-tag"}]
+        assert (
+            leetcode_anki.helpers.serialization.from_json(
+                data, "GraphqlQuestionDetail"
+            )
+            == QUESTION_DETAIL
+        )
+
+    def test_list(self) -> None:
+        data = leetcode_anki.helpers.serialization.to_json([QUESTION_DETAIL])
+
+        assert leetcode_anki.helpers.serialization.from_json(
+            data, "list[GraphqlQuestionDetail]"
+        ) == [QUESTION_DETAIL]
+
+
+class TestAtomicWrite:
+    def test_write(self, tmp_path) -> None:
+        path = str(tmp_path / "out" / "file.txt")
+
+        with leetcode_anki.helpers.cache.atomic_write(
+            path, "w", encoding="utf-8"
+        ) as output:
+            output.write("first")
+
+        with open(path, encoding="utf-8") as output:
+            assert output.read() == "first"
+        # Readable by everyone, like a file created with open()
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+
+    def test_failed_write(self, tmp_path) -> None:
+        path = str(tmp_path / "file.bin")
+        with leetcode_anki.helpers.cache.atomic_write(path) as output:
+            output.write(b"first")
+
+        with pytest.raises(RuntimeError):
+            with leetcode_anki.helpers.cache.atomic_write(path) as output:
+                output.write(b"second")
+                raise RuntimeError("crash")
+
+        assert os.listdir(tmp_path) == ["file.bin"]
+        with open(path, "rb") as output:
+            assert output.read() == b"first"
+
+
+class TestDiskCache:
+    def test_get_set(self, tmp_path) -> None:
+        cache = leetcode_anki.helpers.cache.DiskCache(str(tmp_path))
+
+        assert cache.get("question:test") is None
+        cache.set("question:test", {"titleSlug": "test"})
+        assert cache.get("question:test") == {"titleSlug": "test"}
+
+        # A new instance reads what the previous one stored
+        assert leetcode_anki.helpers.cache.DiskCache(str(tmp_path)).get(
+            "question:test"
+        ) == {"titleSlug": "test"}
+
+    def test_ttl(self, tmp_path) -> None:
+        cache = leetcode_anki.helpers.cache.DiskCache(str(tmp_path))
+
+        with mock.patch("time.time", mock.Mock(return_value=1000.0)):
+            cache.set("count:", 10)
+
+        with mock.patch("time.time", mock.Mock(return_value=1100.0)):
+            assert cache.get("count:", ttl=200) == 10
+            assert cache.get("count:", ttl=50) is None
+            assert cache.get("count:") == 10
+
+    def test_no_temporary_files_left(self, tmp_path) -> None:
+        cache = leetcode_anki.helpers.cache.DiskCache(str(tmp_path))
+        cache.set("a", "value")
+
+        files = [name for _, _, names in os.walk(tmp_path) for name in names]
+        assert len(files) == 1
+        assert files[0].endswith(".json")
+
+    def test_lru_eviction(self, tmp_path) -> None:
+        cache = leetcode_anki.helpers.cache.DiskCache(str(tmp_path), max_bytes=250)
+
+        cache.set("a", "x" * 50)
+        cache.set("b", "x" * 50)
+        # "a" is used again, so "b" becomes the least recently used entry
+        assert cache.get("a") is not None
+        cache.set("c", "x" * 50)
+
+        assert cache.get("a") is not None
+        assert cache.get("b") is None
+        assert cache.get("c") is not None
@@ -0,0 +1,189 @@
+import asyncio
+import threading
+import time
+from typing import List, Set
+from unittest import mock
+
+import leetcode.models.graphql_question_detail  # type: ignore
+import pytest
+from urllib3.exceptions import ProtocolError  # type: ignore
+
+import leetcode_anki.helpers.data
+from csv_reader import OLLEntity
+
+
+def dummy_questions(
+    offset: int, page_size: int, page: int
+) -> List[leetcode.models.graphql_question_detail.GraphqlQuestionDetail]:
+    skip = offset + page * page_size
+    return [
+        leetcode.models.graphql_question_detail.GraphqlQuestionDetail(
+            title_slug=f"problem-{skip + i}"
+        )
+        for i in range(page_size)
+    ]
+
+
+@mock.patch("leetcode_anki.helpers.data._get_leetcode_api_client", mock.Mock())
+@mock.patch(
+    "leetcode_anki.helpers.data.LeetcodePageData._get_problems_count",
+    mock.Mock(return_value=100),
+)
+class TestLeetcodePageData:
+    def test_pages_are_reassembled_in_order(self) -> None:
+        leetcode_data = leetcode_anki.helpers.data.LeetcodePageData(
+            0, 99, page_size=10, concurrency=4
+        )
+        barrier = threading.Barrier(4, timeout=5)
+
+        def slow_first_pages(
+            offset: int, page_size: int, page: int
+        ) -> List[leetcode.models.graphql_question_detail.GraphqlQuestionDetail]:
+            if page < 4:
+                # First pages are all in flight at the same time and finish
+                # in reverse order
+                barrier.wait()
+                time.sleep((4 - page) * 0.01)
+            return dummy_questions(offset, page_size, page)
+
+        with mock.patch.object(
+            leetcode_data, "_get_problems_data_page", side_effect=slow_first_pages
+        ):
+            problems = leetcode_data._get_problems_data()
+
+        assert [problem.title_slug for problem in problems] == [
+            f"problem-{i}" for i in range(100)
+        ]
+
+    def test_failed_page_is_retried_alone(self) -> None:
+        leetcode_data = leetcode_anki.helpers.data.LeetcodePageData(
+            0, 99, page_size=10
+        )
+        failures = {3: 2}
+        calls: List[int] = []
+
+        def flaky(
+            offset: int, page_size: int, page: int
+        ) -> List[leetcode.models.graphql_question_detail.GraphqlQuestionDetail]:
+            calls.append(page)
+            if failures.get(page):
+                failures[page] -= 1
+                raise ProtocolError("connection reset")
+            return dummy_questions(offset, page_size, page)
+
+        with mock.patch.object(
+            leetcode_data, "_get_problems_data_page", side_effect=flaky
+        ):
+            problems = leetcode_data._get_problems_data()
+
+        assert len(problems) == 100
+        assert sorted(calls) == sorted(list(range(10)) + [3, 3])
+
+    def test_page_failing_too_often(self) -> None:
+        leetcode_data = leetcode_anki.helpers.data.LeetcodePageData(
+            0, 99, page_size=10
+        )
+
+        def broken(
+            offset: int, page_size: int, page: int
+        ) -> List[leetcode.models.graphql_question_detail.GraphqlQuestionDetail]:
+            if page == 5:
+                raise ProtocolError("connection reset")
+            return dummy_questions(offset, page_size, page)
+
+        with mock.patch.object(
+            leetcode_data, "_get_problems_data_page", side_effect=broken
+        ):
+            with pytest.raises(ProtocolError):
+                leetcode_data._get_problems_data()
+
+    def test_resume(self) -> None:
+        leetcode_data = leetcode_anki.helpers.data.LeetcodePageData(
+            0, 99, page_size=10, concurrency=10
+        )
+        journaled: Set[str] = set()
+        journal_append = leetcode_data._journal.append
+
+        def append(key: str, value: str) -> None:
+            journal_append(key, value)
+            journaled.add(key)
+
+        release = threading.Event()
+
+        def interrupted(
+            offset: int, page_size: int, page: int
+        ) -> List[leetcode.models.graphql_question_detail.GraphqlQuestionDetail]:
+            if page in (2, 5):
+                # Still in flight when the fetch is interrupted
+                release.wait(5)
+            if page == 7:
+                # Later pages are journaled before the earlier ones finish
+                deadline = time.monotonic() + 5
+                while not {"0", "1", "3", "4", "6", "8", "9"} <= journaled:
+                    if time.monotonic() > deadline:
+                        raise AssertionError("Pages were not journaled")
+                    time.sleep(0.005)
+                threading.Timer(0.2, release.set).start()
+                raise KeyboardInterrupt
+            return dummy_questions(offset, page_size, page)
+
+        with mock.patch.object(
+            leetcode_data, "_get_problems_data_page", side_effect=interrupted
+        ), mock.patch.object(leetcode_data._journal, "append", side_effect=append):
+            with pytest.raises(KeyboardInterrupt):
+                leetcode_data._get_problems_data()
+
+        assert journaled == {"0", "1", "3", "4", "6", "8", "9"}
+
+        resumed = leetcode_anki.helpers.data.LeetcodePageData(
+            0, 99, page_size=10, concurrency=4, resume=True
+        )
+        with mock.patch.object(
+            resumed, "_get_problems_data_page", side_effect=dummy_questions
+        ) as mock_get_page:
+            problems = resumed._get_problems_data()
+
+        assert [problem.title_slug for problem in problems] == [
+            f"problem-{i}" for i in range(100)
+        ]
+        # Only the gaps of the journal are fetched again
+        fetched_pages = [call.args[2] for call in mock_get_page.call_args_list]
+        assert sorted(fetched_pages) == [2, 5, 7]
+
+
+class TestLeetcodeData:
+    def test_journal_name_is_required(self) -> None:
+        class NoJournal(leetcode_anki.helpers.data.LeetcodeData):
+            async def _get_problem_data(self, problem_slug: str):
+                return None
+
+        with pytest.raises(TypeError, match="_journal_name"):
+            NoJournal()
+
+
+class TestAsyncLoad:
+    # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
+    #  `pytest.mark.asyncio`.
+    @pytest.mark.asyncio
+    async def test_load_does_not_block_loop(self) -> None:
+        leetcode_data = leetcode_anki.helpers.data.LeetcodeSlugData([])
+        fetched = threading.Event()
+
+        def slow_fetch() -> List[OLLEntity]:
+            fetched.wait(timeout=5)
+            return []
+
+        with mock.patch.object(
+            leetcode_data, "_sync", side_effect=slow_fetch
+        ) as mock_get_problems:
+            load = asyncio.ensure_future(
+                asyncio.gather(leetcode_data.load(), leetcode_data.load())
+            )
+            # The loop is still free while the problems are being fetched
+            await asyncio.sleep(0.01)
+            assert not load.done()
+            fetched.set()
+            await load
+
+            assert await leetcode_data.all_problems_handles() == []
+            assert mock_get_problems.call_count == 1
@@ -0,0 +1,39 @@
+import leetcode_anki.helpers.journal
+
+
+class TestCheckpointJournal:
+    def test_replay(self, tmp_path) -> None:
+        journal = leetcode_anki.helpers.journal.CheckpointJournal(
+            str(tmp_path / "journal" / "test.jsonl")
+        )
+
+        assert journal.replay() == {}
+        journal.append("two-sum", {"titleSlug": "two-sum"})
+        journal.append("3sum", {"titleSlug": "3sum"})
+        journal.append("two-sum", {"titleSlug": "two-sum", "title": "Two Sum"})
+
+        assert journal.replay() == {
+            "two-sum": {"titleSlug": "two-sum", "title": "Two Sum"},
+            "3sum": {"titleSlug": "3sum"},
+        }
+
+    def test_torn_record(self, tmp_path) -> None:
+        path = tmp_path / "test.jsonl"
+        journal = leetcode_anki.helpers.journal.CheckpointJournal(str(path))
+        journal.append("0", [1])
+        with open(path, "a", encoding="utf-8") as journal_file:
+            journal_file.write('{"key": "1", "val')
+
+        assert journal.replay() == {"0": [1]}
+        journal.append("2", [3])
+        assert journal.replay() == {"0": [1], "2": [3]}
+
+    def test_reset(self, tmp_path) -> None:
+        journal = leetcode_anki.helpers.journal.CheckpointJournal(
+            str(tmp_path / "test.jsonl")
+        )
+        journal.append("0", [1])
+        journal.reset()
+        journal.reset()
+
+        assert journal.replay() == {}
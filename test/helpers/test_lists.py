@@ -0,0 +1,69 @@
+import json
+from unittest import mock
+
+import leetcode_anki.helpers.data
+import leetcode_anki.helpers.lists
+
+
+def dummy_page(total: int, slugs) -> mock.Mock:
+    response = mock.Mock()
+    response.data = json.dumps(
+        {
+            "data": {
+                "problemsetQuestionList": {
+                    "totalNum": total,
+                    "questions": [{"titleSlug": slug} for slug in slugs],
+                }
+            }
+        }
+    ).encode()
+    return response
+
+
+class TestLeetcodeList:
+    def test_build_list_query(self) -> None:
+        query = leetcode_anki.helpers.lists.build_list_query("abc", 10, 5)
+
+        assert query.variables["filters"] == {"listId": "abc"}
+        assert query.variables["skip"] == 10
+        assert query.variables["limit"] == 5
+        assert "titleSlug" in query.query
+        assert "content" not in query.query
+
+    @mock.patch("leetcode_anki.helpers.data._get_leetcode_api_client")
+    def test_slugs_are_paged_and_cached(self, mock_client: mock.Mock) -> None:
+        mock_client.return_value.graphql_post.side_effect = [
+            dummy_page(3, ["a", "b"]),
+            dummy_page(3, ["c"]),
+        ]
+
+        leetcode_list = leetcode_anki.helpers.data.LeetcodeList(
+            "abc", rate=1000, page_size=2
+        )
+        assert leetcode_list.slugs == ["a", "b", "c"]
+
+        # Second instance is served from the disk cache
+        assert leetcode_anki.helpers.data.LeetcodeList("abc", rate=1000).slugs == [
+            "a",
+            "b",
+            "c",
+        ]
+        assert mock_client.return_value.graphql_post.call_count == 2
+
+
+class TestRowSignature:
+    def test_ignores_tag_order_and_other_fields(self) -> None:
+        row = {
+            "titleSlug": "two-sum",
+            "questionFrontendId": "1",
+            "title": "Two Sum",
+            "difficulty": "Easy",
+            "isPaidOnly": False,
+            "topicTags": [{"slug": "array"}, {"slug": "hash-table"}],
+        }
+        same = dict(row, topicTags=[{"slug": "hash-table"}, {"slug": "array"}], likes=5)
+        changed = dict(row, difficulty="Medium")
+
+        signature = leetcode_anki.helpers.lists.row_signature
+        assert signature(row) == signature(same)
+        assert signature(row) != signature(changed)
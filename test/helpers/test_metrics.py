@@ -0,0 +1,104 @@
+import json
+import os
+import pstats
+from unittest import mock
+
+import pytest
+
+import leetcode_anki.helpers.api
+import leetcode_anki.helpers.data
+import leetcode_anki.helpers.metrics
+import leetcode_anki.helpers.replay
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics(monkeypatch) -> None:
+    monkeypatch.setattr(
+        leetcode_anki.helpers.metrics, "_metrics", leetcode_anki.helpers.metrics.Metrics()
+    )
+
+
+class TestMetrics:
+    def test_report(self) -> None:
+        with mock.patch("time.perf_counter", side_effect=[1.0, 1.5, 2.0, 4.0]):
+            with leetcode_anki.helpers.metrics.timed("fast"):
+                pass
+            with leetcode_anki.helpers.metrics.timed("slow"):
+                pass
+        leetcode_anki.helpers.metrics.count("bytes", 10)
+        leetcode_anki.helpers.metrics.count("bytes", 5)
+
+        report = leetcode_anki.helpers.metrics.report()
+
+        # Slowest stage first
+        assert list(report["stages"]) == ["slow", "fast"]
+        assert report["stages"]["fast"] == {
+            "calls": 1,
+            "total": 0.5,
+            "mean": 0.5,
+            "min": 0.5,
+            "max": 0.5,
+        }
+        assert report["counters"] == {"bytes": 15}
+
+        text = leetcode_anki.helpers.metrics.format_report(report)
+        assert text.splitlines()[1].split() == ["slow", "1", "2.000", "2000.00", "2000.00"]
+        assert "bytes" in text
+
+    def test_failed_block_is_timed(self) -> None:
+        with pytest.raises(RuntimeError):
+            with leetcode_anki.helpers.metrics.timed("failing"):
+                raise RuntimeError()
+
+        assert leetcode_anki.helpers.metrics.report()["stages"]["failing"]["calls"] == 1
+
+    def test_write_report(self, tmp_path) -> None:
+        path = str(tmp_path / "metrics.json")
+        leetcode_anki.helpers.metrics.count("notes")
+
+        leetcode_anki.helpers.metrics.write_report(
+            path, leetcode_anki.helpers.metrics.report()
+        )
+
+        with open(path, encoding="utf-8") as report_file:
+            assert json.load(report_file)["counters"] == {"notes": 1}
+
+    def test_graphql_calls(self, monkeypatch) -> None:
+        monkeypatch.setenv("LEETCODE_SESSION_ID", "test")
+        monkeypatch.setenv("LEETCODE_CSRF_TOKEN", "test")
+        monkeypatch.setattr(leetcode_anki.helpers.api, "_client", None)
+        with leetcode_anki.helpers.replay.StandInServer(
+            [leetcode_anki.helpers.replay.SyntheticLeetcode(5)]
+        ) as server:
+            monkeypatch.setenv("LEETCODE_API_HOST", server.url)
+            leetcode_anki.helpers.data.LeetcodePageData(
+                0, 4, page_size=5, rate=1000
+            )._get_problems_data()
+
+        report = leetcode_anki.helpers.metrics.report()
+        assert report["stages"]["client_init"]["calls"] == 1
+        assert report["stages"]["graphql"]["calls"] == server.stats["requests"]
+        assert report["counters"]["bytes_fetched"] > 0
+        assert report["counters"]["cache_misses"] > 0
+
+
+class TestProfiled:
+    def test_cprofile(self, tmp_path) -> None:
+        output = str(tmp_path / "run.prof")
+
+        with leetcode_anki.helpers.metrics.profiled("cprofile", output):
+            sorted(range(1000))
+
+        assert os.path.exists(output)
+        assert pstats.Stats(output).total_calls > 0
+
+    def test_disabled(self, tmp_path) -> None:
+        with leetcode_anki.helpers.metrics.profiled(None, str(tmp_path / "run.prof")):
+            pass
+
+        assert not os.listdir(tmp_path)
+
+    def test_unknown(self) -> None:
+        with pytest.raises(ValueError):
+            with leetcode_anki.helpers.metrics.profiled("yappi"):
+                pass
@@ -0,0 +1,50 @@
+from unittest import mock
+
+import pytest
+
+import leetcode_anki.helpers.ratelimit
+
+
+class TestTokenBucket:
+    def test_burst_is_free(self) -> None:
+        bucket = leetcode_anki.helpers.ratelimit.TokenBucket(rate=1, capacity=3)
+
+        assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+
+    @mock.patch("time.monotonic", mock.Mock(return_value=100.0))
+    def test_wait_grows_when_empty(self) -> None:
+        bucket = leetcode_anki.helpers.ratelimit.TokenBucket(rate=2, capacity=1)
+
+        assert bucket.reserve() == 0.0
+        assert bucket.reserve() == pytest.approx(0.5)
+        assert bucket.reserve() == pytest.approx(1.0)
+
+    def test_refill(self) -> None:
+        with mock.patch("time.monotonic", mock.Mock(return_value=10.0)):
+            bucket = leetcode_anki.helpers.ratelimit.TokenBucket(rate=1, capacity=1)
+            assert bucket.reserve() == 0.0
+
+        with mock.patch("time.monotonic", mock.Mock(return_value=11.0)):
+            assert bucket.reserve() == 0.0
+
+    @mock.patch("time.sleep")
+    def test_acquire_sleeps(self, mock_sleep: mock.Mock) -> None:
+        with mock.patch("time.monotonic", mock.Mock(return_value=10.0)):
+            bucket = leetcode_anki.helpers.ratelimit.TokenBucket(rate=4, capacity=1)
+            bucket.acquire()
+            mock_sleep.assert_not_called()
+            bucket.acquire()
+
+        mock_sleep.assert_called_once_with(pytest.approx(0.25))
+
+    def test_invalid_settings(self) -> None:
+        with pytest.raises(ValueError):
+            leetcode_anki.helpers.ratelimit.TokenBucket(rate=0)
+
+        with pytest.raises(ValueError):
+            leetcode_anki.helpers.ratelimit.TokenBucket(rate=1, capacity=0)
+
+    def test_shared_limiter(self) -> None:
+        assert leetcode_anki.helpers.ratelimit._get_rate_limiter(
+            1.5, 2
+        ) is leetcode_anki.helpers.ratelimit._get_rate_limiter(1.5, 2)
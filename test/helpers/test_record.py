@@ -0,0 +1,84 @@
+import pickle
+
+import leetcode.models.graphql_question_detail  # type: ignore
+import leetcode.models.graphql_question_topic_tag  # type: ignore
+import pytest
+
+import leetcode_anki.helpers.record
+from csv_reader import OLLEntity
+from leetcode_anki.models import LeetcodeAnkiFactory, note_from_record
+
+
+def dummy_detail(
+    difficulty: str = "Hard",
+) -> leetcode.models.graphql_question_detail.GraphqlQuestionDetail:
+    return leetcode.models.graphql_question_detail.GraphqlQuestionDetail(
+        freq_bar=1.1,
+        question_frontend_id="1",
+        title="test title",
+        title_slug="test",
+        category_title="Algorithms",
+        content="test content",
+        is_paid_only=False,
+        difficulty=difficulty,
+        likes=1,
+        dislikes=2,
+        topic_tags=[
+            leetcode.models.graphql_question_topic_tag.GraphqlQuestionTopicTag(
+                name="test tag",
+                slug="test-tag",
+            )
+        ],
+        stats='{"totalSubmissionRaw": 8, "totalAcceptedRaw": 3}',
+        hints=["test hint 1"],
+    )
+
+
+class TestProblemRecord:
+    def test_from_detail(self) -> None:
+        record = leetcode_anki.helpers.record.ProblemRecord.from_detail(
+            dummy_detail()
+        )
+
+        assert record.slug == "test"
+        assert record.difficulty_html == "<font color='red'>Hard</font>"
+        assert record.submissions_total == 8
+        assert record.submissions_accepted == 3
+        assert record.accept_rate == 37
+        assert record.tags == ["test-tag", "difficulty-hard-tag"]
+        assert record.oll_desc is None
+
+    def test_oll(self) -> None:
+        record = leetcode_anki.helpers.record.ProblemRecord.from_detail(
+            dummy_detail(), OLLEntity("test", "[two-pointer,hash-map]", "desc")
+        )
+
+        assert record.oll_short == ["two-pointer", "hash-map"]
+        assert record.oll_desc == "desc"
+
+    def test_incorrect_difficulty(self) -> None:
+        with pytest.raises(ValueError):
+            leetcode_anki.helpers.record.ProblemRecord.from_detail(
+                dummy_detail("Impossible")
+            )
+
+    def test_compact(self) -> None:
+        record = leetcode_anki.helpers.record.ProblemRecord.from_detail(
+            dummy_detail()
+        )
+
+        assert not hasattr(record, "__dict__")
+        assert pickle.loads(pickle.dumps(record)).accept_rate == 37
+
+    def test_note_from_record(self) -> None:
+        record = leetcode_anki.helpers.record.ProblemRecord.from_detail(
+            dummy_detail(), OLLEntity("test", "[two-pointer]", "desc")
+        )
+        model = LeetcodeAnkiFactory.nano_leet()
+
+        note = note_from_record(record, model)
+
+        assert len(note.fields) == len(model.fields)
+        assert note.fields[11] == "37"
+        assert note.fields[14:] == ["['two-pointer']", "desc"]
+        assert note.sort_field == "1.1"
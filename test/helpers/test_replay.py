@@ -0,0 +1,272 @@
+import json
+import os
+from typing import Iterator
+from unittest import mock
+
+import pytest
+import urllib3  # type: ignore
+
+import leetcode_anki.helpers.api
+import leetcode_anki.helpers.data
+import leetcode_anki.helpers.replay
+from csv_reader import OLLEntity
+
+
+@pytest.fixture(autouse=True)
+def stand_in_client(monkeypatch) -> Iterator[None]:
+    monkeypatch.setenv("LEETCODE_SESSION_ID", "test")
+    monkeypatch.setenv("LEETCODE_CSRF_TOKEN", "test")
+    leetcode_anki.helpers.api._client = None
+    yield
+    leetcode_anki.helpers.api._client = None
+
+
+def post(server: leetcode_anki.helpers.replay.StandInServer, body: dict):
+    return urllib3.request(
+        "POST",
+        server.url + leetcode_anki.helpers.replay.GRAPHQL_PATH,
+        body=json.dumps(body),
+        headers={"Content-Type": "application/json"},
+        retries=False,
+    )
+
+
+class TestStandInServer:
+    def test_synthetic_page_fetch(self, monkeypatch) -> None:
+        responder = leetcode_anki.helpers.replay.SyntheticLeetcode(25)
+        with leetcode_anki.helpers.replay.StandInServer([responder]) as server:
+            monkeypatch.setenv("LEETCODE_API_HOST", server.url)
+            leetcode_data = leetcode_anki.helpers.data.LeetcodePageData(
+                0, 100, page_size=10, rate=1000
+            )
+
+            problems = leetcode_data._get_problems_data()
+
+        assert [problem.title_slug for problem in problems] == [
+            f"problem-{i}" for i in range(1, 26)
+        ]
+
+    def test_synthetic_batch_fetch(self, monkeypatch) -> None:
+        responder = leetcode_anki.helpers.replay.SyntheticLeetcode(10)
+        with leetcode_anki.helpers.replay.StandInServer([responder]) as server:
+            monkeypatch.setenv("LEETCODE_API_HOST", server.url)
+            leetcode_data = leetcode_anki.helpers.data.LeetcodeSlugData(
+                [OLLEntity("problem-3", "", ""), OLLEntity("problem-1", "", "")],
+                rate=1000,
+            )
+
+            problems = leetcode_data.get_problems()
+
+        assert [problem.details.title_slug for problem in problems] == [
+            "problem-3",
+            "problem-1",
+        ]
+
+    @mock.patch("time.sleep")
+    def test_injected_errors_are_retried(self, mock_sleep, monkeypatch) -> None:
+        responder = leetcode_anki.helpers.replay.SyntheticLeetcode(30)
+        with leetcode_anki.helpers.replay.StandInServer(
+            [responder], error_rate=0.3, seed=1
+        ) as server:
+            monkeypatch.setenv("LEETCODE_API_HOST", server.url)
+            leetcode_data = leetcode_anki.helpers.data.LeetcodePageData(
+                0, 100, page_size=5, rate=1000
+            )
+
+            problems = leetcode_data._get_problems_data()
+
+        assert len(problems) == 30
+        assert server.stats["errors"] > 0
+
+    def test_rate_limit(self) -> None:
+        responder = leetcode_anki.helpers.replay.SyntheticLeetcode(1)
+        body = {"query": "{ user { username } }", "variables": {}}
+        with leetcode_anki.helpers.replay.StandInServer(
+            [responder], rate=0.1, burst=1
+        ) as server:
+            assert post(server, body).status == 200
+            response = post(server, body)
+
+        assert response.status == 429
+        assert int(response.headers["Retry-After"]) >= 1
+        assert server.stats["rate_limited"] == 1
+
+    def test_unknown_query(self) -> None:
+        with leetcode_anki.helpers.replay.StandInServer([]) as server:
+            response = post(server, {"query": "{ nothing }"})
+
+        assert response.status == 400
+        assert server.stats["unknown"] == 1
+
+
+class TestRecordReplay:
+    def test_fixture_key_ignores_whitespace(self) -> None:
+        key = leetcode_anki.helpers.replay.fixture_key
+        assert key({"query": "{ a\n  b }", "variables": {"x": 1}}) == key(
+            {"query": "{ a b }", "variables": {"x": 1}}
+        )
+        assert key({"query": "{ a }", "variables": {"x": 1}}) != key(
+            {"query": "{ a }", "variables": {"x": 2}}
+        )
+
+    def test_recorded_responses_are_replayed(self, tmp_path, monkeypatch) -> None:
+        record_dir = str(tmp_path / "fixtures")
+        responder = leetcode_anki.helpers.replay.SyntheticLeetcode(12)
+        with leetcode_anki.helpers.replay.StandInServer([responder]) as server:
+            monkeypatch.setenv("LEETCODE_API_HOST", server.url)
+            monkeypatch.setenv("LEETCODE_RECORD_DIR", record_dir)
+            recorded = leetcode_anki.helpers.data.LeetcodePageData(
+                0, 100, page_size=5, rate=1000
+            )._get_problems_data()
+
+        # Count query and 3 pages
+        assert len(os.listdir(record_dir)) == 4
+
+        # Fresh client and response cache, only the fixtures are available
+        leetcode_anki.helpers.api._client = None
+        monkeypatch.delenv("LEETCODE_RECORD_DIR")
+        monkeypatch.setattr(
+            leetcode_anki.helpers.data, "CACHE_DIR", str(tmp_path / "cache2")
+        )
+        store = leetcode_anki.helpers.replay.FixtureStore(record_dir)
+        with leetcode_anki.helpers.replay.StandInServer([store]) as server:
+            monkeypatch.setenv("LEETCODE_API_HOST", server.url)
+            replayed = leetcode_anki.helpers.data.LeetcodePageData(
+                0, 100, page_size=5, rate=1000
+            )._get_problems_data()
+
+        assert server.stats["unknown"] == 0
+        assert [problem.to_dict() for problem in replayed] == [
+            problem.to_dict() for problem in recorded
+        ]
+
+
+class ChangingLeetcode(leetcode_anki.helpers.replay.SyntheticLeetcode):
+    """
+    Synthetic problems, some of which become Hard, recording the slugs asked
+    for in detail
+    """
+
+    def __init__(self, problem_count: int) -> None:
+        super().__init__(problem_count)
+        self.hard = set()
+        self.detailed = []
+
+    def __call__(self, body):
+        if body.get("operationName") == "questionContentBatch":
+            self.detailed.extend(body["variables"].values())
+        status, payload = super().__call__(body)
+        data = payload["data"]
+        questions = list(data.values())
+        if "problemsetQuestionList" in data:
+            questions = data["problemsetQuestionList"]["questions"]
+        for question in questions:
+            if question and question["titleSlug"] in self.hard:
+                question["difficulty"] = "Hard"
+        return status, payload
+
+
+class TestLightSync:
+    def test_only_changes_are_fetched(self, monkeypatch) -> None:
+        responder = ChangingLeetcode(10)
+        with leetcode_anki.helpers.replay.StandInServer([responder]) as server:
+            monkeypatch.setenv("LEETCODE_API_HOST", server.url)
+
+            def sync():
+                return leetcode_anki.helpers.data.LeetcodePageData(
+                    0, 100, rate=1000, light_sync=True
+                )._sync_problems_data()
+
+            first = sync()
+            assert sorted(responder.detailed) == sorted(
+                f"problem-{i}" for i in range(1, 11)
+            )
+
+            responder.detailed.clear()
+            assert [problem.title_slug for problem in sync()] == [
+                problem.title_slug for problem in first
+            ]
+            assert responder.detailed == []
+
+            responder.hard.add("problem-4")
+            problems = sync()
+            assert responder.detailed == ["problem-4"]
+
+        assert [problem.title_slug for problem in problems] == [
+            f"problem-{i}" for i in range(1, 11)
+        ]
+        assert problems[3].difficulty == "Hard"
+
+    def test_same_range_as_full_fetch(self, monkeypatch) -> None:
+        with leetcode_anki.helpers.replay.StandInServer(
+            [ChangingLeetcode(10)]
+        ) as server, mock.patch.object(
+            # The count is cached, a problem published since then is listed
+            leetcode_anki.helpers.data.LeetcodePageData,
+            "_get_problems_count",
+            return_value=9,
+        ):
+            monkeypatch.setenv("LEETCODE_API_HOST", server.url)
+
+            leetcode_data = leetcode_anki.helpers.data.LeetcodePageData(
+                0, 100, rate=1000, light_sync=True
+            )
+            synced = leetcode_data._sync_problems_data()
+            fetched = leetcode_data._get_problems_data()
+
+        assert [problem.title_slug for problem in synced] == [
+            problem.title_slug for problem in fetched
+        ]
+        assert len(synced) == 10
+
+
+class TestLazyLoad:
+    # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
+    #  `pytest.mark.asyncio`.
+    @pytest.mark.asyncio
+    async def test_only_asked_problems_are_fetched(self, monkeypatch) -> None:
+        responder = ChangingLeetcode(10)
+        with leetcode_anki.helpers.replay.StandInServer([responder]) as server:
+            monkeypatch.setenv("LEETCODE_API_HOST", server.url)
+            leetcode_data = leetcode_anki.helpers.data.LeetcodeSlugData(
+                [OLLEntity(f"problem-{i}", "", "") for i in range(1, 11)],
+                rate=1000,
+            )
+
+            assert await leetcode_data.title("problem-3") == "Problem 3"
+            assert responder.detailed == ["problem-3"]
+
+            # Hinted problems come with the next one loaded on demand
+            leetcode_data.prefetch(["problem-5", "problem-6", "problem-3"])
+            assert await leetcode_data.title("problem-4") == "Problem 4"
+            assert sorted(responder.detailed) == [
+                "problem-3",
+                "problem-4",
+                "problem-5",
+                "problem-6",
+            ]
+            assert await leetcode_data.title("problem-6") == "Problem 6"
+            assert len(responder.detailed) == 4
+
+            # A new instance finds them in the problem store
+            responder.detailed.clear()
+            other = leetcode_anki.helpers.data.LeetcodeSlugData(
+                [OLLEntity(f"problem-{i}", "", "") for i in range(1, 11)],
+                rate=1000,
+            )
+            assert [
+                record.slug
+                for record in other.iter_records(["problem-4", "problem-7"])
+            ] == ["problem-4", "problem-7"]
+            assert responder.detailed == ["problem-7"]
+            assert "_cache" not in other.__dict__
+
+    def test_unknown_problem(self, monkeypatch) -> None:
+        with leetcode_anki.helpers.replay.StandInServer(
+            [ChangingLeetcode(3)]
+        ) as server:
+            monkeypatch.setenv("LEETCODE_API_HOST", server.url)
+            leetcode_data = leetcode_anki.helpers.data.LeetcodeSlugData([], rate=1000)
+
+            with pytest.raises(ValueError, match="not in cache"):
+                leetcode_data.stored("problem-42")
@@ -0,0 +1,151 @@
+import os
+import sqlite3
+from unittest import mock
+
+import leetcode.models.graphql_question_detail  # type: ignore
+import pytest
+
+import leetcode_anki.helpers.data
+import leetcode_anki.helpers.store
+from csv_reader import OLLEntity
+from test.helpers.test_cache import QUESTION_DETAIL
+
+
+def question(slug: str, content: str = "content") -> (
+    leetcode.models.graphql_question_detail.GraphqlQuestionDetail
+):
+    return leetcode.models.graphql_question_detail.GraphqlQuestionDetail(
+        title_slug=slug,
+        title=slug.upper(),
+        difficulty="Easy",
+        likes=1,
+        dislikes=1,
+        content=content,
+        stats='{"totalSubmissionRaw": 1, "totalAcceptedRaw": 1}',
+    )
+
+
+class TestProblemStore:
+    def test_round_trip(self, tmp_path) -> None:
+        store = leetcode_anki.helpers.store.ProblemStore(
+            str(tmp_path / "problems.sqlite")
+        )
+
+        assert store.get("test") is None
+        store.put(QUESTION_DETAIL)
+
+        assert store.get("test") == QUESTION_DETAIL
+        assert store.content("test") == "test content"
+        assert len(store) == 1
+
+        # Another store reads what the previous one wrote
+        store.close()
+        assert (
+            leetcode_anki.helpers.store.ProblemStore(
+                str(tmp_path / "problems.sqlite")
+            ).get("test")
+            == QUESTION_DETAIL
+        )
+
+    def test_empty_content(self, tmp_path) -> None:
+        store = leetcode_anki.helpers.store.ProblemStore(str(tmp_path / "db"))
+        store.put(question("empty", content=None))
+
+        assert store.get("empty").content is None
+
+    def test_content_is_compressed(self, tmp_path) -> None:
+        store = leetcode_anki.helpers.store.ProblemStore(str(tmp_path / "db"))
+        store.put(question("large", content="<p>same paragraph</p>" * 1000))
+
+        ((codec, size),) = (
+            sqlite3.connect(str(tmp_path / "db"))
+            .execute("SELECT codec, length(content) FROM problems")
+            .fetchall()
+        )
+        assert codec in ("zlib", "zstd")
+        assert size < 1000
+
+    def test_ttl(self, tmp_path) -> None:
+        store = leetcode_anki.helpers.store.ProblemStore(str(tmp_path / "db"))
+
+        with mock.patch("time.time", mock.Mock(return_value=1000.0)):
+            store.put_many([question("old")])
+        with mock.patch("time.time", mock.Mock(return_value=1100.0)):
+            store.put_many([question("new")])
+
+            assert store.get("old", ttl=50) is None
+            assert store.get("old", ttl=200) is not None
+            assert store.fresh(["old", "new", "missing"], ttl=50) == {"new"}
+            assert store.fresh(["old", "new", "missing"]) == {"old", "new"}
+
+    def test_fresh_many(self, tmp_path) -> None:
+        store = leetcode_anki.helpers.store.ProblemStore(str(tmp_path / "db"))
+        # More slugs than SQLite parameters in one statement
+        store.put_many(question(f"problem-{i}") for i in range(1200))
+
+        assert len(store.fresh(f"problem-{i}" for i in range(1500))) == 1200
+
+    def test_signature(self, tmp_path) -> None:
+        store = leetcode_anki.helpers.store.ProblemStore(str(tmp_path / "db"))
+        store.put_many([question("a"), question("b")], {"a": "signature-a"})
+
+        assert store.signature("a") == "signature-a"
+        assert store.signature("b") is None
+        assert store.signature("missing") is None
+
+        # A problem refetched without its signal keeps the previous one
+        store.put(question("a"))
+        assert store.signature("a") == "signature-a"
+        assert store.get("a") is not None
+
+        store.put(question("a"), "signature-a2")
+        assert store.signature("a") == "signature-a2"
+
+    def test_unknown_codec(self, tmp_path) -> None:
+        store = leetcode_anki.helpers.store.ProblemStore(str(tmp_path / "db"))
+        store.put(question("a"))
+        store.close()
+        with sqlite3.connect(str(tmp_path / "db")) as connection:
+            connection.execute("UPDATE problems SET codec = 'lz4'")
+
+        with pytest.raises(ValueError, match="Unknown codec"):
+            store.get("a")
+
+
+class TestSlugDataStore:
+    # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
+    #  `pytest.mark.asyncio`.
+    @pytest.mark.asyncio
+    async def test_problems_are_read_from_store(self) -> None:
+        leetcode_data = leetcode_anki.helpers.data.LeetcodeSlugData(
+            [OLLEntity("a", "", ""), OLLEntity("b", "", "")]
+        )
+        leetcode_data._store.put_many([question("a"), question("b")])
+
+        with mock.patch.object(leetcode_data, "_fetch_batches") as mock_fetch:
+            await leetcode_data.load()
+            assert [
+                record.slug for record in leetcode_data.iter_records(["b", "a"])
+            ] == ["b", "a"]
+
+        mock_fetch.assert_not_called()
+        assert leetcode_data.stored("a") == question("a")
+        assert os.path.exists(
+            os.path.join(leetcode_anki.helpers.data.CACHE_DIR, "problems.sqlite")
+        )
+
+    # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
+    #  `pytest.mark.asyncio`.
+    @pytest.mark.asyncio
+    async def test_records_are_bounded(self) -> None:
+        slugs = [f"problem-{i}" for i in range(20)]
+        leetcode_data = leetcode_anki.helpers.data.LeetcodeSlugData(
+            [OLLEntity(slug, "", "") for slug in slugs]
+        )
+        leetcode_data._store.put_many(question(slug) for slug in slugs)
+        await leetcode_data.load()
+
+        with mock.patch.object(leetcode_anki.helpers.data, "RECORD_CACHE_SIZE", 5):
+            assert len(list(leetcode_data.iter_records(slugs))) == 20
+
+        assert len(leetcode_data._records) == 5
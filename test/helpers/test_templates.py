@@ -0,0 +1,95 @@
+import pytest
+
+import leetcode_anki.helpers.record
+import leetcode_anki.helpers.templates
+from csv_reader import OLLEntity
+from leetcode_anki.models import LeetcodeAnkiFactory
+from pdf.html_wrapper import problem_html
+from test.helpers.test_record import dummy_detail
+
+
+class TestTemplate:
+    def test_fields(self) -> None:
+        template = leetcode_anki.helpers.templates.Template(
+            "<h2>{{Id}}. {{ Title }}</h2>{{Unknown}}"
+        )
+
+        assert template.render({"Id": "1", "Title": "Two Sum"}) == "<h2>1. Two Sum</h2>"
+
+    def test_sections(self) -> None:
+        template = leetcode_anki.helpers.templates.Template(
+            "{{#Hints}}<b>{{Hints}}</b>{{/Hints}}{{^Hints}}none{{/Hints}}"
+        )
+
+        assert template.render({"Hints": "hint"}) == "<b>hint</b>"
+        assert template.render({"Hints": " "}) == "none"
+        assert template.render({}) == "none"
+
+    def test_unbalanced(self) -> None:
+        with pytest.raises(ValueError, match="Unclosed"):
+            leetcode_anki.helpers.templates.Template("{{#Hints}}")
+
+        with pytest.raises(ValueError, match="Unexpected"):
+            leetcode_anki.helpers.templates.Template("{{#Hints}}{{/Title}}")
+
+
+class TestProblemTemplates:
+    def test_model(self) -> None:
+        model = LeetcodeAnkiFactory.nano_leet()
+
+        assert [field["name"] for field in model.fields][-2:] == [
+            "OLL Ways",
+            "OLL Description ",
+        ]
+        assert model.templates[0]["qfmt"] == (
+            leetcode_anki.helpers.templates.CARD_FRONT.source
+        )
+        assert "{{OLL Description}}" in model.templates[0]["afmt"]
+        assert "{{OLL Description}}" not in (
+            LeetcodeAnkiFactory.plain().templates[0]["afmt"]
+        )
+
+    def test_card_fields(self) -> None:
+        # Anki ignores the spaces around the field names of the model and
+        # of the tags
+        model_fields = {
+            field["name"].strip() for field in LeetcodeAnkiFactory.nano_leet().fields
+        }
+        record = leetcode_anki.helpers.record.ProblemRecord.from_detail(
+            dummy_detail(), OLLEntity("test", "[two-pointer]", "desc")
+        )
+        fields = leetcode_anki.helpers.templates.record_fields(record)
+
+        assert set(fields) == model_fields
+        for template in (
+            leetcode_anki.helpers.templates.CARD_FRONT,
+            leetcode_anki.helpers.templates.OLL_CARD_BACK,
+        ):
+            tags = {
+                name.strip()
+                for _, name in leetcode_anki.helpers.templates._TAG.findall(
+                    template.source
+                )
+            }
+            assert tags <= model_fields | {"FrontSide"}
+        back = leetcode_anki.helpers.templates.OLL_CARD_BACK.render(fields)
+        assert "<pre>['two-pointer']</pre>" in back
+        assert "<p>desc</p>" in back
+
+    def test_problem_page(self) -> None:
+        record = leetcode_anki.helpers.record.ProblemRecord.from_detail(
+            dummy_detail(), OLLEntity("test", "[two-pointer]", "desc")
+        )
+
+        page = problem_html(record)
+
+        assert f"<h1>{record.problem_id}. {record.title}</h1>" in page
+        assert f"{record.difficulty_html} &middot; {record.category}" in page
+        assert "<h2>One Line Leet</h2><p>desc</p>" in page
+
+    def test_problem_page_without_oll(self) -> None:
+        record = leetcode_anki.helpers.record.ProblemRecord.from_detail(
+            dummy_detail()
+        )
+
+        assert "One Line Leet" not in problem_html(record)
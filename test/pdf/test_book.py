@@ -0,0 +1,168 @@
+import io
+import os
+from typing import List
+
+import pytest
+
+import leetcode_anki.helpers.data
+import pdf.book
+import pdf.pool
+from csv_reader import OLLEntity
+from test.helpers.test_store import question
+
+
+def leetcode_data(slugs: List[str]) -> leetcode_anki.helpers.data.LeetcodeSlugData:
+    data = leetcode_anki.helpers.data.LeetcodeSlugData(
+        [OLLEntity(slug, "", "") for slug in slugs]
+    )
+    data._store.put_many(question(slug) for slug in slugs)
+    return data
+
+
+class TestFragments:
+    # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
+    #  `pytest.mark.asyncio`.
+    @pytest.mark.asyncio
+    async def test_only_changed_problems_are_rendered(self, tmp_path) -> None:
+        slugs = ["a", "b", "c"]
+        rendered: List[str] = []
+
+        async def renderer(html: str) -> bytes:
+            rendered.append(html)
+            return html.encode()
+
+        pool = pdf.pool.PdfWorkerPool(renderer, workers=2)
+        entries = await pdf.book.render_fragments(
+            leetcode_data(slugs), slugs, str(tmp_path), pool
+        )
+
+        assert [entry.slug for entry in entries] == slugs
+        assert entries[0].title.endswith(". A")
+        assert len(rendered) == 3
+
+        rendered.clear()
+        changed = leetcode_data(slugs)
+        changed._store.put(question("b", "new content"))
+        entries = await pdf.book.render_fragments(changed, slugs, str(tmp_path), pool)
+
+        assert len(rendered) == 1
+        assert "new content" in rendered[0]
+        assert [entry.slug for entry in entries] == slugs
+
+    # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
+    #  `pytest.mark.asyncio`.
+    @pytest.mark.asyncio
+    async def test_failed_problems_are_left_out(self, tmp_path) -> None:
+        slugs = ["a", "b"]
+
+        async def renderer(html: str) -> bytes:
+            if ". B</h1>" in html:
+                raise RuntimeError("broken")
+            return html.encode()
+
+        pool = pdf.pool.PdfWorkerPool(renderer, workers=1, attempts=1)
+        entries = await pdf.book.render_fragments(
+            leetcode_data(slugs), slugs, str(tmp_path), pool
+        )
+
+        assert [entry.slug for entry in entries] == ["a"]
+
+    def test_prune(self, tmp_path) -> None:
+        cache_dir = str(tmp_path)
+        paths = {}
+        for name in ("a", "b", "c", "d", "other"):
+            paths[name] = pdf.book.fragment_path(cache_dir, name)
+            os.makedirs(os.path.dirname(paths[name]), exist_ok=True)
+            with open(paths[name], "wb") as fragment:
+                fragment.write(b"pdf")
+
+        def prune(output: str, names: List[str]) -> int:
+            entries = [pdf.book.BookEntry(name, name, paths[name]) for name in names]
+            return pdf.book.prune_fragments(cache_dir, output, entries)
+
+        assert prune("first.pdf", ["a", "b"]) == 0
+        assert prune("second.pdf", ["b", "c"]) == 0
+
+        # "b" is still in the second book
+        assert prune("first.pdf", ["d"]) == 1
+        assert not os.path.exists(paths["a"])
+        assert os.path.exists(paths["b"])
+
+        assert prune("second.pdf", ["c"]) == 1
+        assert not os.path.exists(paths["b"])
+        # Fragments of books built before aren't touched
+        assert os.path.exists(paths["other"])
+
+
+class TestBook:
+    def test_toc(self) -> None:
+        entries = [
+            pdf.book.BookEntry("a", "1. A & B", "a.pdf"),
+            pdf.book.BookEntry("b", "2. C", "b.pdf"),
+        ]
+
+        page = pdf.book.toc_html(entries, pdf.book._first_pages([3, 1], 2))
+
+        assert "<td>1. A &amp; B</td><td>3</td>" in page
+        assert "<td>2. C</td><td>6</td>" in page
+
+    # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
+    #  `pytest.mark.asyncio`.
+    @pytest.mark.asyncio
+    async def test_needs_pypdf(self, tmp_path, monkeypatch) -> None:
+        monkeypatch.setattr(pdf.book, "pypdf", None)
+
+        with pytest.raises(ValueError, match="pypdf"):
+            await pdf.book.generate_book(
+                leetcode_data(["a"]), ["a"], str(tmp_path / "book.pdf")
+            )
+
+    # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
+    #  `pytest.mark.asyncio`.
+    @pytest.mark.asyncio
+    async def test_merge(self, tmp_path) -> None:
+        pypdf = pytest.importorskip("pypdf")
+        slugs = ["a", "b", "c"]
+
+        async def renderer(html: str) -> bytes:
+            # Problem "b" takes two pages
+            writer = pypdf.PdfWriter()
+            for _ in range(2 if ". B</h1>" in html else 1):
+                writer.add_blank_page(width=200, height=200)
+            output = io.BytesIO()
+            writer.write(output)
+            return output.getvalue()
+
+        count = await pdf.book.generate_book(
+            leetcode_data(slugs),
+            slugs,
+            str(tmp_path / "book.pdf"),
+            str(tmp_path / "fragments"),
+            renderer=renderer,
+        )
+
+        assert count == 3
+        book = pypdf.PdfReader(str(tmp_path / "book.pdf"))
+        assert len(book.pages) == 1 + 4
+        assert [
+            book.get_destination_page_number(item) for item in book.outline
+        ] == [1, 2, 4]
+
+        # The fragment of the old version of a changed problem is deleted
+        changed = leetcode_data(slugs)
+        changed._store.put(question("b", "new content"))
+        await pdf.book.generate_book(
+            changed,
+            slugs,
+            str(tmp_path / "book.pdf"),
+            str(tmp_path / "fragments"),
+            renderer=renderer,
+        )
+
+        fragments = [
+            name
+            for _, _, names in os.walk(tmp_path / "fragments")
+            for name in names
+            if name.endswith(".pdf")
+        ]
+        assert len(fragments) == 3
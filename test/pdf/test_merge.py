@@ -0,0 +1,71 @@
+import io
+
+import pytest
+
+import pdf.merge
+
+
+def document(pages: int, size: int) -> io.BytesIO:
+    pypdf = pytest.importorskip("pypdf")
+    annotations = pytest.importorskip("pypdf.annotations")
+    writer = pypdf.PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=size, height=size)
+    # The first page links to the last one, like the links of a problem page
+    writer.add_annotation(
+        0,
+        annotations.Link(rect=(0, 0, 10, 10), target_page_index=pages - 1),
+    )
+    writer.add_outline_item("Ignored", 0)
+    output = io.BytesIO()
+    writer.write(output)
+    output.seek(0)
+    return output
+
+
+class TestStreamingMerger:
+    def test_merge(self) -> None:
+        pypdf = pytest.importorskip("pypdf")
+        output = io.BytesIO()
+        merger = pdf.merge.StreamingMerger(output)
+
+        assert merger.append(document(1, 100)) == 0
+        assert merger.append(document(2, 200)) == 1
+        assert merger.append(document(3, 300)) == 3
+        merger.add_outline_item("Two Sum", 1)
+        merger.add_outline_item("Déjà vu", 3)
+        merger.close()
+
+        assert merger.page_count == 6
+        output.seek(0)
+        merged = pypdf.PdfReader(output, strict=True)
+        assert len(merged.pages) == 6
+        assert [page.mediabox.width for page in merged.pages] == [
+            100,
+            200,
+            200,
+            300,
+            300,
+            300,
+        ]
+        assert [item.title for item in merged.outline] == ["Two Sum", "Déjà vu"]
+        assert [
+            merged.get_destination_page_number(item) for item in merged.outline
+        ] == [1, 3]
+        # Links stay within their own document
+        link = merged.pages[3]["/Annots"][0].get_object()
+        assert merged.get_page_number(link["/Dest"][0].get_object()) == 5
+
+    def test_outline_needs_page(self) -> None:
+        pytest.importorskip("pypdf")
+        merger = pdf.merge.StreamingMerger(io.BytesIO())
+        merger.append(document(1, 100))
+
+        with pytest.raises(ValueError, match="No page 1"):
+            merger.add_outline_item("Missing", 1)
+
+    def test_needs_pypdf(self, monkeypatch) -> None:
+        monkeypatch.setattr(pdf.merge, "PdfReader", None)
+
+        with pytest.raises(ValueError, match="pypdf"):
+            pdf.merge.StreamingMerger(io.BytesIO())
@@ -0,0 +1,185 @@
+import asyncio
+import os
+import stat
+import time
+from typing import List
+
+import pytest
+
+import leetcode_anki.helpers.data
+import pdf.generate
+import pdf.pool
+from csv_reader import OLLEntity
+from test.helpers.test_store import question
+
+
+def jobs(tmp_path, count: int) -> List[pdf.pool.PdfJob]:
+    return [
+        pdf.pool.PdfJob(f"doc-{i}", f"<p>{i}</p>", str(tmp_path / f"doc-{i}.pdf"))
+        for i in range(count)
+    ]
+
+
+def fake_binary(tmp_path, script: str) -> str:
+    path = tmp_path / "wkhtmltopdf"
+    path.write_text(f"#!/bin/sh\n{script}\n")
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path)
+
+
+class TestPdfWorkerPool:
+    # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
+    #  `pytest.mark.asyncio`.
+    @pytest.mark.asyncio
+    async def test_bounded(self, tmp_path) -> None:
+        running = 0
+        max_running = 0
+
+        async def renderer(html: str) -> bytes:
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return b"%PDF" + html.encode()
+
+        result = await pdf.pool.PdfWorkerPool(renderer, workers=3).run(
+            jobs(tmp_path, 20)
+        )
+
+        assert result.rendered == 20
+        assert result.failed == []
+        assert max_running == 3
+        assert (tmp_path / "doc-7.pdf").read_bytes() == b"%PDF<p>7</p>"
+
+    # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
+    #  `pytest.mark.asyncio`.
+    @pytest.mark.asyncio
+    async def test_back_pressure(self, tmp_path) -> None:
+        produced = 0
+        rendered = 0
+        max_ahead = 0
+
+        def producer():
+            nonlocal produced, max_ahead
+            for job in jobs(tmp_path, 50):
+                produced += 1
+                max_ahead = max(max_ahead, produced - rendered)
+                yield job
+
+        async def renderer(html: str) -> bytes:
+            nonlocal rendered
+            await asyncio.sleep(0.001)
+            rendered += 1
+            return b"%PDF"
+
+        await pdf.pool.PdfWorkerPool(renderer, workers=2, queue_size=4).run(
+            producer()
+        )
+
+        # Queued documents, the ones being rendered, and the one waiting to
+        # be queued
+        assert max_ahead <= 4 + 2 + 1
+
+    # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
+    #  `pytest.mark.asyncio`.
+    @pytest.mark.asyncio
+    async def test_timeout_and_retry(self, tmp_path) -> None:
+        calls: List[str] = []
+
+        async def renderer(html: str) -> bytes:
+            calls.append(html)
+            if html == "<p>1</p>" and calls.count(html) == 1:
+                await asyncio.sleep(10)
+            if html == "<p>2</p>":
+                raise RuntimeError("broken")
+            return b"%PDF"
+
+        result = await pdf.pool.PdfWorkerPool(
+            renderer, workers=2, timeout=0.05, attempts=3, retry_delay=0
+        ).run(jobs(tmp_path, 3))
+
+        assert result.rendered == 2
+        assert result.failed == ["doc-2"]
+        assert result.retries == 3
+        assert calls.count("<p>1</p>") == 2
+        assert not (tmp_path / "doc-2.pdf").exists()
+
+    # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
+    #  `pytest.mark.asyncio`.
+    @pytest.mark.asyncio
+    async def test_async_jobs(self, tmp_path) -> None:
+        async def producer():
+            for job in jobs(tmp_path, 5):
+                yield job
+
+        async def renderer(html: str) -> bytes:
+            return b"%PDF"
+
+        result = await pdf.pool.PdfWorkerPool(renderer, workers=2).run(producer())
+
+        assert result.rendered == 5
+        assert sorted(os.listdir(tmp_path)) == [f"doc-{i}.pdf" for i in range(5)]
+
+
+class TestWkhtmltopdfRenderer:
+    # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
+    #  `pytest.mark.asyncio`.
+    @pytest.mark.asyncio
+    async def test_render(self, tmp_path) -> None:
+        renderer = pdf.pool.WkhtmltopdfRenderer(
+            fake_binary(tmp_path, 'printf "%%PDF "; cat'), page_size="A4"
+        )
+
+        assert await renderer("<p>html</p>") == b"%PDF <p>html</p>"
+
+    # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
+    #  `pytest.mark.asyncio`.
+    @pytest.mark.asyncio
+    async def test_error(self, tmp_path) -> None:
+        renderer = pdf.pool.WkhtmltopdfRenderer(
+            fake_binary(tmp_path, "echo broken >&2; exit 1")
+        )
+
+        with pytest.raises(RuntimeError, match="broken"):
+            await renderer("<p>html</p>")
+
+    # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
+    #  `pytest.mark.asyncio`.
+    @pytest.mark.asyncio
+    async def test_timed_out_process_is_killed(self, tmp_path) -> None:
+        renderer = pdf.pool.WkhtmltopdfRenderer(
+            fake_binary(tmp_path, "exec sleep 30")
+        )
+
+        started = time.monotonic()
+        result = await pdf.pool.PdfWorkerPool(
+            renderer, workers=1, timeout=0.2, attempts=1
+        ).run(jobs(tmp_path, 1))
+
+        assert result.failed == ["doc-0"]
+        assert time.monotonic() - started < 5
+
+
+class TestGenerate:
+    # pyre-fixme[56]: Pyre was not able to infer the type of the decorator
+    #  `pytest.mark.asyncio`.
+    @pytest.mark.asyncio
+    async def test_from_store(self, tmp_path) -> None:
+        slugs = ["a", "b", "c"]
+        leetcode_data = leetcode_anki.helpers.data.LeetcodeSlugData(
+            [OLLEntity(slug, "", "") for slug in slugs]
+        )
+        leetcode_data._store.put_many(question(slug) for slug in slugs)
+
+        async def renderer(html: str) -> bytes:
+            return html.encode()
+
+        result = await pdf.generate.generate_async(
+            leetcode_data, slugs, str(tmp_path), workers=2, renderer=renderer
+        )
+
+        assert result.rendered == 3
+        page = (tmp_path / "a.pdf").read_text()
+        assert ". A</h1>" in page
+        assert "content" in page
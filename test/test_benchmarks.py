@@ -0,0 +1,35 @@
+import os
+
+import benchmarks.run
+import leetcode_anki.helpers.api
+import leetcode_anki.helpers.data
+
+
+class TestBenchmarks:
+    def test_smoke(self, tmp_path, monkeypatch) -> None:
+        monkeypatch.setenv("LEETCODE_SESSION_ID", "test")
+        monkeypatch.setenv("LEETCODE_CSRF_TOKEN", "test")
+        monkeypatch.delenv("LEETCODE_API_HOST", raising=False)
+        cache_dir = leetcode_anki.helpers.data.CACHE_DIR
+        client = leetcode_anki.helpers.api._client
+        args = benchmarks.run.parse_args(
+            ["--sizes", "5", "--stages", "csv", "fetch", "notes", "package"]
+        )
+
+        report = benchmarks.run.run(args)
+
+        assert [result["stage"] for result in report["results"]] == [
+            "csv",
+            "fetch",
+            "notes",
+            "package",
+        ]
+        for result in report["results"]:
+            assert "error" not in result
+            assert result["items"] == 5
+
+        # The runner points the client to its stand-in server only for the
+        # fetch stage
+        assert "LEETCODE_API_HOST" not in os.environ
+        assert leetcode_anki.helpers.data.CACHE_DIR == cache_dir
+        assert leetcode_anki.helpers.api._client is client
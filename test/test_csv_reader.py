@@ -0,0 +1,82 @@
+import pytest
+
+import csv_reader
+
+
+def write_csv(tmp_path, *rows: str) -> str:
+    path = tmp_path / "oll.csv"
+    path.write_text("\n".join(["title,url,level,category,oll_short,oll_desc", *rows]))
+    return str(path)
+
+
+class TestSlugFromUrl:
+    @pytest.mark.parametrize(
+        "url",
+        [
+            "https://leetcode.com/problems/two-sum/",
+            "https://leetcode.com/problems/two-sum",
+            "http://www.leetcode.com/problems/Two-Sum/description/",
+            "leetcode.com/problems/two-sum/?envType=study-plan#solution",
+            "https://leetcode.cn/problems/two-sum/",
+            " two-sum ",
+        ],
+    )
+    def test_slug(self, url: str) -> None:
+        assert csv_reader.slug_from_url(url) == "two-sum"
+
+    @pytest.mark.parametrize(
+        "url", ["", "https://leetcode.com/problems/", "https://leetcode.com/", "a/b"]
+    )
+    def test_invalid(self, url: str) -> None:
+        with pytest.raises(ValueError):
+            csv_reader.slug_from_url(url)
+
+
+class TestIterOllCsv:
+    def test_entries(self, tmp_path) -> None:
+        path = write_csv(
+            tmp_path,
+            'Two Sum,https://leetcode.com/problems/two-sum/,Easy,Array,"[hash-map, one-pass]",desc',
+            "3Sum,https://leetcode.com/problems/3sum/,Medium,Array,,",
+        )
+
+        entities = [entry.get_slug() for entry in csv_reader.iter_oll_csv(path)]
+
+        assert [entity.slug for entity in entities] == ["two-sum", "3sum"]
+        assert entities[0].oll_short == ["hash-map", "one-pass"]
+        assert entities[1].oll_short == []
+        assert not hasattr(entities[0], "__dict__")
+
+    def test_bad_rows_are_reported(self, tmp_path) -> None:
+        path = write_csv(
+            tmp_path,
+            "Two Sum,https://leetcode.com/problems/two-sum/,Easy,Array,[a],desc",
+            "Too short,https://leetcode.com/problems/short/",
+            "",
+            "Not a problem,https://leetcode.com/,Easy,Array,[a],desc",
+            "Two Sum again,https://leetcode.com/problems/two-sum/,Easy,Array,[b],desc",
+            "3Sum,https://leetcode.com/problems/3sum/,Medium,Array,[a],desc",
+        )
+        errors = []
+
+        entries = list(csv_reader.iter_oll_csv(path, errors))
+
+        assert [entry.slug for entry in entries] == ["two-sum", "3sum"]
+        assert entries[0].oll_short == ["a"]
+        assert [error.line for error in errors] == [3, 5]
+        assert "Expected 6 columns" in str(errors[0])
+        assert str(errors[1]).startswith(f"{path}:5:")
+
+    def test_streaming(self, tmp_path) -> None:
+        path = write_csv(
+            tmp_path,
+            *(
+                f"P{i},https://leetcode.com/problems/problem-{i}/,Easy,Array,[a],d"
+                for i in range(1000)
+            ),
+        )
+
+        entries = csv_reader.iter_oll_csv(path)
+
+        assert next(entries).slug == "problem-0"
+        assert sum(1 for _ in entries) == 999